@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Migrations-Script: Legt die Outbox-Tabelle für ausgehende E-Mails an
+und rüstet fehlende Spalten älterer Stände nach
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+def add_mail_outbox_table():
+    """Erstellt die Tabelle outbox_mail bzw. ergänzt das Feld coalesce_items"""
+    with app.app_context():
+        try:
+            db.create_all()
+            result = db.session.execute(text("PRAGMA table_info(outbox_mail)"))
+            columns = [row[1] for row in result.fetchall()]
+            if 'coalesce_items' not in columns:
+                db.session.execute(text("ALTER TABLE outbox_mail ADD COLUMN coalesce_items TEXT"))
+                db.session.commit()
+                print("✅ coalesce_items Feld zur Outbox-Tabelle hinzugefügt.")
+            print("✅ Outbox-Tabelle bereit.")
+        except Exception as e:
+            print(f"❌ Fehler beim Anlegen der Outbox-Tabelle: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    add_mail_outbox_table()
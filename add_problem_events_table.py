@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Migrations-Script: Legt die ProblemEvent-Tabelle an und füllt sie für bestehende und archivierte Probleme
+(Anlage-Ereignis zum frühesten bekannten Zeitpunkt, aktueller Status zu status_changed_at)
+"""
+
+import json
+from datetime import datetime, timezone
+
+from analytics import RESOLVED_STATUSES
+from app import app, db, ArchivedProblem, Problem, ProblemEvent, UploadedImage
+from sqlalchemy import text
+
+
+def _naive_utc(value):
+    """Zeitpunkt als naive UTC-Zeit (so speichert SQLite), ISO-Strings werden gelesen"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def earliest_known_timestamp(problem, materials, image_times):
+    """
+    Frühester bekannter Zeitpunkt eines Problems - der Meldezeitpunkt selbst wird nicht gespeichert
+
+    Kandidaten: Statuswechsel, letzte Änderung, Fortschritt-Updates, Material-Bestellungen und
+    der Upload der zugehörigen Bilder.
+    """
+    candidates = [problem.status_changed_at, problem.updated_at]
+    candidates += [update.get('timestamp') for update in problem.progress_update_list]
+    candidates += [item.get('bestellt_am') for item in materials]
+    candidates += [image_times.get(name) for name in problem.image_list]
+    known = [ts for ts in map(_naive_utc, candidates) if ts is not None]
+    return min(known) if known else None
+
+
+def backfill_events(problem, materials, image_times):
+    """
+    Ereignisse für ein Problem ohne Historie, oder None wenn sich keine sinnvolle Historie ableiten lässt
+
+    Ohne bekannten Zeitpunkt vor der Erledigung würde das Problem mit 0 Stunden Reparaturzeit
+    in die Auswertung eingehen - solche Probleme werden ausgelassen.
+    """
+    created_at = earliest_known_timestamp(problem, materials, image_times)
+    changed_at = _naive_utc(problem.status_changed_at)
+    if created_at is None:
+        return None
+    if problem.status != 'gemeldet' and changed_at is None:
+        return None
+    if problem.status in RESOLVED_STATUSES and created_at >= changed_at:
+        return None
+
+    fields = dict(problem_id=problem.id, bohrturm=problem.bohrturm, abteilung=problem.abteilung,
+                  system=problem.system)
+    events = [ProblemEvent(**fields, from_status=None, to_status='gemeldet', ts=created_at)]
+    if problem.status != 'gemeldet':
+        events.append(ProblemEvent(**fields, from_status='gemeldet', to_status=problem.status, ts=changed_at))
+    return events
+
+
+def add_problem_events_table():
+    """Erstellt die Tabelle und schreibt Startereignisse für Probleme ohne Historie"""
+    with app.app_context():
+        try:
+            db.create_all()
+            # Ältere Stände der Tabelle ohne System-Spalte nachrüsten
+            result = db.session.execute(text("PRAGMA table_info(problem_event)"))
+            columns = [row[1] for row in result.fetchall()]
+            if 'system' not in columns:
+                db.session.execute(text("ALTER TABLE problem_event ADD COLUMN system VARCHAR(100)"))
+                db.session.execute(text(
+                    "UPDATE problem_event SET system = COALESCE("
+                    "(SELECT system FROM problem WHERE problem.id = problem_event.problem_id), "
+                    "(SELECT system FROM problem_archive WHERE problem_archive.id = problem_event.problem_id))"
+                ))
+                print("✅ system Feld zur ProblemEvent-Tabelle hinzugefügt.")
+            known = {pid for (pid,) in db.session.query(ProblemEvent.problem_id).distinct()}
+            image_times = dict(db.session.query(UploadedImage.filename, UploadedImage.created_at))
+            created = skipped = 0
+
+            for model in (Problem, ArchivedProblem):
+                for problem in model.query.order_by(model.id).yield_per(500):
+                    if problem.id in known:
+                        continue
+                    if model is ArchivedProblem:
+                        materials = json.loads(problem.materials_json) if problem.materials_json else []
+                    else:
+                        materials = [{'bestellt_am': item.bestellt_am} for item in problem.materials]
+                    events = backfill_events(problem, materials, image_times)
+                    if events is None:
+                        skipped += 1
+                        continue
+                    db.session.add_all(events)
+                    created += 1
+            db.session.commit()
+            print(f"✅ ProblemEvent-Tabelle bereit, {created} Probleme nachgetragen.")
+            if skipped:
+                print(f"⚠️ {skipped} Probleme ohne Zeitpunkt vor der Erledigung ausgelassen (keine Reparaturzeit bekannt).")
+        except Exception as e:
+            print(f"❌ Fehler beim Anlegen der Ereignis-Tabelle: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    add_problem_events_table()
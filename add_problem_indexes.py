@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migrations-Script: Legt die Performance-Indizes für bestehende Datenbanken an
+(db.create_all() erzeugt Indizes nur für neue Tabellen)
+"""
+
+from app import app, db, ensure_problem_priority_column
+from sqlalchemy import text
+
+PROBLEM_INDEXES = {
+    'ix_problem_status_id': 'CREATE INDEX IF NOT EXISTS ix_problem_status_id ON problem (status, id)',
+    'ix_problem_status_changed_id': 'CREATE INDEX IF NOT EXISTS ix_problem_status_changed_id ON problem (status, status_changed_at, id)',
+}
+
+# Durch einen breiteren Index ersetzt (Historie sortiert zusätzlich nach id)
+OBSOLETE_PROBLEM_INDEXES = ('ix_problem_status_changed',)
+
+def add_problem_indexes():
+    """Erstellt fehlende Indizes auf der Problem-Tabelle"""
+    with app.app_context():
+        try:
+            # Berechnete Sortierspalte der Problemliste samt Index ix_problem_priority_id
+            if ensure_problem_priority_column():
+                print("✅ Spalte status_priority hinzugefügt.")
+            print("✅ Index ix_problem_priority_id vorhanden.")
+            for name, statement in PROBLEM_INDEXES.items():
+                db.session.execute(text(statement))
+                print(f"✅ Index {name} vorhanden.")
+            for name in OBSOLETE_PROBLEM_INDEXES:
+                db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                print(f"✅ Alter Index {name} entfernt.")
+            db.session.commit()
+        except Exception as e:
+            print(f"❌ Fehler beim Anlegen der Indizes: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    add_problem_indexes()
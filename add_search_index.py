@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Migrations-Script: Legt den Volltext-Index (SQLite FTS5) für Probleme an bzw. baut ihn neu auf
+
+Aufruf:
+    python add_search_index.py            # anlegen, falls er fehlt
+    python add_search_index.py --rebuild  # vorhandenen Index komplett neu füllen
+"""
+
+import sys
+
+from app import app, db, ensure_search_index, rebuild_search_index
+
+def add_search_index(rebuild=False):
+    """Erstellt den FTS5-Index und füllt ihn aus der Problem-Tabelle"""
+    with app.app_context():
+        try:
+            if not ensure_search_index():
+                print("❌ FTS5 ist in dieser Datenbank nicht verfügbar - die Suche nutzt weiterhin LIKE.")
+                return
+            if rebuild:
+                rebuild_search_index()
+                print("✅ Volltext-Index neu aufgebaut.")
+            else:
+                print("✅ Volltext-Index vorhanden.")
+        except Exception as e:
+            print(f"❌ Fehler beim Anlegen des Volltext-Index: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    add_search_index(rebuild='--rebuild' in sys.argv[1:])
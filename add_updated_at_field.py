@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Migrations-Script: Fügt das updated_at Feld (Delta-Refresh) zur Problem-Tabelle hinzu
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+def add_updated_at_field():
+    """Fügt das updated_at Feld inkl. Index hinzu und befüllt es mit status_changed_at"""
+    with app.app_context():
+        try:
+            # Prüfen ob das Feld bereits existiert
+            result = db.session.execute(text("PRAGMA table_info(problem)"))
+            columns = [row[1] for row in result.fetchall()]
+            
+            if 'updated_at' not in columns:
+                print("Füge updated_at Feld zur Problem-Tabelle hinzu...")
+                db.session.execute(text("ALTER TABLE problem ADD COLUMN updated_at DATETIME"))
+                db.session.execute(text("UPDATE problem SET updated_at = COALESCE(status_changed_at, CURRENT_TIMESTAMP)"))
+                print("✅ updated_at Feld erfolgreich hinzugefügt!")
+            else:
+                print("✅ updated_at Feld existiert bereits.")
+            
+            db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_problem_updated_at ON problem (updated_at)"))
+            db.session.commit()
+                
+        except Exception as e:
+            print(f"❌ Fehler beim Hinzufügen des Feldes: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    add_updated_at_field()
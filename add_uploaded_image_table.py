@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Migrations-Script: Legt die Tabelle für hochgeladene Dateien (Verarbeitungsstand, Verweiszähler)
+an, rüstet fehlende Spalten älterer Stände nach und übergibt noch nicht optimierte Bilder
+an den Bild-Worker-Pool
+"""
+
+from app import app, db, image_pipeline, resume_image_processing
+from sqlalchemy import text
+
+def add_uploaded_image_table():
+    """Erstellt die Tabelle uploaded_image bzw. ergänzt das Feld ref_count und verarbeitet ausstehende Bilder"""
+    with app.app_context():
+        try:
+            db.create_all()
+            result = db.session.execute(text("PRAGMA table_info(uploaded_image)"))
+            columns = [row[1] for row in result.fetchall()]
+            if 'ref_count' not in columns:
+                db.session.execute(text("ALTER TABLE uploaded_image ADD COLUMN ref_count INTEGER NOT NULL DEFAULT 1"))
+                db.session.commit()
+                print("✅ ref_count Feld zur Bild-Tabelle hinzugefügt.")
+            print("✅ Bild-Tabelle bereit.")
+            pending = resume_image_processing()
+        except Exception as e:
+            print(f"❌ Fehler beim Anlegen der Bild-Tabelle: {e}")
+            db.session.rollback()
+            return
+    if pending:
+        print(f"⏳ {pending} ausstehende Bild(er) werden optimiert...")
+        image_pipeline.wait_idle()
+        print("✅ Alle Bilder verarbeitet.")
+
+if __name__ == '__main__':
+    add_uploaded_image_table()
@@ -0,0 +1,201 @@
+"""
+Auswertungen (MTTR / Backlog-Alter)
+
+Alle Kennzahlen werden in SQL über das ProblemEvent-Protokoll berechnet; Python formt nur das Ergebnis.
+Das Modul importiert app.py nicht - Datenbank und Ereignis-Modell werden beim Anlegen übergeben
+(siehe `analytics` in app.py), damit python app.py die App nicht ein zweites Mal lädt.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+
+from flask import current_app, jsonify, request, session
+from sqlalchemy import case
+
+RESOLVED_STATUSES = ('abgearbeitet', 'bestätigt', 'fertiggestellt')
+ANALYTICS_DIMENSIONS = ('bohrturm', 'abteilung', 'system')
+BACKLOG_AGE_BUCKETS = (
+    ('<1 Tag', 24),
+    ('1-3 Tage', 72),
+    ('3-7 Tage', 168),
+    ('7-30 Tage', 720),
+    ('>30 Tage', None),
+)
+
+
+def parse_analytics_args(args):
+    """Liest Gruppierung, Filter und Zeitraum (from/to als YYYY-MM-DD) aus den Query-Parametern"""
+    group_by = args.get('group_by', 'bohrturm')
+    if group_by not in ANALYTICS_DIMENSIONS:
+        raise ValueError(f"group_by muss einer von {', '.join(ANALYTICS_DIMENSIONS)} sein")
+    filters = {name: args[name] for name in ANALYTICS_DIMENSIONS if args.get(name)}
+    
+    def parse_day(name):
+        value = args.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        except ValueError:
+            raise ValueError(f"{name} muss im Format YYYY-MM-DD angegeben werden")
+    
+    start = parse_day('from')
+    end = parse_day('to')
+    if end:
+        end += timedelta(days=1)  # 'to' ist inklusive
+    return group_by, filters, start, end
+
+
+class ProblemAnalytics:
+    """Kennzahlen aus dem Ereignisprotokoll, mit Cache und den Routen /analytics/mttr und /analytics/backlog"""
+    
+    def __init__(self, db, event_model):
+        self.db = db
+        self.events = event_model
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+    
+    def init_app(self, app):
+        app.add_url_rule('/analytics/mttr', 'analytics_mttr', self.mttr_view)
+        app.add_url_rule('/analytics/backlog', 'analytics_backlog', self.backlog_view)
+    
+    def _hours_between(self, start, end):
+        """SQL-Ausdruck für die Differenz zweier Zeitstempel in Stunden (SQLite oder PostgreSQL)"""
+        func = self.db.func
+        if self.db.engine.dialect.name == 'sqlite':
+            return (func.julianday(end) - func.julianday(start)) * 24.0
+        return func.extract('epoch', end - start) / 3600.0
+    
+    def problem_lifecycle_subquery(self, filters, until=None):
+        """
+        Eine Zeile pro Problem mit Meldezeitpunkt, erster Erledigung und Abschluss (erledigt oder gelöscht)
+        
+        Liest nur das Ereignisprotokoll (kein Join auf Problem, gelöschte Probleme bleiben enthalten).
+        Filter und Stichtag werden schon auf die Ereignisse angewendet, damit die Indizes greifen;
+        Anlage/Abteilung/System sind die zuletzt protokollierten Werte (ändern sich praktisch nie).
+        """
+        func, event = self.db.func, self.events
+        
+        def first_ts(condition):
+            return func.min(case((condition, event.ts)))
+        
+        query = self.db.session.query(
+            event.problem_id.label('problem_id'),
+            func.max(event.bohrturm).label('bohrturm'),
+            func.max(event.abteilung).label('abteilung'),
+            func.coalesce(func.max(event.system), 'unbekannt').label('system'),
+            func.coalesce(first_ts(event.from_status.is_(None)), func.min(event.ts)).label('created_at'),
+            first_ts(event.to_status.in_(RESOLVED_STATUSES)).label('resolved_at'),
+            first_ts(event.to_status.in_(RESOLVED_STATUSES + ('gelöscht',))).label('closed_at'),
+        )
+        for name, value in filters.items():
+            query = query.filter(getattr(event, name) == value)
+        if until:
+            # Spätere Ereignisse ändern weder Erledigungen vor dem Stichtag noch den Stand zum Stichtag
+            query = query.filter(event.ts < until)
+        return query.group_by(event.problem_id).subquery()
+    
+    def compute_mttr(self, group_by, filters, start, end):
+        """Mittlere Reparaturzeit (gemeldet -> erste Erledigung) in Stunden, für Erledigungen im Zeitraum"""
+        func = self.db.func
+        lifecycle = self.problem_lifecycle_subquery(filters, until=end)
+        dimension = lifecycle.c[group_by]
+        hours = self._hours_between(lifecycle.c.created_at, lifecycle.c.resolved_at)
+        query = self.db.session.query(
+            dimension, func.count(), func.avg(hours), func.min(hours), func.max(hours)
+        ).filter(lifecycle.c.resolved_at.isnot(None))
+        if start:
+            query = query.filter(lifecycle.c.resolved_at >= start)
+        rows = query.group_by(dimension).order_by(dimension).all()
+        return [{
+            group_by: key,
+            'count': count,
+            'mttr_hours': round(avg or 0, 1),
+            'min_hours': round(shortest or 0, 1),
+            'max_hours': round(longest or 0, 1),
+        } for key, count, avg, shortest, longest in rows]
+    
+    def compute_backlog_aging(self, group_by, filters, as_of):
+        """Offene Probleme zum Stichtag, verteilt auf Altersklassen seit der Meldung"""
+        lifecycle = self.problem_lifecycle_subquery(filters, until=as_of)
+        dimension = lifecycle.c[group_by]
+        age = self._hours_between(lifecycle.c.created_at, self.db.literal(as_of, self.db.DateTime))
+        bucket = case(
+            *[(age < limit, label) for label, limit in BACKLOG_AGE_BUCKETS if limit],
+            else_=BACKLOG_AGE_BUCKETS[-1][0],
+        )
+        # Ereignisse nach dem Stichtag sind bereits ausgeblendet - offen heißt: bis dahin nicht abgeschlossen
+        query = self.db.session.query(dimension, bucket, self.db.func.count()).filter(lifecycle.c.closed_at.is_(None))
+        rows = query.group_by(dimension, bucket).all()
+        
+        histogram = {}
+        for key, label, count in rows:
+            entry = histogram.setdefault(key, {group_by: key, 'total': 0, 'buckets': {name: 0 for name, _ in BACKLOG_AGE_BUCKETS}})
+            entry['buckets'][label] = count
+            entry['total'] += count
+        return [histogram[key] for key in sorted(histogram)]
+    
+    def cached(self, key, compute):
+        """
+        Liefert ein Auswertungsergebnis aus dem Cache (Schlüssel: Auswertung, Filter, Zeitraum) oder berechnet es neu
+        
+        Zum Schlüssel gehört die höchste Ereignis-ID: jedes neue Ereignis - auch aus Scripts oder
+        anderen Prozessen - macht alte Ergebnisse ungültig. Das Protokoll ist append-only, die
+        Abfrage liest nur das Ende des Primärschlüssels. ANALYTICS_CACHE_SECONDS begrenzt das
+        Alter zusätzlich (z.B. nach Korrekturen direkt in der Datenbank).
+        """
+        key = key + (self.db.session.query(self.db.func.max(self.events.id)).scalar(),)
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry and now - entry[0] < current_app.config['ANALYTICS_CACHE_SECONDS']:
+                return entry[1]
+        result = compute()
+        with self._cache_lock:
+            self._cache[key] = (now, result)
+            while len(self._cache) > current_app.config['ANALYTICS_CACHE_SIZE']:
+                self._cache.pop(next(iter(self._cache)))
+        return result
+    
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def mttr_view(self):
+        """Mittlere Reparaturzeit pro Anlage/Abteilung/System (?group_by=, ?from=, ?to=, Filter)"""
+        if 'user' not in session:
+            return jsonify({'error': 'Nicht eingeloggt'}), 401
+        try:
+            group_by, filters, start, end = parse_analytics_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        key = ('mttr', group_by, tuple(sorted(filters.items())), start, end)
+        rows = self.cached(key, lambda: self.compute_mttr(group_by, filters, start, end))
+        return jsonify({
+            'group_by': group_by,
+            'from': start.date().isoformat() if start else None,
+            'to': (end - timedelta(days=1)).date().isoformat() if end else None,
+            'rows': rows,
+        })
+    
+    def backlog_view(self):
+        """Altersverteilung der offenen Probleme zum Stichtag (?to=, Standard: jetzt)"""
+        if 'user' not in session:
+            return jsonify({'error': 'Nicht eingeloggt'}), 401
+        try:
+            group_by, filters, _, end = parse_analytics_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Ohne Stichtag: Ende der laufenden Minute, damit der Cache auch für "jetzt" greift
+        as_of = end or datetime.now(timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        key = ('backlog', group_by, tuple(sorted(filters.items())), as_of)
+        rows = self.cached(key, lambda: self.compute_backlog_aging(group_by, filters, as_of))
+        return jsonify({
+            'group_by': group_by,
+            'as_of': as_of.isoformat(),
+            'buckets': [name for name, _ in BACKLOG_AGE_BUCKETS],
+            'rows': rows,
+        })
@@ -1,16 +1,42 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, jsonify, make_response, has_request_context, stream_with_context, g, abort, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail, Message  # 📧 REAL EMAIL: Aktiviert für echten Email-Versand
 from flask_wtf.csrf import CSRFProtect
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import case
+from sqlalchemy import case, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.schema import CreateTable
 import os
+import re
+import io
+import csv
 import json
+import zipfile
+import zlib
+import hashlib
+import tempfile
+import sqlite3
+import smtplib
+from functools import wraps
 import logging
+import threading
+import queue
+import time
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import Counter, deque
+from itertools import islice
+from xml.sax.saxutils import escape as xml_escape
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
-from PIL import Image
+from markupsafe import Markup, escape
+from analytics import ProblemAnalytics
+from image_processing import DERIVATIVE_SIZES, create_missing_derivatives, derivative_path, process_upload
 
 # App-Initialisierung
 app = Flask(__name__)
@@ -56,16 +82,83 @@ app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'nils.wanning@gmai
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', '')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', app.config['MAIL_USERNAME'])
 app.config['MAIL_SUPPRESS_SEND'] = os.environ.get('MAIL_SUPPRESS_SEND', 'False') == 'True'
+# Basis-URL für Links in E-Mails
+app.config['APP_BASE_URL'] = os.environ.get('APP_BASE_URL', 'http://192.168.188.20:5000')
+
+# Mail-Outbox: Requests legen E-Mails nur ab, Worker-Threads versenden sie im Hintergrund
+app.config['MAIL_OUTBOX_WORKERS'] = int(os.environ.get('MAIL_OUTBOX_WORKERS', 2))
+app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS', 5))
+app.config['MAIL_OUTBOX_RETRY_SECONDS'] = int(os.environ.get('MAIL_OUTBOX_RETRY_SECONDS', 30))
+app.config['MAIL_OUTBOX_POLL_SECONDS'] = int(os.environ.get('MAIL_OUTBOX_POLL_SECONDS', 5))
+app.config['MAIL_OUTBOX_BATCH_SIZE'] = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE', 20))
+app.config['MAIL_OUTBOX_BATCH_WINDOW_MS'] = int(os.environ.get('MAIL_OUTBOX_BATCH_WINDOW_MS', 100))
+# Sammelfenster: Benachrichtigungen je (Empfänger, Problem, Typ) innerhalb dieser Zeit werden zu einer E-Mail
+app.config['MAIL_COALESCE_SECONDS'] = int(os.environ.get('MAIL_COALESCE_SECONDS', 120))
+# Offene SMTP-Verbindungen werden wiederverwendet und nach MAIL_SMTP_IDLE_SECONDS ohne Versand geschlossen
+app.config['MAIL_SMTP_POOL_SIZE'] = int(os.environ.get('MAIL_SMTP_POOL_SIZE', 2))
+app.config['MAIL_SMTP_IDLE_SECONDS'] = int(os.environ.get('MAIL_SMTP_IDLE_SECONDS', 60))
+
+# Email-Archiv (/admin_emails) - Einträge pro Seite
+app.config['EMAIL_ARCHIVE_PAGE_SIZE'] = int(os.environ.get('EMAIL_ARCHIVE_PAGE_SIZE', 50))
 
 # Upload-Konfiguration
 app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
+# Verkleinerte Bild-Varianten (thumb, medium) - reiner Cache, kann jederzeit gelöscht werden
+app.config['IMAGE_DERIVATIVE_FOLDER'] = os.path.join(app.root_path, 'static', 'derivatives')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Bildoptimierung läuft in einem Prozess-Pool - Uploads werden roh gespeichert und sofort bestätigt
+app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', min(4, os.cpu_count() or 1)))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+# Pagination der Problemliste (Keyset/Cursor statt LIMIT 1000)
+app.config['PROBLEMS_PAGE_SIZE'] = int(os.environ.get('PROBLEMS_PAGE_SIZE', 50))
+app.config['PROBLEMS_MAX_PAGE_SIZE'] = int(os.environ.get('PROBLEMS_MAX_PAGE_SIZE', 200))
+
+# Live-Updates per Server-Sent Events (/events) und Server-Threads
+# Jeder offene Stream belegt einen Server-Thread, der fast nur auf die nächste Nachricht wartet.
+# - python app.py (Procfile, render.yaml): Werkzeug startet je Verbindung einen eigenen Thread,
+#   begrenzt wird nur durch SSE_MAX_CLIENTS.
+# - launcher.py (waitress): feste Thread-Anzahl SERVER_THREADS = SERVER_REQUEST_THREADS für normale
+#   Requests + SSE_MAX_CLIENTS für Streams; Verbindungslimit entsprechend höher.
+# Clients über dem Limit erhalten 503 und nutzen das Polling (alle 60 s).
+app.config['SSE_HEARTBEAT_SECONDS'] = int(os.environ.get('SSE_HEARTBEAT_SECONDS', 20))
+app.config['SSE_QUEUE_SIZE'] = int(os.environ.get('SSE_QUEUE_SIZE', 50))
+app.config['SSE_MAX_CLIENTS'] = int(os.environ.get('SSE_MAX_CLIENTS', 100))
+app.config['SSE_MAX_STREAM_SECONDS'] = int(os.environ.get('SSE_MAX_STREAM_SECONDS', 300))
+app.config['SERVER_REQUEST_THREADS'] = int(os.environ.get('SERVER_REQUEST_THREADS', 16))
+app.config['SERVER_THREADS'] = int(os.environ.get(
+    'SERVER_THREADS', app.config['SERVER_REQUEST_THREADS'] + app.config['SSE_MAX_CLIENTS']))
+# Bei explizit kleinerem SERVER_THREADS bleiben die Request-Threads frei, Streams bekommen den Rest
+app.config['SSE_MAX_CLIENTS'] = max(0, min(app.config['SSE_MAX_CLIENTS'],
+                                           app.config['SERVER_THREADS'] - app.config['SERVER_REQUEST_THREADS']))
+app.config['SERVER_CONNECTION_LIMIT'] = int(os.environ.get(
+    'SERVER_CONNECTION_LIMIT', app.config['SERVER_THREADS'] + 100))
+
+# Export (/export/<bereich>) - Zeilen pro Datenbank-Fetch
+app.config['EXPORT_CHUNK_SIZE'] = int(os.environ.get('EXPORT_CHUNK_SIZE', 1000))
+
+# Archiv: bestätigte Probleme wandern nach ARCHIVE_AFTER_DAYS Tagen in die Tabelle problem_archive
+app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+
+# Auswertungen (/analytics) - Ergebnis-Cache
+app.config['ANALYTICS_CACHE_SECONDS'] = int(os.environ.get('ANALYTICS_CACHE_SECONDS', 300))
+app.config['ANALYTICS_CACHE_SIZE'] = int(os.environ.get('ANALYTICS_CACHE_SIZE', 128))
+
 # Initialize extensions
 mail = Mail(app)  # 📧 REAL EMAIL: Aktiviert für echten Email-Versand
 db = SQLAlchemy(app)
 
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """SQLite im WAL-Modus: Hintergrund-Worker schreiben, ohne lesende Requests zu blockieren"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
 # Stelle sicher, dass der Upload-Ordner existiert
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -75,6 +168,18 @@ def inject_current_year():
     """Provide the current year to all templates as `current_year`."""
     return {'current_year': datetime.now(timezone.utc).year}
 
+# Sortier-Priorität der Problemliste: gemeldet vor in_bearbeitung vor abgearbeitet
+STATUS_PRIORITY = {
+    'gemeldet': 1,
+    'in_bearbeitung': 2,
+    'abgearbeitet': 3,
+}
+# Bestätigte Probleme sortieren hinter alle anderen, unbekannte Status davor (0)
+STATUS_PRIORITY_SQL = 'CASE status {} ELSE 0 END'.format(' '.join(
+    f"WHEN '{status}' THEN {priority}"
+    for status, priority in {**STATUS_PRIORITY, 'bestätigt': 4}.items()
+))
+
 # Models
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -110,6 +215,21 @@ class Problem(db.Model):
     lieferdatum = db.Column(db.Date)  # Erwartetes Lieferdatum
     bestellung_bestaetigt_am = db.Column(db.DateTime)  # Zeitpunkt der Bestätigung
     progress_updates = db.Column(db.Text)  # JSON-String für Fortschritt-Updates
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc), index=True)  # Letzte Änderung (Delta-Refresh)
+    # Sortier-Priorität der Problemliste - SQLite berechnet sie bei jedem Statuswechsel aus status
+    status_priority = db.Column(db.Integer, db.Computed(STATUS_PRIORITY_SQL, persisted=False))
+
+    __table_args__ = (
+        # Keyset-Pagination der Problemliste: Sortierung und Blättern direkt über den Index
+        db.Index('ix_problem_priority_id', status_priority, id.desc()),
+        # Statusfilter und Zähler
+        db.Index('ix_problem_status_id', 'status', 'id'),
+        # Dashboard: kritische Probleme (gemeldet seit > 24h), Historie: Keyset je Status über (status_changed_at, id)
+        db.Index('ix_problem_status_changed_id', 'status', 'status_changed_at', 'id'),
+        # IDs nie wiederverwenden - archivierte Probleme, Suchindex und Ereignisprotokoll behalten ihre ID
+        {'sqlite_autoincrement': True},
+    )
     
     @property
     def image_list(self):
@@ -178,50 +298,1231 @@ class MaterialItem(db.Model):
     besteller_user = db.relationship('User', foreign_keys=[besteller_id])
 
 
+class ProblemStatusCounter(db.Model):
+    """Laufend gepflegte Zähler pro (Anlage, Abteilung, Status) für Dashboard-Übersichten"""
+    bohrturm = db.Column(db.String(100), primary_key=True)
+    abteilung = db.Column(db.String(50), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    anzahl = db.Column(db.Integer, nullable=False, default=0)
+    mit_bildern = db.Column(db.Integer, nullable=False, default=0)  # davon Probleme mit Bildern
+
+
+class DataVersion(db.Model):
+    """Globale Daten-Version für Conditional GET - eine Zeile, geteilt von allen Prozessen und Scripts"""
+    id = db.Column(db.Integer, primary_key=True)
+    counter = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False)
+
+
+class ArchivedProblem(db.Model):
+    """
+    Archiv-Tabelle für lange bestätigte Probleme (gleiche Spalten und IDs wie Problem)
+    
+    Hält die Problem-Tabelle und ihre Indizes klein; die Historie und der Export lesen beide Tabellen.
+    Material-Items werden beim Archivieren als JSON-Schnappschuss mitgenommen.
+    """
+    __tablename__ = 'problem_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    bohrturm = db.Column(db.String(100), nullable=False)
+    abteilung = db.Column(db.String(50), nullable=False)
+    system = db.Column(db.String(100), nullable=False)
+    problem = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    loeschen_kommentar = db.Column(db.String(300))
+    behoben = db.Column(db.Boolean, default=False)
+    bestellung_benoetigt = db.Column(db.Boolean, default=False)
+    pr_nummer = db.Column(db.String(50))
+    verantwortlicher = db.Column(db.String(100))
+    assigned_to = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    assigned_user = db.relationship('User', foreign_keys=[assigned_to])
+    status_changed_at = db.Column(db.DateTime)
+    massnahmen = db.Column(db.String(500))
+    material_liste = db.Column(db.String(500))
+    images = db.Column(db.Text)
+    mm_nummer = db.Column(db.String(100))
+    teil_beschreibung = db.Column(db.String(200))
+    besteller_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    besteller_user = db.relationship('User', foreign_keys=[besteller_id])
+    bestellung_bestaetigt = db.Column(db.Boolean, default=False)
+    lieferdatum = db.Column(db.Date)
+    bestellung_bestaetigt_am = db.Column(db.DateTime)
+    progress_updates = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    materials_json = db.Column(db.Text)  # Schnappschuss der Material-Items
+
+    __table_args__ = (
+        # Historie: Keyset-Pagination über (status_changed_at, id)
+        db.Index('ix_problem_archive_changed_id', 'status_changed_at', 'id'),
+        db.Index('ix_problem_archive_bohrturm', 'bohrturm'),
+    )
+    
+    # Gleiche Hilfs-Properties wie Problem
+    image_list = Problem.image_list
+    progress_update_list = Problem.progress_update_list
+    
+    @property
+    def material_snapshot(self):
+        """Archivierte Material-Items als Liste von Dicts"""
+        if self.materials_json:
+            return json.loads(self.materials_json)
+        return []
+
+
+class OutboxMail(db.Model):
+    """Ausgehende E-Mail - wird von den Outbox-Workern versendet"""
+    __tablename__ = 'outbox_mail'
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    recipient_name = db.Column(db.String(100))
+    subject = db.Column(db.String(300), nullable=False)
+    html_body = db.Column(db.Text)
+    text_body = db.Column(db.Text)
+    email_type = db.Column(db.String(50))
+    problem_id = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, retry, sending, sent, saved, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.String(500))
+    coalesce_items = db.Column(db.Text)  # JSON-Liste der gesammelten Ereignisse (nur Sammel-Benachrichtigungen)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_outbox_mail_status_next', 'status', 'next_attempt_at'),
+    )
+
+
+EMAIL_TYPES = ('problem_assignment', 'problem_notification', 'problem_completion',
+               'material_request', 'material_order', 'password_setup')
+
+
+class EmailArchive(db.Model):
+    """Gespeicherte (versendete oder nur lokal abgelegte) E-Mail - HTML- und Text-Teil zlib-komprimiert"""
+    __tablename__ = 'email_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    recipient = db.Column(db.String(120))
+    recipient_name = db.Column(db.String(100))
+    subject = db.Column(db.String(300))
+    email_type = db.Column(db.String(50))
+    problem_id = db.Column(db.Integer)
+    status = db.Column(db.String(20))  # sent_and_saved, saved_only
+    real_email_sent = db.Column(db.Boolean, default=False)
+    body = db.Column(db.LargeBinary)  # zlib(JSON {"html": ..., "text": ...})
+    
+    __table_args__ = (
+        db.Index('ix_email_archive_type_id', 'email_type', 'id'),
+        db.Index('ix_email_archive_recipient_id', 'recipient', 'id'),
+        db.Index('ix_email_archive_problem_id', 'problem_id', 'id'),
+    )
+    
+    @staticmethod
+    def pack_body(html_body, text_body):
+        return zlib.compress(json.dumps({'html': html_body, 'text': text_body}, ensure_ascii=False).encode('utf-8'))
+    
+    @property
+    def _body(self):
+        if not self.body:
+            return {}
+        return json.loads(zlib.decompress(self.body).decode('utf-8'))
+    
+    @property
+    def html_body(self):
+        return self._body.get('html') or ''
+    
+    @property
+    def text_body(self):
+        return self._body.get('text') or ''
+
+
+class UploadedImage(db.Model):
+    """Hochgeladene Datei: Verarbeitungsstand im Bild-Worker-Pool und Anzahl der Verweise aus Problemen"""
+    __tablename__ = 'uploaded_image'
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), unique=True, nullable=False)  # relativ zu UPLOAD_FOLDER
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, ready, failed
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    processed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_uploaded_image_status', 'status'),
+    )
+
+
+def _adjust_status_counter(connection, bohrturm, abteilung, status, delta, image_delta):
+    """Verändert einen Zähler innerhalb der laufenden Transaktion (legt ihn bei Bedarf an)"""
+    counter_table = ProblemStatusCounter.__table__
+    key = db.and_(
+        counter_table.c.bohrturm == bohrturm,
+        counter_table.c.abteilung == abteilung,
+        counter_table.c.status == status,
+    )
+    result = connection.execute(
+        counter_table.update().where(key).values(
+            anzahl=counter_table.c.anzahl + delta,
+            mit_bildern=counter_table.c.mit_bildern + image_delta,
+        )
+    )
+    if result.rowcount == 0:
+        connection.execute(counter_table.insert().values(
+            bohrturm=bohrturm, abteilung=abteilung, status=status,
+            anzahl=delta, mit_bildern=image_delta,
+        ))
+
+
+def _counter_key(problem, previous=False):
+    """(Anlage, Abteilung, Status, hat Bilder) eines Problems - optional mit den Werten vor der Änderung"""
+    values = []
+    for attribute in ('bohrturm', 'abteilung', 'status', 'images'):
+        value = getattr(problem, attribute)
+        if previous:
+            history = db.inspect(problem).attrs[attribute].history
+            if history.deleted:
+                value = history.deleted[0]
+        values.append(value)
+    bohrturm, abteilung, status, images = values
+    return bohrturm, abteilung, status or 'gemeldet', bool(images)
+
+
+@event.listens_for(Problem, 'after_insert')
+def _count_inserted_problem(mapper, connection, target):
+    bohrturm, abteilung, status, has_images = _counter_key(target)
+    _adjust_status_counter(connection, bohrturm, abteilung, status, 1, int(has_images))
+
+
+@event.listens_for(Problem, 'after_update')
+def _count_updated_problem(mapper, connection, target):
+    old_key = _counter_key(target, previous=True)
+    new_key = _counter_key(target)
+    if old_key != new_key:
+        _adjust_status_counter(connection, *old_key[:3], -1, -int(old_key[3]))
+        _adjust_status_counter(connection, *new_key[:3], 1, int(new_key[3]))
+
+
+@event.listens_for(Problem, 'after_delete')
+def _count_deleted_problem(mapper, connection, target):
+    bohrturm, abteilung, status, has_images = _counter_key(target, previous=True)
+    _adjust_status_counter(connection, bohrturm, abteilung, status, -1, -int(has_images))
+
+
+def ensure_problem_autoincrement():
+    """
+    Stellt die Problem-Tabelle älterer Datenbanken auf AUTOINCREMENT um
+    
+    Ohne AUTOINCREMENT vergibt SQLite nach dem Löschen der höchsten ID freie IDs neu - auch die
+    archivierter Probleme, deren Suchindex- und Ereignis-Einträge dann einem neuen Problem
+    zugeordnet würden. Die Tabelle wird (wie von SQLite empfohlen) neu angelegt, umkopiert und
+    umbenannt; die Sequenz startet hinter der höchsten jemals vergebenen ID.
+    
+    Returns:
+        True wenn die Tabelle umgebaut wurde
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    connection = db.session.connection()
+    table_sql = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'problem'")
+    ).scalar()
+    if table_sql is None or 'AUTOINCREMENT' in table_sql.upper():
+        return False
+    
+    index_sql = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'problem' AND sql IS NOT NULL")
+    ).scalars().all()
+    existing_columns = {row[1] for row in connection.execute(text("PRAGMA table_info(problem)"))}
+    columns = ', '.join(column.name for column in Problem.__table__.columns
+                        if column.name in existing_columns and column.computed is None)
+    create_sql = str(CreateTable(Problem.__table__).compile(connection)).replace(
+        'CREATE TABLE problem ', 'CREATE TABLE problem_new ', 1)
+    
+    connection.execute(text(create_sql))
+    connection.execute(text(f"INSERT INTO problem_new ({columns}) SELECT {columns} FROM problem"))
+    connection.execute(text("DROP TABLE problem"))
+    connection.execute(text("ALTER TABLE problem_new RENAME TO problem"))
+    for statement in index_sql:
+        connection.execute(text(statement))
+    
+    highest_id = max(
+        connection.execute(db.select(db.func.max(Problem.id))).scalar() or 0,
+        connection.execute(db.select(db.func.max(ArchivedProblem.id))).scalar() or 0,
+        connection.execute(db.select(db.func.max(ProblemEvent.problem_id))).scalar() or 0,
+    )
+    connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'problem'"))
+    connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('problem', :seq)"), {'seq': highest_id})
+    db.session.commit()
+    return True
+
+
+
+def ensure_problem_priority_column():
+    """
+    Ergänzt ältere Datenbanken um die berechnete Spalte problem.status_priority und ihren Index
+    
+    db.create_all() legt beides nur für neue Tabellen an. Die Spalte ist VIRTUAL - SQLite
+    berechnet sie aus status, bestehende Zeilen müssen nicht umgeschrieben werden.
+    
+    Returns:
+        True, wenn die Datenbank geändert wurde
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    connection = db.session.connection()
+    # table_xinfo listet im Gegensatz zu table_info auch berechnete Spalten
+    existing_columns = {row[1] for row in connection.execute(text("PRAGMA table_xinfo(problem)"))}
+    index_exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_problem_priority_id'")
+    ).first() is not None
+    if 'status_priority' in existing_columns and index_exists:
+        return False
+    
+    if 'status_priority' not in existing_columns:
+        connection.execute(text(
+            f"ALTER TABLE problem ADD COLUMN status_priority INTEGER "
+            f"GENERATED ALWAYS AS ({STATUS_PRIORITY_SQL}) VIRTUAL"
+        ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_problem_priority_id ON problem (status_priority, id DESC)"
+    ))
+    db.session.commit()
+    return True
+
+def archive_confirmed_problems(older_than_days=None, batch_size=None):
+    """
+    Verschiebt bestätigte Probleme, deren Statuswechsel älter als older_than_days ist, ins Archiv
+    
+    Arbeitet in Batches (je eine Transaktion): Zeilen kopieren, Material-Items als JSON mitnehmen,
+    dann aus problem und material_item löschen. Zähler, Suchindex und Ereignisprotokoll bleiben
+    unverändert - archivierte Probleme zählen weiterhin als erledigt und bleiben auffindbar.
+    Ältere Datenbanken werden vorher auf AUTOINCREMENT umgestellt, damit SQLite keine IDs neu vergibt.
+    
+    Returns:
+        Anzahl archivierter Probleme
+    """
+    older_than_days = app.config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days
+    batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    ensure_problem_autoincrement()
+    problem_table = Problem.__table__
+    material_table = MaterialItem.__table__
+    archived = 0
+    
+    while True:
+        rows = db.session.execute(
+            db.select(problem_table)
+            .where(problem_table.c.status == 'bestätigt',
+                   problem_table.c.status_changed_at < cutoff)
+            .order_by(problem_table.c.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+        ids = [row['id'] for row in rows]
+        
+        materials = {}
+        for item in db.session.execute(
+            db.select(material_table).where(material_table.c.problem_id.in_(ids)).order_by(material_table.c.id)
+        ).mappings():
+            materials.setdefault(item['problem_id'], []).append(
+                {key: (value.isoformat() if hasattr(value, 'isoformat') else value) for key, value in item.items()}
+            )
+        
+        now = datetime.now(timezone.utc)
+        db.session.execute(ArchivedProblem.__table__.insert(), [
+            dict({key: value for key, value in row.items() if key != 'status_priority'}, archived_at=now, materials_json=json.dumps(materials[row['id']]) if row['id'] in materials else None)
+            for row in rows
+        ])
+        db.session.execute(material_table.delete().where(material_table.c.problem_id.in_(ids)))
+        db.session.execute(problem_table.delete().where(problem_table.c.id.in_(ids)))
+        db.session.commit()
+        archived += len(ids)
+    
+    if archived:
+        bump_data_version()
+    return archived
+
+
+class ProblemEvent(db.Model):
+    """Append-only Protokoll aller Statusübergänge (Grundlage für zeitbasierte Auswertungen)"""
+    id = db.Column(db.Integer, primary_key=True)
+    problem_id = db.Column(db.Integer, nullable=False)  # bewusst ohne FK - Historie bleibt nach dem Löschen erhalten
+    bohrturm = db.Column(db.String(100), nullable=False)
+    abteilung = db.Column(db.String(50), nullable=False)
+    system = db.Column(db.String(100))
+    from_status = db.Column(db.String(20))  # None beim Anlegen
+    to_status = db.Column(db.String(20), nullable=False)  # 'gelöscht' beim Löschen
+    ts = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    username = db.Column(db.String(100))  # Auslöser, falls aus einem Request heraus
+
+    __table_args__ = (
+        db.Index('ix_problem_event_problem_ts', 'problem_id', 'ts'),
+        db.Index('ix_problem_event_bohrturm_ts', 'bohrturm', 'ts'),
+    )
+
+
+def _record_problem_event(connection, problem, from_status, to_status, ts=None):
+    """Schreibt einen Statusübergang in derselben Transaktion wie die Änderung am Problem"""
+    connection.execute(ProblemEvent.__table__.insert().values(
+        problem_id=problem.id,
+        bohrturm=problem.bohrturm,
+        abteilung=problem.abteilung,
+        system=problem.system,
+        from_status=from_status,
+        to_status=to_status,
+        ts=ts or datetime.now(timezone.utc),
+        username=session.get('user') if has_request_context() else None,
+    ))
+
+
+@event.listens_for(Problem, 'after_insert')
+def _log_created_problem(mapper, connection, target):
+    _record_problem_event(connection, target, None, target.status or 'gemeldet', target.status_changed_at)
+
+
+@event.listens_for(Problem, 'after_update')
+def _log_status_transition(mapper, connection, target):
+    history = db.inspect(target).attrs.status.history
+    if history.deleted and history.deleted[0] != target.status:
+        ts = target.status_changed_at if db.inspect(target).attrs.status_changed_at.history.added else None
+        _record_problem_event(connection, target, history.deleted[0], target.status, ts)
+
+
+@event.listens_for(Problem, 'after_delete')
+def _log_deleted_problem(mapper, connection, target):
+    _record_problem_event(connection, target, target.status, 'gelöscht')
+
+
+def compute_status_counters():
+    """Zählt die Probleme pro (Anlage, Abteilung, Status) direkt aus Problem- und Archiv-Tabelle"""
+    counters = {}
+    for model in (Problem, ArchivedProblem):
+        rows = db.session.query(
+            model.bohrturm,
+            model.abteilung,
+            model.status,
+            db.func.count(model.id),
+            db.func.sum(case((model.images.isnot(None), 1), else_=0)),
+        ).group_by(model.bohrturm, model.abteilung, model.status).all()
+        for b, a, s, count, with_images in rows:
+            previous = counters.get((b, a, s), (0, 0))
+            counters[(b, a, s)] = (previous[0] + count, previous[1] + (with_images or 0))
+    return counters
+
+
+def rebuild_status_counters(apply=True):
+    """
+    Vergleicht die gepflegten Zähler mit einer Neuberechnung und baut sie optional neu auf
+    
+    Args:
+        apply: False = nur prüfen, True = Zähler durch die Neuberechnung ersetzen
+    
+    Returns:
+        Liste der Abweichungen als (schlüssel, gespeichert, berechnet)
+    """
+    expected = compute_status_counters()
+    stored = {
+        (c.bohrturm, c.abteilung, c.status): (c.anzahl, c.mit_bildern)
+        for c in ProblemStatusCounter.query.all()
+    }
+    drift = [
+        (key, stored.get(key, (0, 0)), expected.get(key, (0, 0)))
+        for key in sorted(set(stored) | set(expected))
+        if stored.get(key, (0, 0)) != expected.get(key, (0, 0))
+    ]
+    if apply and drift:
+        ProblemStatusCounter.query.delete()
+        for (bohrturm, abteilung, status), (count, with_images) in expected.items():
+            db.session.add(ProblemStatusCounter(bohrturm=bohrturm, abteilung=abteilung, status=status,
+                                                anzahl=count, mit_bildern=with_images))
+        bump_data_version(db.session.connection())  # Dashboard zeigt die korrigierten Zahlen
+        db.session.commit()
+    return drift
+
+
+_status_counters_checked = threading.Event()
+_status_counters_lock = threading.Lock()
+
+
+def ensure_status_counters():
+    """
+    Gleicht die Zähler einmal pro Prozess mit der Problem-Tabelle ab (beim Start bzw. vor dem ersten Lesen)
+    
+    Deckt neue (leere) Zähler-Tabellen ebenso ab wie Zähler, die während eines Laufs ohne
+    Zähler-Tabelle nur teilweise gepflegt wurden.
+    """
+    if _status_counters_checked.is_set():
+        return
+    with _status_counters_lock:
+        if _status_counters_checked.is_set():
+            return
+        drift = rebuild_status_counters()
+        if drift:
+            app.logger.warning(f"{len(drift)} Dashboard-Zähler neu aufgebaut")
+        _status_counters_checked.set()
+
+
+# ===== VOLLTEXTSUCHE (SQLite FTS5) =====
+# problem_fts enthält pro Problem (rowid = problem.id) die durchsuchbaren Texte und wird über
+# Mapper-Events in derselben Transaktion gepflegt. Ohne FTS5 (oder auf anderen Datenbanken)
+# fällt die Suche auf LIKE zurück.
+
+SEARCH_INDEX_COLUMNS = ('problem', 'massnahmen', 'loeschen_kommentar', 'updates')
+SEARCH_COLUMN_WEIGHTS = (4.0, 2.0, 1.0, 1.0)  # bm25-Gewichte in der Reihenfolge der Spalten
+SEARCH_HIGHLIGHT = ('\x02', '\x03')  # Platzhalter, werden nach dem Escapen durch <mark> ersetzt
+SEARCH_MAX_TERMS = 10
+
+# ready wird nur positiv gecacht - fehlt der Index, wird bei jedem Zugriff erneut geprüft, damit ein
+# später (z.B. mit add_search_index.py) angelegter Index sofort gepflegt wird
+_search_index_state = {'ready': False, 'unavailable': False}
+_search_metadata = db.MetaData()  # nicht in db.metadata - create_all() darf die virtuelle Tabelle nicht anlegen
+problem_fts = db.Table('problem_fts', _search_metadata,
+                       db.Column('rowid', db.Integer),
+                       *[db.Column(name, db.Text) for name in SEARCH_INDEX_COLUMNS])
+
+
+def _search_index_ready(connection):
+    """Prüft ob der FTS5-Index existiert"""
+    if _search_index_state['ready']:
+        return True
+    if _search_index_state['unavailable'] or connection.dialect.name != 'sqlite':
+        return False
+    _search_index_state['ready'] = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'problem_fts'")
+    ).first() is not None
+    return _search_index_state['ready']
+
+
+def _search_document(problem):
+    """Durchsuchbare Texte eines Problems (Fortschritt-Updates zusammengefasst)"""
+    updates = ' '.join(update.get('text', '') for update in problem.progress_update_list)
+    return {
+        'problem': problem.problem,
+        'massnahmen': problem.massnahmen or '',
+        'loeschen_kommentar': problem.loeschen_kommentar or '',
+        'updates': updates,
+    }
+
+
+def _index_problem(connection, problem):
+    connection.execute(problem_fts.delete().where(problem_fts.c.rowid == problem.id))
+    connection.execute(problem_fts.insert().values(rowid=problem.id, **_search_document(problem)))
+
+
+@event.listens_for(Problem, 'after_insert')
+def _index_inserted_problem(mapper, connection, target):
+    if _search_index_ready(connection):
+        _index_problem(connection, target)
+
+
+@event.listens_for(Problem, 'after_update')
+def _index_updated_problem(mapper, connection, target):
+    state = db.inspect(target)
+    indexed = ('problem', 'massnahmen', 'loeschen_kommentar', 'progress_updates')
+    if _search_index_ready(connection) and any(state.attrs[name].history.has_changes() for name in indexed):
+        _index_problem(connection, target)
+
+
+@event.listens_for(Problem, 'after_delete')
+def _unindex_deleted_problem(mapper, connection, target):
+    if _search_index_ready(connection):
+        connection.execute(problem_fts.delete().where(problem_fts.c.rowid == target.id))
+
+
+def rebuild_search_index():
+    """Füllt den FTS5-Index komplett neu aus der Problem- und der Archiv-Tabelle"""
+    connection = db.session.connection()
+    connection.execute(problem_fts.delete())
+    for model in (Problem, ArchivedProblem):
+        for problem in model.query.order_by(model.id).yield_per(500):
+            connection.execute(problem_fts.insert().values(rowid=problem.id, **_search_document(problem)))
+    db.session.commit()
+
+
+def _search_index_drifted():
+    """Grobe Konsistenzprüfung: enthält der Index genau so viele Einträge wie es Probleme gibt?"""
+    indexed = db.session.execute(db.select(db.func.count()).select_from(problem_fts)).scalar()
+    expected = (db.session.query(db.func.count(Problem.id)).scalar()
+                + db.session.query(db.func.count(ArchivedProblem.id)).scalar())
+    return indexed != expected
+
+
+def ensure_search_index():
+    """
+    Legt den FTS5-Index an und füllt ihn, falls er noch fehlt
+    
+    Ein vorhandener Index wird neu aufgebaut, wenn seine Einträge nicht zur Anzahl der Probleme
+    passen (z.B. weil er zeitweise nicht gepflegt wurde).
+    
+    Returns:
+        True wenn die Volltextsuche verfügbar ist, False bei anderer Datenbank oder SQLite ohne FTS5
+    """
+    if db.engine.dialect.name != 'sqlite':
+        _search_index_state['unavailable'] = True
+        return False
+    _search_index_state['ready'] = False
+    if _search_index_ready(db.session.connection()):
+        if _search_index_drifted():
+            app.logger.warning("Volltext-Index passt nicht zu den Problemen - wird neu aufgebaut")
+            rebuild_search_index()
+        return True
+    try:
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE problem_fts USING fts5("
+            + ', '.join(SEARCH_INDEX_COLUMNS)
+            + ", tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+    except OperationalError as e:
+        db.session.rollback()
+        app.logger.warning(f"Volltextsuche nicht verfügbar (FTS5 fehlt): {e}")
+        _search_index_state['unavailable'] = True
+        return False
+    _search_index_state['ready'] = True
+    rebuild_search_index()
+    return True
+
+
+def build_search_match(term):
+    """Baut aus der Benutzereingabe eine sichere FTS5-Abfrage: jedes Wort als Präfix, alle Wörter müssen vorkommen"""
+    words = re.findall(r'\w+', term or '')[:SEARCH_MAX_TERMS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _search_match_clause(match):
+    return db.literal_column('problem_fts').op('MATCH')(match)
+
+
+def apply_search_filter(query, term, model=Problem):
+    """Schränkt eine Problem- oder Archiv-Query auf Treffer der Volltextsuche ein (Fallback: LIKE)"""
+    if not term:
+        return query
+    if _search_index_ready(db.session.connection()):
+        match = build_search_match(term)
+        if not match:
+            return query
+        matching_ids = db.select(problem_fts.c.rowid).where(_search_match_clause(match))
+        return query.filter(model.id.in_(matching_ids))
+    return query.filter(
+        model.problem.contains(term) |
+        model.loeschen_kommentar.contains(term) |
+        model.massnahmen.contains(term) |
+        model.progress_updates.contains(term)
+    )
+
+
+def _highlight_snippet(snippet):
+    """Escaped den Snippet-Text und setzt die Treffer-Markierungen als <mark>"""
+    start, end = SEARCH_HIGHLIGHT
+    return Markup(str(escape(snippet)).replace(start, '<mark>').replace(end, '</mark>'))
+
+
+def _snippet_expr():
+    # Spalte -1: FTS5 wählt die Spalte mit den meisten Treffern
+    return db.func.snippet(db.literal_column('problem_fts'), -1, SEARCH_HIGHLIGHT[0], SEARCH_HIGHLIGHT[1], '…', 12)
+
+
+def search_snippets(problem_ids, term):
+    """Hervorgehobene Textausschnitte {problem_id: Markup} für die angezeigten Treffer"""
+    if not term or not problem_ids or not _search_index_ready(db.session.connection()):
+        return {}
+    match = build_search_match(term)
+    if not match:
+        return {}
+    rows = db.session.execute(
+        db.select(problem_fts.c.rowid, _snippet_expr()).where(
+            _search_match_clause(match), problem_fts.c.rowid.in_(list(problem_ids))
+        )
+    ).all()
+    return {problem_id: _highlight_snippet(snippet) for problem_id, snippet in rows}
+
+
+def search_problems_ranked(term, limit):
+    """
+    Volltextsuche nach Relevanz (bm25) über alle Probleme
+    
+    Returns:
+        Liste von (Problem bzw. ArchivedProblem, Snippet-Markup) - bester Treffer zuerst
+    """
+    match = build_search_match(term)
+    if not match or not _search_index_ready(db.session.connection()):
+        return []
+    rank = db.func.bm25(db.literal_column('problem_fts'), *SEARCH_COLUMN_WEIGHTS)
+    hits = db.session.execute(
+        db.select(problem_fts.c.rowid, _snippet_expr()).where(_search_match_clause(match)).order_by(rank).limit(limit)
+    ).all()
+    hit_ids = [h[0] for h in hits]
+    problems_by_id = {p.id: p for p in Problem.query.filter(Problem.id.in_(hit_ids)).all()}
+    missing_ids = [pid for pid in hit_ids if pid not in problems_by_id]
+    if missing_ids:
+        # Archivierte Probleme behalten ihren Eintrag im Suchindex
+        problems_by_id.update({p.id: p for p in ArchivedProblem.query.filter(ArchivedProblem.id.in_(missing_ids)).all()})
+    return [(problems_by_id[pid], _highlight_snippet(snippet)) for pid, snippet in hits if pid in problems_by_id]
+
+
+@event.listens_for(MaterialItem, 'after_insert')
+@event.listens_for(MaterialItem, 'after_update')
+@event.listens_for(MaterialItem, 'after_delete')
+def _material_changed(mapper, connection, target):
+    """Material-Änderungen markieren das zugehörige Problem als geändert (für den Delta-Refresh)"""
+    problem_table = Problem.__table__
+    connection.execute(
+        problem_table.update()
+        .where(problem_table.c.id == target.problem_id)
+        .values(updated_at=datetime.now(timezone.utc))
+    )
+
+
+# Gelöschte Probleme für den Delta-Refresh merken (Zeitpunkt, ID) - begrenzt und nur im Prozess
+PROBLEM_CHANGE_LOG_STARTED_AT = datetime.now(timezone.utc)
+_deleted_problems = deque(maxlen=1000)
+
+
+@event.listens_for(Problem, 'after_delete')
+def _problem_deleted(mapper, connection, target):
+    record_problem_deletion(target.id)
+
+
+def record_problem_deletion(problem_id):
+    """Merkt ein gelöschtes Problem vor, damit offene Listen die Zeile entfernen"""
+    _deleted_problems.append((datetime.now(timezone.utc), problem_id))
+
+
+class EventBroker:
+    """
+    In-Process Fan-out für Live-Events (Server-Sent Events)
+    
+    Jeder Client bekommt eine eigene, begrenzte Queue. Läuft eine Queue voll
+    (Client zu langsam), wird sie geleert und durch ein einzelnes 'resync'-Event
+    ersetzt - der Client holt sich dann den Stand über den Delta-Refresh.
+    """
+    
+    def __init__(self, queue_size=50):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+    
+    def subscribe(self, max_clients=None):
+        """Registriert einen Client, gibt seine Queue zurück (None wenn das Limit erreicht ist)"""
+        with self._lock:
+            if max_clients is not None and len(self._subscribers) >= max_clients:
+                return None
+            client_queue = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.add(client_queue)
+            return client_queue
+    
+    def unsubscribe(self, client_queue):
+        with self._lock:
+            self._subscribers.discard(client_queue)
+    
+    @property
+    def client_count(self):
+        return len(self._subscribers)
+    
+    def publish(self, event_type, data):
+        """Verteilt ein Event an alle verbundenen Clients, ohne zu blockieren"""
+        event = {'type': event_type, 'data': data}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for client_queue in subscribers:
+            try:
+                client_queue.put_nowait(event)
+            except queue.Full:
+                self._resync(client_queue)
+    
+    @staticmethod
+    def _resync(client_queue):
+        try:
+            while True:
+                client_queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            client_queue.put_nowait({'type': 'resync', 'data': {}})
+        except queue.Full:
+            pass
+
+
+event_broker = EventBroker(queue_size=app.config['SSE_QUEUE_SIZE'])
+
+
+def publish_problem_event(event_type, problem, **extra):
+    """Sendet ein Live-Event zu einem Problem (nach dem Commit aufrufen)"""
+    data = {
+        'problem_id': problem.id,
+        'bohrturm': problem.bohrturm,
+        'status': problem.status,
+    }
+    data.update(extra)
+    event_broker.publish(event_type, data)
+
+
+class FileCleanupWorker:
+    """
+    Hintergrund-Thread, der Upload-Dateien gelöschter Probleme entfernt
+    
+    Requests übergeben nach dem Commit nur die Dateinamen und warten nicht auf das Dateisystem.
+    Der Thread wird beim ersten Auftrag gestartet (auch nach einem Fork des Servers).
+    """
+    
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def enqueue(self, filenames):
+        """Übergibt Dateinamen (relativ zu UPLOAD_FOLDER) zum Löschen"""
+        filenames = [name for name in filenames if name]
+        if not filenames:
+            return
+        self._ensure_thread()
+        for name in filenames:
+            self._queue.put(name)
+    
+    def wait_idle(self):
+        """Blockiert, bis alle übergebenen Dateien verarbeitet sind (für Skripte)"""
+        self._queue.join()
+    
+    @property
+    def pending(self):
+        return self._queue.qsize()
+    
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='file-cleanup', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            name = self._queue.get()
+            try:
+                with app.app_context():
+                    self._remove_if_unused(name)
+            except Exception as e:
+                logging.warning(f"Datei {name} konnte nicht gelöscht werden: {e}")
+            finally:
+                self._queue.task_done()
+    
+    def _remove_if_unused(self, name):
+        """
+        Löscht Datei und Varianten, sofern kein UploadedImage-Eintrag (mehr) auf sie verweist
+        
+        Prüfen und Löschen laufen unter der Schreibsperre der Datenbank. save_uploaded_files legt
+        Eintrag und Datei ebenfalls unter der Sperre an - ein erneuter Upload desselben Inhalts
+        wartet also, bis hier fertig gelöscht wurde, bzw. wird hier als Verweis gesehen.
+        """
+        with db.engine.connect() as connection:
+            if connection.dialect.name == 'sqlite':
+                connection.exec_driver_sql('BEGIN IMMEDIATE')
+            if connection.execute(
+                db.select(UploadedImage.id).where(UploadedImage.filename == name)
+            ).first():
+                return False
+            paths = [os.path.join(app.config['UPLOAD_FOLDER'], name)]
+            paths += [derivative_path(app.config['IMAGE_DERIVATIVE_FOLDER'], variant, name)
+                      for variant in DERIVATIVE_SIZES]
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            return True
+
+
+file_cleanup = FileCleanupWorker()
+
+
+# Globale Daten-Version für Conditional GET (ETag / Last-Modified)
+# Liegt in der Datenbank (DataVersion) und wird in derselben Transaktion erhöht, die Problem-,
+# MaterialItem- oder User-Daten ändert - so sehen alle Worker-Prozesse und Scripts denselben Stand.
+# Vor der ersten Änderung (Zeile fehlt) gilt der Prozessstart als letzte Änderung.
+_DATA_VERSION_FALLBACK = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def bump_data_version(connection=None):
+    """
+    Markiert die Daten als geändert - in der übergebenen Transaktion oder in einer eigenen
+    (z.B. nach direktem SQL ohne ORM oder aus Scripts)
+    """
+    if connection is None:
+        with db.engine.begin() as connection:
+            return bump_data_version(connection)
+    version_table = DataVersion.__table__
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    result = connection.execute(
+        version_table.update().where(version_table.c.id == 1).values(
+            counter=version_table.c.counter + 1, changed_at=now,
+        )
+    )
+    if result.rowcount == 0:
+        connection.execute(version_table.insert().values(id=1, counter=1, changed_at=now))
+
+
+def get_data_version():
+    """Gibt (Version, Zeitpunkt der letzten Änderung) zurück - eine Abfrage auf den Primärschlüssel"""
+    version_table = DataVersion.__table__
+    row = db.session.execute(
+        db.select(version_table.c.counter, version_table.c.changed_at).where(version_table.c.id == 1)
+    ).first()
+    if row is None:
+        return f"0-{int(_DATA_VERSION_FALLBACK.timestamp())}", _DATA_VERSION_FALLBACK
+    changed_at = row.changed_at.replace(tzinfo=timezone.utc)
+    # Mit Zeitstempel, damit eine neu angelegte Datenbank keine alten ETags wiederverwendet
+    return f"{row.counter}-{int(changed_at.timestamp())}", changed_at
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_data_changes(session, flush_context):
+    """Erhöht die Daten-Version einmal pro Transaktion - ein Rollback nimmt die Erhöhung mit zurück"""
+    if session.info.get('data_version_bumped'):
+        return
+    tracked = (Problem, MaterialItem, User)
+    if any(isinstance(obj, tracked) for obj in (*session.new, *session.dirty, *session.deleted)):
+        bump_data_version(session.connection())
+        session.info['data_version_bumped'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _reset_data_version_flag(session):
+    session.info.pop('data_version_bumped', None)
+
+
+def conditional_view(time_bucket_seconds=None):
+    """
+    Conditional GET für Seiten, die nur aus Problem/Material/User-Daten bestehen
+    
+    Der ETag setzt sich aus der globalen Daten-Version, der URL (inkl. Filter) und den
+    benutzerspezifischen Teilen (Benutzer, Admin, Anlage) zusammen. Stimmt er mit
+    If-None-Match überein (bzw. If-Modified-Since ist aktuell), wird sofort 304
+    geantwortet - nur mit der Abfrage der Daten-Version, ohne Template-Rendering.
+    
+    Args:
+        time_bucket_seconds: für zeitabhängige Inhalte (z.B. "älter als 24h") -
+            der ETag ändert sich zusätzlich spätestens nach dieser Zeit
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Ausstehende Flash-Meldungen müssen gerendert werden
+            if request.method != 'GET' or 'user' not in session or '_flashes' in session:
+                return view(*args, **kwargs)
+            
+            username = session['user']
+            version, changed_at = get_data_version()
+            parts = [version, request.full_path, username,
+                     str(username in ['nils', 'Admin']), str(get_user_facility(username))]
+            if time_bucket_seconds:
+                parts.append(str(int(time.time() // time_bucket_seconds)))
+            etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+            
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (not time_bucket_seconds and request.if_modified_since is not None
+                                and changed_at <= request.if_modified_since)
+            
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            response.last_modified = changed_at
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
 def allowed_file(filename):
     """Überprüft, ob die Datei einen erlaubten Dateityp hat"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def optimize_image(filepath, max_size=(1920, 1080), quality=85):
-    """Optimiert Bilder für bessere Performance und Speicherplatz"""
-    try:
-        with Image.open(filepath) as img:
-            # Konvertiere zu RGB falls RGBA (für JPEG)
-            if img.mode in ('RGBA', 'LA'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Größe anpassen falls zu groß
-            if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Als JPEG mit Qualitätsoptimierung speichern
-            img.save(filepath, 'JPEG', quality=quality, optimize=True)
-    except Exception as e:
-        logging.warning(f"Bildoptimierung fehlgeschlagen für {filepath}: {e}")
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def _store_temp_upload(file):
+    """
+    Schreibt einen Upload in eine Temp-Datei in UPLOAD_FOLDER und berechnet dabei seinen Namen
+    
+    Der Dateiname entsteht aus dem SHA-256 des Inhalts, auf zwei Verzeichnisebenen verteilt
+    (z.B. 'ab/cd/abcd...ef.jpg') - gleiche Dateien bekommen den gleichen Namen.
+    
+    Returns:
+        (Dateiname, Pfad der Temp-Datei)
+    """
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=app.config['UPLOAD_FOLDER'], suffix='.upload', delete=False) as temp:
+        for chunk in iter(lambda: file.stream.read(64 * 1024), b''):
+            digest.update(chunk)
+            temp.write(chunk)
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    if extension == 'jpeg':
+        extension = 'jpg'
+    content_hash = digest.hexdigest()
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.{extension}", temp.name
 
 
 def save_uploaded_files(files):
-    """Speichert hochgeladene Dateien und gibt Liste der Dateinamen zurück"""
-    saved_files = []
+    """
+    Speichert hochgeladene Dateien inhaltsadressiert und gibt Liste der Dateinamen zurück
+    
+    Ist der Inhalt bereits gespeichert, wird nur der Verweiszähler in UploadedImage erhöht.
+    Neue Bilder werden roh abgelegt (pending); nach dem Commit übergibt der Aufrufer sie mit
+    image_pipeline.submit() an den Bild-Worker-Pool.
+    
+    Die Dateien werden vor dem ersten SQL-Statement in Temp-Dateien geschrieben. In der
+    Transaktion (nach dem UPDATE hält sie die Schreibsperre) werden sie nur noch umbenannt -
+    so kann file_cleanup eine gerade wieder hochgeladene Datei nicht löschen.
+    """
+    stored = {}
     for file in files:
         if file and file.filename != '' and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Eindeutigen Dateinamen erstellen
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-            filename = timestamp + filename
+            filename, temp_path = _store_temp_upload(file)
+            if filename in stored:
+                os.remove(temp_path)
+            else:
+                stored[filename] = temp_path
+    
+    upload_table = UploadedImage.__table__
+    connection = db.session.connection()
+    try:
+        for filename, temp_path in stored.items():
+            result = connection.execute(
+                upload_table.update()
+                .where(upload_table.c.filename == filename, upload_table.c.ref_count > 0)
+                .values(ref_count=upload_table.c.ref_count + 1)
+            )
+            if result.rowcount:
+                continue
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            # Bildoptimierung für bessere Performance
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-                optimize_image(filepath)
-            
-            saved_files.append(filename)
-    return saved_files
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            os.replace(temp_path, filepath)
+            # Bildoptimierung übernimmt der Bild-Worker-Pool
+            connection.execute(upload_table.delete().where(upload_table.c.filename == filename))
+            connection.execute(upload_table.insert().values(
+                filename=filename, ref_count=1,
+                status='pending' if filename.endswith(IMAGE_EXTENSIONS) else 'ready',
+                created_at=datetime.now(timezone.utc),
+            ))
+    finally:
+        # Bereits gespeicherter Inhalt (und Reste nach einem Fehler)
+        for temp_path in stored.values():
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return list(stored)
+
+
+def release_uploads(connection, filenames):
+    """
+    Gibt Verweise auf hochgeladene Dateien frei (innerhalb der laufenden Transaktion)
+    
+    Returns:
+        Dateinamen, auf die nichts mehr verweist - nach dem Commit an file_cleanup übergeben
+    """
+    counts = Counter(name for name in filenames if name)
+    if not counts:
+        return []
+    upload_table = UploadedImage.__table__
+    for name, count in counts.items():
+        connection.execute(
+            upload_table.update().where(upload_table.c.filename == name)
+            .values(ref_count=upload_table.c.ref_count - count)
+        )
+    remaining = dict(connection.execute(
+        db.select(upload_table.c.filename, upload_table.c.ref_count)
+        .where(upload_table.c.filename.in_(list(counts)))
+    ).all())
+    # Dateien ohne Eintrag stammen aus der Zeit vor der Verweiszählung und gehören genau einem Problem
+    orphaned = [name for name in counts if remaining.get(name, 0) <= 0]
+    if orphaned:
+        connection.execute(upload_table.delete().where(upload_table.c.filename.in_(orphaned)))
+    return orphaned
+
+
+class ImagePipeline:
+    """
+    Optimiert hochgeladene Bilder parallel in einem Prozess-Pool und erzeugt ihre Varianten
+    
+    Der Pool wird beim ersten Auftrag gestartet ('spawn' - die Worker erben weder Threads noch
+    Datenbankverbindungen) und danach wiederverwendet. Jeder Worker importiert beim Start das
+    Hauptmodul neu (bei python app.py also app.py, ohne den __main__-Block), die Aufträge selbst
+    laufen nur mit image_processing. Lassen sich keine Prozesse starten, wird auf Threads ausgewichen.
+    Nach jedem Bild wird der Status in UploadedImage festgehalten. Fehlende Varianten älterer
+    Bilder werden über submit_derivatives ebenfalls im Pool nachgezogen.
+    """
+    
+    def __init__(self):
+        self._executor = None
+        self._use_threads = False
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._derivatives_pending = set()
+        self._idle = threading.Condition(self._lock)
+    
+    def submit(self, filenames):
+        """Übergibt Bilder (relativ zu UPLOAD_FOLDER) zur Optimierung - nach dem Commit aufrufen"""
+        filenames = [name for name in filenames if name and name.lower().endswith(IMAGE_EXTENSIONS)]
+        if not filenames:
+            return
+        # Bereits verarbeitete Bilder (erneut hochgeladener Inhalt) nicht noch einmal komprimieren
+        pending = {row.filename for row in db.session.query(UploadedImage.filename)
+                   .filter(UploadedImage.filename.in_(filenames), UploadedImage.status == 'pending')}
+        for name in filenames:
+            if name not in pending:
+                continue
+            with self._lock:
+                if name in self._pending:
+                    continue
+                self._pending.add(name)
+            job = (process_upload, app.config['UPLOAD_FOLDER'], name, app.config['IMAGE_DERIVATIVE_FOLDER'])
+            try:
+                executor, future = self._submit_job(job)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._finish(name, e)
+                continue
+            future.add_done_callback(lambda f, name=name, executor=executor: self._done(name, executor, f))
+    
+    def submit_derivatives(self, filename):
+        """
+        Erzeugt fehlende Varianten eines Bildes im Hintergrund (Aufruf beim Abruf einer fehlenden Variante)
+        
+        Bilder, die noch optimiert werden, bekommen ihre Varianten ohnehin; jedes Bild wird nur
+        einmal gleichzeitig eingereiht.
+        """
+        with self._lock:
+            if filename in self._pending or filename in self._derivatives_pending:
+                return
+            self._derivatives_pending.add(filename)
+        job = (create_missing_derivatives, app.config['UPLOAD_FOLDER'], filename, app.config['IMAGE_DERIVATIVE_FOLDER'])
+        try:
+            executor, future = self._submit_job(job)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._finish_derivatives(filename, e)
+            return
+        future.add_done_callback(lambda f: self._derivatives_done(filename, executor, f))
+    
+    def wait_idle(self, timeout=None):
+        """Blockiert, bis alle übergebenen Bilder verarbeitet sind (für Skripte)"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending and not self._derivatives_pending, timeout)
+    
+    @property
+    def pending(self):
+        return len(self._pending)
+    
+    def _ensure_executor(self):
+        if self._executor is None:
+            workers = max(1, app.config['IMAGE_WORKERS'])
+            if not self._use_threads:
+                try:
+                    self._executor = ProcessPoolExecutor(max_workers=workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+                except (OSError, NotImplementedError, ValueError) as e:
+                    logging.warning(f"Prozess-Pool nicht verfügbar, Bilder werden in Threads optimiert: {e}")
+                    self._use_threads = True
+            if self._use_threads:
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image')
+        return self._executor
+    
+    def _submit_job(self, job):
+        """Übergibt einen Auftrag an den Pool und gibt (Pool, Future) zurück"""
+        with self._lock:
+            executor = self._ensure_executor()
+        try:
+            return executor, executor.submit(*job)
+        except OSError as e:
+            # Prozesse lassen sich nicht starten (z.B. eingeschränkte Umgebung)
+            logging.warning(f"Prozess-Pool nicht verfügbar, Bilder werden in Threads optimiert: {e}")
+            self._use_threads = True
+            self._reset(executor)
+            with self._lock:
+                executor = self._ensure_executor()
+            return executor, executor.submit(*job)
+        except (BrokenProcessPool, RuntimeError):
+            self._reset(executor)
+            raise
+    
+    def _reset(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _done(self, name, executor, future):
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            # Ein Worker ist abgestürzt - der nächste Auftrag startet einen neuen Pool
+            self._reset(executor)
+        self._finish(name, error)
+    
+    def _finish(self, name, error):
+        if error:
+            logging.warning(f"Bildoptimierung fehlgeschlagen für {name}: {error}")
+        try:
+            with app.app_context():
+                UploadedImage.query.filter_by(filename=name).update({
+                    'status': 'failed' if error else 'ready',
+                    'error': str(error)[:500] if error else None,
+                    'processed_at': datetime.now(timezone.utc),
+                })
+                db.session.commit()
+                bump_data_version()
+        except Exception as e:
+            logging.error(f"Bildstatus für {name} konnte nicht gespeichert werden: {e}")
+        finally:
+            with self._idle:
+                self._pending.discard(name)
+                self._idle.notify_all()
+    
+    def _derivatives_done(self, name, executor, future):
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._reset(executor)
+        self._finish_derivatives(name, error)
+    
+    def _finish_derivatives(self, name, error):
+        if error:
+            logging.warning(f"Bild-Varianten für {name} konnten nicht erzeugt werden: {error}")
+        with self._idle:
+            self._derivatives_pending.discard(name)
+            self._idle.notify_all()
+
+
+image_pipeline = ImagePipeline()
+
+
+def resume_image_processing():
+    """Übergibt beim Start alle noch nicht verarbeiteten Bilder erneut an den Pool"""
+    filenames = [row.filename for row in UploadedImage.query.filter_by(status='pending')]
+    image_pipeline.submit(filenames)
+    return len(filenames)
+
+
+@app.template_global()
+def pending_image_files():
+    """Dateinamen der Bilder, die noch optimiert werden (einmal pro Request abgefragt)"""
+    if 'pending_image_files' not in g:
+        g.pending_image_files = {
+            row.filename for row in
+            db.session.query(UploadedImage.filename).filter(UploadedImage.status == 'pending')
+        }
+    return g.pending_image_files
+
+
+@app.template_global()
+def upload_srcset(filename):
+    """srcset mit allen Varianten eines hochgeladenen Bildes"""
+    return ', '.join(
+        f"{url_for('upload_variant', variant=variant, filename=filename)} {size[0]}w"
+        for variant, size in DERIVATIVE_SIZES.items()
+    )
 
 
 class OneTimeToken(db.Model):
@@ -256,6 +1557,27 @@ def create_admin():
         print(f"🔐 SUPERADMIN ACCOUNT: Username: Admin, Password: {secure_pw2}")
     db.session.commit()
 
+def init_database():
+    """
+    Bereitet die Datenbank beim Serverstart vor (python app.py, launcher.py und wsgi.py bzw. flask run)
+    
+    Legt fehlende Tabellen und Admin-Accounts an, stellt ältere Datenbanken um,
+    prüft Dashboard-Zähler und Volltext-Index, erhöht die Daten-Version (neue Templates
+    nach einem Update sollen nicht per 304 übergangen werden) und übergibt beim letzten Lauf
+    liegengebliebene Bilder erneut an den Bild-Pool. Startet anschließend die
+    Outbox-Worker, damit offene und fällige E-Mails ohne neuen Request versendet werden.
+    """
+    with app.app_context():
+        db.create_all()
+        create_admin()
+        ensure_problem_autoincrement()
+        ensure_problem_priority_column()
+        ensure_status_counters()
+        ensure_search_index()
+        bump_data_version()
+        resume_image_processing()
+    mail_outbox.start()
+
 def get_responsible_user(anlage, abteilung):
     """
     Automatische Zuweisung des Verantwortlichen basierend auf Anlage und Abteilung
@@ -329,39 +1651,97 @@ def can_edit_facility(username, facility):
     user_facility = get_user_facility(username)
     return user_facility == facility
 
-def get_rsc_for_facility(facility):
-    """Ermittelt den RSC (Responsible Site Coordinator) für eine Anlage"""
-    print(f"🔍 DEBUG get_rsc_for_facility: Suche RSC für Anlage '{facility}'")
-    
-    # RSC-Zuordnung basierend auf Anlagen-Namen - suche direkt nach RSC-User
-    rsc_mapping = {
-        'T-700': ['T700 RSC'],     # T-700 RSC 
-        'T-46': ['T46 RSC'],       # T-46 RSC
-        'T-208': ['T208 RSC'],     # T-208 RSC  
-        'T-207': ['T207 RSC']      # T-207 RSC
-    }
-    
-    rsc_users = rsc_mapping.get(facility, [])
-    print(f"🔍 DEBUG get_rsc_for_facility: RSC-Kandidaten für '{facility}': {rsc_users}")
-    
-    # Suche nach verfügbaren RSC-Usern
-    for username in rsc_users:
-        print(f"🔍 DEBUG get_rsc_for_facility: Suche User '{username}'...")
-        user = User.query.filter_by(username=username).first()
-        if user:
-            print(f"🔍 DEBUG get_rsc_for_facility: ✅ RSC gefunden: {user.username} ({user.email})")
-            return user
-        else:
-            print(f"🔍 DEBUG get_rsc_for_facility: ❌ User '{username}' nicht in DB gefunden")
+# RSC-Zuordnung basierend auf Anlagen-Namen
+RSC_MAPPING = {
+    'T-700': ['T700 RSC'],     # T-700 RSC 
+    'T-46': ['T46 RSC'],       # T-46 RSC
+    'T-208': ['T208 RSC'],     # T-208 RSC  
+    'T-207': ['T207 RSC']      # T-207 RSC
+}
+
+# Prozessweiter Cache: Anlage -> RSC-Eintrag (id, username, email)
+# Wird beim ersten Zugriff mit einer einzigen Abfrage geladen und nach jedem Commit verworfen,
+# der einen RSC-Kandidaten oder Admin anlegt, ändert oder löscht
+RSC_DIRECTORY_USERS = {username for usernames in RSC_MAPPING.values() for username in usernames} | {'nils', 'Admin'}
+_rsc_directory = None
+_rsc_directory_generation = 0
+_rsc_directory_lock = threading.Lock()
+
+
+def _load_rsc_directory():
+    """Lädt alle RSC-Kandidaten und Admins in einer Abfrage"""
+    users = User.query.filter(User.username.in_(RSC_DIRECTORY_USERS)).order_by(User.id).all()
+    entries = {user.username: {'id': user.id, 'username': user.username, 'email': user.email} for user in users}
     
     # Fallback: Erster Admin wenn kein RSC gefunden
-    print(f"🔍 DEBUG get_rsc_for_facility: Kein RSC gefunden, verwende Admin-Fallback")
-    admin_user = User.query.filter(User.username.in_(['nils', 'Admin'])).first()
-    if admin_user:
-        print(f"🔍 DEBUG get_rsc_for_facility: Admin-Fallback: {admin_user.username}")
-    else:
-        print(f"🔍 DEBUG get_rsc_for_facility: ❌ Kein Admin gefunden!")
-    return admin_user
+    fallback = next((entries[user.username] for user in users if user.username in ['nils', 'Admin']), None)
+    
+    directory = {None: fallback}
+    for facility, usernames in RSC_MAPPING.items():
+        directory[facility] = next((entries[u] for u in usernames if u in entries), fallback)
+    return directory
+
+
+def get_rsc_directory():
+    """Gibt die Zuordnung Anlage -> RSC-Eintrag zurück (gecacht, ohne DB-Zugriff nach dem ersten Laden)"""
+    global _rsc_directory
+    directory = _rsc_directory
+    if directory is None:
+        with _rsc_directory_lock:
+            generation = _rsc_directory_generation
+        directory = _load_rsc_directory()
+        with _rsc_directory_lock:
+            # Während des Ladens verworfen oder ungespeicherte Benutzer-Änderungen in dieser Session
+            # mitgelesen: Ergebnis nur für diesen Aufruf verwenden, nicht cachen
+            pending = db.session.info.get('rsc_users_changed', set()) & RSC_DIRECTORY_USERS
+            if generation == _rsc_directory_generation and not pending:
+                _rsc_directory = directory
+                logging.info(f"RSC-Zuordnung geladen für {len(RSC_MAPPING)} Anlagen")
+    return directory
+
+
+def invalidate_rsc_directory():
+    """Verwirft den RSC-Cache (z.B. nach direktem SQL auf die User-Tabelle)"""
+    global _rsc_directory, _rsc_directory_generation
+    with _rsc_directory_lock:
+        _rsc_directory = None
+        _rsc_directory_generation += 1
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_rsc_changes(session, flush_context):
+    """Merkt sich die geänderten Benutzernamen (alt und neu) - verworfen wird erst nach dem Commit"""
+    changed = session.info.setdefault('rsc_users_changed', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.username)
+            changed.update(db.inspect(obj).attrs.username.history.deleted or ())
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_rsc_on_commit(session):
+    if session.info.pop('rsc_users_changed', set()) & RSC_DIRECTORY_USERS:
+        invalidate_rsc_directory()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rsc_changes(session):
+    session.info.pop('rsc_users_changed', None)
+
+
+def resolve_rsc(facility):
+    """Ermittelt den RSC-Eintrag (dict mit id, username, email) für eine Anlage oder None"""
+    directory = get_rsc_directory()
+    return directory.get(facility, directory[None])
+
+
+def get_rsc_for_facility(facility):
+    """Ermittelt den RSC (Responsible Site Coordinator) für eine Anlage"""
+    entry = resolve_rsc(facility)
+    if not entry:
+        logging.warning(f"Kein RSC und kein Admin-Fallback für Anlage '{facility}' gefunden")
+        return None
+    return db.session.get(User, entry['id'])
 
 def can_manage_material_orders(username, facility):
     """
@@ -384,99 +1764,28 @@ def can_manage_material_orders(username, facility):
     if username in ['nils', 'Admin']:
         return True
     
-    # Prüfe ob der User der RSC für diese Anlage ist
-    rsc_user = get_rsc_for_facility(facility)
-    if rsc_user and rsc_user.username == username:
-        return True
-    
-    return False
+    # Prüfe ob der User der RSC für diese Anlage ist (gecachte Zuordnung, keine DB-Abfrage)
+    rsc = resolve_rsc(facility)
+    return bool(rsc) and rsc['username'] == username
 
 # E-Mail-Funktionen
+def render_email(name, **context):
+    """
+    Rendert HTML- und Text-Teil einer E-Mail aus einem gemeinsamen Kontext
+    
+    Vorlagen: templates/emails/<name>.html (autoescaped) und <name>.txt - Jinja kompiliert
+    sie einmal und hält sie im Template-Cache.
+    """
+    context.setdefault('base_url', app.config['APP_BASE_URL'])
+    html_body = app.jinja_env.get_template(f'emails/{name}.html').render(context)
+    text_body = app.jinja_env.get_template(f'emails/{name}.txt').render(context)
+    return html_body, text_body
+
 def send_problem_assignment_email(user, problem):
     """Lokaler Email-Bot: Speichert Problem-Zuweisungs-Email lokal (keine Google Mail)"""
     try:
         subject = f"Neues Problem zugewiesen: {problem.bohrturm} - {problem.system}"
-        
-        # HTML-E-Mail-Template
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; color: #333; line-height: 1.6;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: linear-gradient(135deg, #1e3a8a 0%, #374151 100%); color: white; padding: 20px; border-radius: 10px; text-align: center; margin-bottom: 20px;">
-                    <h1 style="margin: 0; font-size: 24px;">🔧 Neues Problem zugewiesen</h1>
-                    <p style="margin: 10px 0 0 0; opacity: 0.9;">Wartungs-App Benachrichtigung</p>
-                </div>
-                
-                <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; border-left: 4px solid #1e3a8a;">
-                    <h3 style="color: #1e3a8a; margin-top: 0;">Hallo {user.username},</h3>
-                    <p>Ihnen wurde ein neues Problem zur Bearbeitung zugewiesen:</p>
-                </div>
-                
-                <div style="background: white; border: 1px solid #dee2e6; border-radius: 8px; margin: 20px 0; overflow: hidden;">
-                    <div style="background: #1e3a8a; color: white; padding: 15px;">
-                        <h3 style="margin: 0;">📋 Problem-Details</h3>
-                    </div>
-                    <div style="padding: 20px;">
-                        <table style="width: 100%; border-collapse: collapse;">
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #1e3a8a; width: 120px;">🏗️ Anlage:</td>
-                                <td style="padding: 8px 0;">{problem.bohrturm}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #1e3a8a;">🏢 Abteilung:</td>
-                                <td style="padding: 8px 0;">{problem.abteilung}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #1e3a8a;">⚙️ System:</td>
-                                <td style="padding: 8px 0;">{problem.system}</td>
-                            </tr>
-                        </table>
-                        <hr style="margin: 15px 0; border: none; border-top: 1px solid #dee2e6;">
-                        <div>
-                            <p style="font-weight: bold; color: #1e3a8a; margin-bottom: 10px;">⚠️ Problembeschreibung:</p>
-                            <div style="background: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 15px;">
-                                {problem.problem}
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="http://192.168.188.20:5000/problem" 
-                       style="background: #1e3a8a; color: white; padding: 12px 25px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block;">
-                        🔗 Neues Problem melden
-                    </a>
-                </div>
-                
-                <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; text-align: center; font-size: 12px; color: #6c757d;">
-                    <p style="margin: 0;">Diese E-Mail wurde automatisch von der Wartungs-App gesendet.</p>
-                    <p style="margin: 5px 0 0 0;">Bitte nicht auf diese E-Mail antworten.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Text-Version als Fallback
-        text_body = f"""
-Neues Problem zugewiesen: {problem.bohrturm} - {problem.system}
-
-Hallo {user.username},
-
-Ihnen wurde ein neues Problem zur Bearbeitung zugewiesen:
-
-Anlage: {problem.bohrturm}
-Abteilung: {problem.abteilung}
-System: {problem.system}
-
-Problembeschreibung:
-{problem.problem}
-
-Bitte loggen Sie sich in die Wartungs-App ein, um ein neues Problem zu melden:
-http://192.168.188.20:5000/problem
-
-Diese E-Mail wurde automatisch gesendet.
-        """
+        html_body, text_body = render_email('problem_assignment', user=user, problem=problem)
         
         # 🤖 EMAIL-BOT: Lokale Email-Speicherung (kein Google Mail)
         return save_email_locally(
@@ -493,87 +1802,305 @@ Diese E-Mail wurde automatisch gesendet.
         logging.error(f"Fehler beim Senden der Problem-Zuweisungs-E-Mail an {user.email}: {e}")
         return False
 
+def _problem_notification_content(user, problem, responsible_users):
+    """Betreff, HTML- und Text-Teil der Benachrichtigung über eine Problem-Übernahme"""
+    subject = f"Problem wird bearbeitet: {problem.bohrturm} - {problem.system}"
+    html_body, text_body = render_email('problem_notification', user=user, problem=problem,
+                                        responsible_users=responsible_users)
+    return subject, html_body, text_body
+
 def send_problem_notification_email(user, problem, responsible_user):
-    """Benachrichtigt interessierte Parteien über Problem-Übernahme"""
+    """Benachrichtigt interessierte Parteien über Problem-Übernahme
+    
+    Weitere Übernahmen desselben Problems innerhalb von MAIL_COALESCE_SECONDS landen in derselben E-Mail.
+    """
     try:
-        subject = f"Problem wird bearbeitet: {problem.bohrturm} - {problem.system}"
-        
-        # HTML-E-Mail-Template für Interested Parties
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; color: #333; line-height: 1.6;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: linear-gradient(135deg, #1e3a8a 0%, #374151 100%); color: white; padding: 20px; border-radius: 10px; text-align: center; margin-bottom: 20px;">
-                    <h1 style="margin: 0; font-size: 24px;">🔧 Problem-Update</h1>
-                    <p style="margin: 10px 0 0 0; opacity: 0.9;">Wartungs-App Benachrichtigung</p>
-                </div>
-                
-                <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; border-left: 4px solid #1e3a8a;">
-                    <h3 style="color: #1e3a8a; margin-top: 0;">Hallo {user.username},</h3>
-                    <p>Ein Problem, das Sie interessieren könnte, wird nun bearbeitet:</p>
-                </div>
-                
-                <div style="background: white; border: 1px solid #dee2e6; border-radius: 8px; margin: 20px 0; overflow: hidden;">
-                    <div style="background: #17a2b8; color: white; padding: 15px;">
-                        <h3 style="margin: 0;">📋 Problem-Details</h3>
-                    </div>
-                    <div style="padding: 20px;">
-                        <table style="width: 100%; border-collapse: collapse;">
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #1e3a8a; width: 120px;">🏗️ Anlage:</td>
-                                <td style="padding: 8px 0;">{problem.bohrturm}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #1e3a8a;">🏢 Abteilung:</td>
-                                <td style="padding: 8px 0;">{problem.abteilung}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #1e3a8a;">⚙️ System:</td>
-                                <td style="padding: 8px 0;">{problem.system}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #1e3a8a;">👤 Bearbeiter:</td>
-                                <td style="padding: 8px 0;">{responsible_user}</td>
-                            </tr>
-                        </table>
-                        <hr style="margin: 15px 0; border: none; border-top: 1px solid #dee2e6;">
-                        <div>
-                            <p style="font-weight: bold; color: #1e3a8a; margin-bottom: 10px;">⚠️ Problembeschreibung:</p>
-                            <div style="background: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 15px;">
-                                {problem.problem}
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                
-                <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; text-align: center; font-size: 12px; color: #6c757d;">
-                    <p style="margin: 0;">Diese Benachrichtigung wurde automatisch von der Wartungs-App gesendet.</p>
-                    <p style="margin: 5px 0 0 0;">Sie wurden als interessierte Partei für dieses Problem informiert.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # 🤖 EMAIL-BOT: Lokale Email-Speicherung (kein Google Mail)
-        return save_email_locally(
-            recipient=user.email,
-            recipient_name=user.username,
-            subject=subject,
-            html_body=html_body,
-            text_body=f"Problem wird bearbeitet: {problem.bohrturm} - {problem.system}\n\nBearbeiter: {responsible_user}\n\nProblem: {problem.problem}",
-            email_type="problem_notification",
-            problem_id=problem.id
-        )
+        return enqueue_coalesced_email(user, problem, "problem_notification", responsible_user,
+                                       _problem_notification_content)
         
     except Exception as e:
         logging.error(f"Fehler beim Senden der Problem-Benachrichtigung an {user.email}: {e}")
         return False
 
-def send_and_save_email(recipient, recipient_name, subject, html_body, text_body, email_type, problem_id=None):
-    """📧 TEST-MODUS: Alle E-Mails gehen an Nils zur Kontrolle"""
+def send_and_save_email(recipient, recipient_name, subject, html_body, text_body, email_type, problem_id=None,
+                        delay_seconds=0, coalesce_items=None):
+    """
+    📧 Legt eine E-Mail in der Outbox ab - Versand und lokale Speicherung übernehmen die Outbox-Worker
+    
+    Schreibt über eine eigene Session: Commit oder Rollback der Outbox-Zeile lassen offene
+    Änderungen in db.session des Aufrufers unberührt.
+    """
+    try:
+        with Session(db.engine) as outbox_session:
+            outbox_session.add(OutboxMail(
+                recipient=recipient,
+                recipient_name=recipient_name,
+                subject=subject,
+                html_body=html_body,
+                text_body=text_body,
+                email_type=email_type,
+                problem_id=problem_id,
+                next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=delay_seconds),
+                coalesce_items=json.dumps(coalesce_items) if coalesce_items is not None else None
+            ))
+            outbox_session.commit()
+    except Exception as e:
+        logging.error(f"[OUTBOX] E-Mail konnte nicht eingereiht werden: {recipient} - {e}")
+        return False
+    
+    mail_outbox.notify()
+    return True
+
+def enqueue_coalesced_email(user, problem, email_type, item, render):
+    """
+    Reiht eine Benachrichtigung mit Sammelfenster ein
+    
+    Liegt für (Empfänger, Problem, Typ) noch eine unversendete Sammel-E-Mail in der Outbox, wird item
+    dort angehängt und die E-Mail aus allen gesammelten Einträgen neu erstellt. Sonst wird eine neue
+    E-Mail angelegt, die erst nach MAIL_COALESCE_SECONDS versendet wird.
+    render(user, problem, items) liefert (Betreff, HTML, Text).
+    Wie send_and_save_email über eine eigene Session, nicht über db.session des Aufrufers.
+    """
+    with Session(db.engine) as outbox_session:
+        merged = merge_into_pending_email(outbox_session, user, problem, email_type, item, render)
+    if merged:
+        return True
+    
+    subject, html_body, text_body = render(user, problem, [item])
+    return send_and_save_email(
+        recipient=user.email,
+        recipient_name=user.username,
+        subject=subject,
+        html_body=html_body,
+        text_body=text_body,
+        email_type=email_type,
+        problem_id=problem.id,
+        delay_seconds=app.config['MAIL_COALESCE_SECONDS'],
+        coalesce_items=[item]
+    )
+
+
+def merge_into_pending_email(outbox_session, user, problem, email_type, item, render):
+    """Hängt item an eine noch unversendete Sammel-E-Mail an, gibt False zurück, wenn keine offen ist"""
+    pending = outbox_session.query(OutboxMail).filter(
+        OutboxMail.status == 'pending',
+        OutboxMail.recipient == user.email,
+        OutboxMail.problem_id == problem.id,
+        OutboxMail.email_type == email_type,
+        OutboxMail.coalesce_items.isnot(None)
+    ).order_by(OutboxMail.id.desc()).first()
+    
+    if pending is None:
+        return False
+    
+    items = json.loads(pending.coalesce_items) + [item]
+    subject, html_body, text_body = render(user, problem, items)
+    # Nur übernehmen, solange kein Worker die E-Mail inzwischen reserviert hat
+    try:
+        merged = outbox_session.query(OutboxMail).filter(
+            OutboxMail.id == pending.id, OutboxMail.status == 'pending'
+        ).update(
+            {'subject': subject, 'html_body': html_body, 'text_body': text_body,
+             'coalesce_items': json.dumps(items)},
+            synchronize_session=False
+        )
+        outbox_session.commit()
+    except Exception as e:
+        outbox_session.rollback()
+        logging.error(f"[OUTBOX] Zusammenfassen mit #{pending.id} fehlgeschlagen: {e}")
+        return False
+    if merged:
+        logging.info(f"[OUTBOX] {email_type} für {user.email} zu #{pending.id} zusammengefasst ({len(items)} Ereignisse)")
+    return bool(merged)
+
+
+# ===== SMTP-VERBINDUNGSPOOL =====
+def smtp_delivery_enabled():
+    """Echter Versand nur mit MAIL_PASSWORD - oder gegen einen lokalen (Debug-)SMTP-Server"""
+    return bool(app.config.get('MAIL_PASSWORD')) or app.config['MAIL_SERVER'] in ('localhost', '127.0.0.1')
+
+
+class SMTPConnectionPool:
+    """
+    Hält geöffnete SMTP-Verbindungen für die Outbox-Worker offen
+    
+    Aufeinanderfolgende E-Mails nutzen dieselbe Sitzung - ein TCP/TLS/AUTH-Handshake statt
+    einem pro E-Mail. Verbindungen, die länger als MAIL_SMTP_IDLE_SECONDS ungenutzt waren,
+    werden geschlossen; trennt der Server eine wiederverwendete Verbindung, wird neu verbunden.
+    """
+    
+    def __init__(self):
+        self._idle = []  # [(Connection, zuletzt benutzt)], neueste zuletzt
+        self._lock = threading.Lock()
+    
+    def send(self, message):
+        connection, reused = self._acquire()
+        try:
+            try:
+                connection.send(message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                if not reused:
+                    raise
+                logging.info(f"[SMTP] Verbindung vom Server getrennt ({e}) - verbinde neu")
+                self._close(connection)
+                connection = self._open()
+                connection.send(message)
+        except Exception:
+            self._close(connection)
+            raise
+        self._release(connection)
+    
+    def _acquire(self):
+        now = time.monotonic()
+        max_idle = app.config['MAIL_SMTP_IDLE_SECONDS']
+        with self._lock:
+            expired = [connection for connection, last_used in self._idle if now - last_used >= max_idle]
+            self._idle = [(connection, last_used) for connection, last_used in self._idle if now - last_used < max_idle]
+            connection = self._idle.pop()[0] if self._idle else None
+        for stale in expired:
+            self._close(stale)
+        if connection is not None:
+            return connection, True
+        return self._open(), False
+    
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < app.config['MAIL_SMTP_POOL_SIZE']:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self._close(connection)
+    
+    def _open(self):
+        connection = mail.connect()
+        connection.__enter__()  # Verbindungsaufbau inkl. STARTTLS und Login
+        logging.info(f"[SMTP] Neue Verbindung zu {app.config['MAIL_SERVER']}:{app.config['MAIL_PORT']}")
+        return connection
+    
+    def _close(self, connection):
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            if connection.host:
+                connection.host.close()
+
+
+smtp_pool = SMTPConnectionPool()
+
+
+# ===== MAIL-OUTBOX =====
+OUTBOX_OPEN_STATUSES = ('pending', 'retry')
+OUTBOX_STALE_SECONDS = 600  # 'sending' länger als 10 Minuten -> Worker gilt als abgestürzt
+OUTBOX_MAX_RETRY_DELAY = 3600
+
+
+def _outbox_claimable(now):
+    return db.or_(
+        db.and_(OutboxMail.status.in_(OUTBOX_OPEN_STATUSES), OutboxMail.next_attempt_at <= now),
+        db.and_(OutboxMail.status == 'sending', OutboxMail.locked_at < now - timedelta(seconds=OUTBOX_STALE_SECONDS))
+    )
+
+
+def claim_outbox_mails(limit=1):
+    """
+    Reserviert bis zu limit fällige E-Mails für diesen Worker
+    
+    Jedes UPDATE prüft die Bedingung erneut, sodass jede E-Mail nur von einem Worker
+    (auch prozessübergreifend) übernommen wird. Gibt eine leere Liste zurück, wenn nichts fällig ist.
+    """
+    while True:
+        now = datetime.now(timezone.utc)
+        candidates = db.session.query(OutboxMail.id).filter(_outbox_claimable(now)) \
+            .order_by(OutboxMail.next_attempt_at, OutboxMail.id).limit(limit).all()
+        if not candidates:
+            db.session.rollback()
+            return []
+        
+        claimed = []
+        for candidate in candidates:
+            if OutboxMail.query.filter(OutboxMail.id == candidate.id, _outbox_claimable(now)).update(
+                {'status': 'sending', 'locked_at': now, 'attempts': OutboxMail.attempts + 1},
+                synchronize_session=False
+            ):
+                claimed.append(candidate.id)
+        db.session.commit()
+        if claimed:
+            return OutboxMail.query.filter(OutboxMail.id.in_(claimed)).order_by(OutboxMail.id).all()
+
+
+class MailOutboxWorker:
+    """
+    Worker-Pool für die Mail-Outbox
+    
+    Die Threads werden beim ersten Einreihen bzw. beim Serverstart gestartet, arbeiten alle
+    fälligen E-Mails ab und warten dann auf das nächste Einreihen (spätestens nach
+    MAIL_OUTBOX_POLL_SECONDS für Wiederholungen).
+    """
+    
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+    
+    def start(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), app.config['MAIL_OUTBOX_WORKERS']):
+                thread = threading.Thread(target=self._run, name=f'mail-outbox-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def notify(self):
+        """Weckt die Worker nach dem Einreihen einer E-Mail"""
+        if len(self._threads) < app.config['MAIL_OUTBOX_WORKERS']:
+            self.start()
+        self._wakeup.set()
+    
+    def _run(self):
+        while True:
+            # E-Mails eines Requests (z.B. alle Beteiligten) werden kurz gesammelt und als ein Stapel versendet
+            time.sleep(app.config['MAIL_OUTBOX_BATCH_WINDOW_MS'] / 1000)
+            self._wakeup.clear()
+            try:
+                with app.app_context():
+                    while self._process_next():
+                        pass
+            except Exception as e:
+                logging.error(f"[OUTBOX] Worker-Fehler: {e}")
+            self._wakeup.wait(app.config['MAIL_OUTBOX_POLL_SECONDS'])
+    
+    def _process_next(self):
+        # Ein Stapel wird nacheinander über dieselbe gepoolte SMTP-Verbindung versendet
+        entries = claim_outbox_mails(app.config['MAIL_OUTBOX_BATCH_SIZE'])
+        for entry in entries:
+            try:
+                deliver_outbox_mail(entry)
+            except Exception as e:
+                # Unerwarteter Fehler: E-Mail bleibt auf 'sending' und wird nach OUTBOX_STALE_SECONDS erneut versucht
+                db.session.rollback()
+                logging.error(f"[OUTBOX] Zustellung von #{entry.id} abgebrochen: {e}")
+        return bool(entries)
+
+
+mail_outbox = MailOutboxWorker()
+
+
+def outbox_status_counts():
+    """Anzahl der Outbox-Einträge je Status"""
+    rows = db.session.query(OutboxMail.status, db.func.count(OutboxMail.id)).group_by(OutboxMail.status).all()
+    return {status: count for status, count in rows}
+
+def deliver_outbox_mail(entry):
+    """📧 Versendet eine E-Mail aus der Outbox - TEST-MODUS: Alle E-Mails gehen an Nils zur Kontrolle"""
+    recipient = entry.recipient
+    recipient_name = entry.recipient_name
+    subject = entry.subject
+    html_body = entry.html_body
+    text_body = entry.text_body
+    email_type = entry.email_type
+    problem_id = entry.problem_id
     email_sent = False
     email_saved = False
+    error = None
     
     # TEST-MODUS: Alle E-Mails an Test-Adresse umleiten
     original_recipient = recipient
@@ -586,7 +2113,7 @@ def send_and_save_email(recipient, recipient_name, subject, html_body, text_body
     print(f"🔍 DEBUG: E-Mail geht an Test-Adresse: {recipient} (Original: {original_name})")
     
     # 1. ECHTE EMAIL VERSENDEN (Test-Modus mit Gmail)
-    if app.config.get('MAIL_PASSWORD'):
+    if smtp_delivery_enabled():
         try:
             msg = Message(
                 subject=subject,
@@ -596,62 +2123,58 @@ def send_and_save_email(recipient, recipient_name, subject, html_body, text_body
             msg.body = text_body
             msg.html = html_body
             
-            mail.send(msg)
+            smtp_pool.send(msg)
             email_sent = True
             logging.info(f"[EMAIL] REAL EMAIL SENT: {recipient} ({recipient_name}) - {subject}")
             
         except Exception as e:
+            error = str(e)
             logging.error(f"[EMAIL] REAL EMAIL FAILED: {recipient} - {e}")
     else:
         logging.warning("⚠️ MAIL_PASSWORD not set - skipping real email send")
     
-    # 2. LOKALE SPEICHERUNG (Email-Bot)
+    # Fehlgeschlagener Versand wird später wiederholt - erst der letzte Versuch wird gespeichert
+    now = datetime.now(timezone.utc)
+    if error and entry.attempts < app.config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+        delay = min(app.config['MAIL_OUTBOX_RETRY_SECONDS'] * 2 ** (entry.attempts - 1), OUTBOX_MAX_RETRY_DELAY)
+        entry.status = 'retry'
+        entry.next_attempt_at = now + timedelta(seconds=delay)
+        entry.last_error = error[:500]
+        db.session.commit()
+        logging.info(f"[OUTBOX] Erneuter Versuch für #{entry.id} in {delay}s")
+        return False
+    
+    # 2. LOKALE SPEICHERUNG (Email-Archiv, zusammen mit dem Outbox-Status committet)
     try:
-        from datetime import datetime
-        import json
-        import os
-        
-        # Email-Verzeichnis sicherstellen
-        email_dir = os.path.join(os.path.dirname(__file__), 'logs', 'emails')
-        os.makedirs(email_dir, exist_ok=True)
-        
-        # Timestamp für Dateinamen
-        timestamp = datetime.now()
-        timestamp_str = timestamp.strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp_str}_{email_type}_{problem_id or 'general'}.json"
-        
-        # Email-Daten strukturieren
-        email_data = {
-            "timestamp": timestamp.isoformat(),
-            "recipient": recipient,
-            "recipient_name": recipient_name,
-            "subject": subject,
-            "email_type": email_type,
-            "problem_id": problem_id,
-            "html_body": html_body,
-            "text_body": text_body,
-            "status": "sent_and_saved" if email_sent else "saved_only",
-            "real_email_sent": email_sent,
-            "sent_via": "hybrid_system_v1.0"
-        }
-        
-        # Email als JSON speichern
-        json_file = os.path.join(email_dir, filename)
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(email_data, f, indent=2, ensure_ascii=False)
-        
-        # HTML-Version für Browser-Vorschau speichern
-        html_file = os.path.join(email_dir, f"{timestamp_str}_{email_type}_{problem_id or 'general'}.html")
-        with open(html_file, 'w', encoding='utf-8') as f:
-            f.write(html_body)
+        db.session.add(EmailArchive(
+            timestamp=datetime.now(),
+            recipient=recipient,
+            recipient_name=recipient_name,
+            subject=subject,
+            email_type=email_type,
+            problem_id=problem_id,
+            status="sent_and_saved" if email_sent else "saved_only",
+            real_email_sent=email_sent,
+            body=EmailArchive.pack_body(html_body, text_body)
+        ))
+        db.session.flush()
         
         email_saved = True
         status_msg = "[EMAIL] REAL EMAIL + LOCAL SAVE" if email_sent else "[SAVE] LOCAL SAVE ONLY"
         logging.info(f"{status_msg}: {recipient} ({recipient_name}) - {subject}")
         
     except Exception as e:
+        db.session.rollback()
         logging.error(f"[SAVE] LOCAL SAVE FAILED: {e}")
     
+    if error:
+        entry.status = 'failed'
+    else:
+        entry.status = 'sent' if email_sent else 'saved'
+    entry.last_error = error[:500] if error else None
+    entry.sent_at = now
+    db.session.commit()
+    
     # Erfolgreich wenn mindestens eine Methode funktioniert hat
     return email_sent or email_saved
 
@@ -660,153 +2183,35 @@ def save_email_locally(recipient, recipient_name, subject, html_body, text_body,
     """Alias für die hybride Email-Funktion"""
     return send_and_save_email(recipient, recipient_name, subject, html_body, text_body, email_type, problem_id)
 
+def _material_request_content(rsc_user, problem, material_items, requester_names):
+    """Betreff, HTML- und Text-Teil der RSC-Benachrichtigung für ein oder mehrere Material-Items"""
+    if len(material_items) == 1:
+        subject = f"🛒 Material-Bestellung erforderlich: {problem.bohrturm} - {material_items[0].mm_nummer}"
+    else:
+        subject = f"🛒 Material-Bestellung erforderlich: {problem.bohrturm} - {len(material_items)} Positionen"
+    html_body, text_body = render_email('material_request', subject=subject, rsc_user=rsc_user, problem=problem,
+                                        material_items=material_items, requester_names=requester_names)
+    return subject, html_body, text_body
+
+def _render_material_request(rsc_user, problem, entries):
+    material_items = {item.id: item for item in
+                      MaterialItem.query.filter(MaterialItem.id.in_([entry['material_id'] for entry in entries]))}
+    return _material_request_content(
+        rsc_user, problem,
+        [material_items[entry['material_id']] for entry in entries if entry['material_id'] in material_items],
+        [entry['requester'] for entry in entries]
+    )
+
 def send_material_request_email(rsc_user, problem, material_item, requester_name):
-    """📧 RSC-Benachrichtigung: Material wurde angefordert - bitte bestellen"""
+    """📧 RSC-Benachrichtigung: Material wurde angefordert - bitte bestellen
+    
+    Weitere Anforderungen für dasselbe Problem innerhalb von MAIL_COALESCE_SECONDS landen in derselben E-Mail.
+    """
     try:
-        subject = f"🛒 Material-Bestellung erforderlich: {problem.bohrturm} - {material_item.mm_nummer}"
-        
-        # HTML-E-Mail-Template
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; color: #333; line-height: 1.6;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: linear-gradient(135deg, #dc2626 0%, #991b1b 100%); color: white; padding: 20px; border-radius: 10px; text-align: center; margin-bottom: 20px;">
-                    <h1 style="margin: 0; font-size: 24px;">🚨 Material-Bestellung erforderlich</h1>
-                    <p style="margin: 10px 0 0 0; opacity: 0.9;">RSC-Benachrichtigung</p>
-                </div>
-                
-                <div style="background: #fee2e2; padding: 20px; border-radius: 8px; border-left: 4px solid #dc2626;">
-                    <h3 style="color: #991b1b; margin-top: 0;">Hallo {rsc_user.username},</h3>
-                    <p>Für ein Problem wurde <strong>Material angefordert</strong> - bitte die Bestellung veranlassen und nach Lieferung PR-Nummer + Lieferdatum eintragen:</p>
-                </div>
-                
-                <div style="background: white; border: 1px solid #dc2626; border-radius: 8px; margin: 20px 0; overflow: hidden;">
-                    <div style="background: #dc2626; color: white; padding: 15px;">
-                        <h3 style="margin: 0;">🛒 Material-Details</h3>
-                    </div>
-                    <div style="padding: 20px;">
-                        <div style="margin-bottom: 15px;">
-                            <span style="font-weight: bold; color: #991b1b;">📊 MM-Nummer:</span>
-                            <span style="background: #dc2626; color: white; padding: 4px 8px; border-radius: 4px; font-family: monospace; font-size: 16px; margin-left: 10px;">{material_item.mm_nummer}</span>
-                        </div>
-                        <div style="margin-bottom: 15px;">
-                            <span style="font-weight: bold; color: #991b1b;">🏷️ Beschreibung:</span>
-                            <div style="background: #fee2e2; border: 1px solid #fca5a5; border-radius: 5px; padding: 10px; margin-top: 5px;">
-                                {material_item.beschreibung}
-                            </div>
-                        </div>
-                        <div style="margin-bottom: 15px;">
-                            <span style="font-weight: bold; color: #991b1b;">📦 Menge:</span>
-                            <span style="background: #059669; color: white; padding: 2px 6px; border-radius: 3px; margin-left: 5px;">{material_item.menge} {material_item.einheit}</span>
-                        </div>
-                    </div>
-                </div>
-
-                <div style="background: white; border: 1px solid #d1d5db; border-radius: 8px; margin: 20px 0; overflow: hidden;">
-                    <div style="background: #f3f4f6; color: #374151; padding: 15px;">
-                        <h3 style="margin: 0;">📋 Problem-Details</h3>
-                    </div>
-                    <div style="padding: 20px;">
-                        <table style="width: 100%; border-collapse: collapse;">
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #991b1b; width: 120px;">🏗️ Anlage:</td>
-                                <td style="padding: 8px 0;">{problem.bohrturm}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #991b1b;">🏢 Abteilung:</td>
-                                <td style="padding: 8px 0;">{problem.abteilung}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #991b1b;">⚙️ System:</td>
-                                <td style="padding: 8px 0;">{problem.system}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #991b1b;">👤 Angefordert von:</td>
-                                <td style="padding: 8px 0;">{requester_name}</td>
-                            </tr>
-                        </table>
-                        <hr style="margin: 15px 0; border: none; border-top: 1px solid #dee2e6;">
-                        <div>
-                            <p style="font-weight: bold; color: #991b1b; margin-bottom: 10px;">⚠️ Problembeschreibung:</p>
-                            <div style="background: #f9fafb; border: 1px solid #e5e7eb; border-radius: 5px; padding: 15px;">
-                                {problem.problem}
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                
-                <div style="background: #fef3c7; padding: 20px; border-radius: 8px; border-left: 4px solid #f59e0b; margin: 20px 0;">
-                    <h3 style="color: #92400e; margin-top: 0;">📝 Aufgaben für RSC:</h3>
-                    <ol style="margin: 0; padding-left: 20px;">
-                        <li style="margin-bottom: 8px;"><strong>Material bestellen</strong> über SAP/ERP-System</li>
-                        <li style="margin-bottom: 8px;"><strong>PR-Nummer</strong> nach Bestellung eintragen</li>
-                        <li style="margin-bottom: 8px;"><strong>Lieferdatum</strong> nach Wareneingang aktualisieren</li>
-                        <li><strong>Status</strong> auf "Geliefert" setzen</li>
-                    </ol>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="http://192.168.188.20:5000/problems#detailModal{problem.id}-material" 
-                       style="background: #dc2626; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block; margin-bottom: 15px;">
-                        📝 PR-Nummer & Lieferdatum eintragen
-                    </a>
-                    <br>
-                    <a href="http://192.168.188.20:5000/problems" 
-                       style="background: #6b7280; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; font-weight: normal; display: inline-block;">
-                        📋 Alle Probleme anzeigen
-                    </a>
-                </div>
-                
-                <div style="background: #fef3c7; padding: 15px; border-radius: 5px; text-align: center; font-size: 12px; color: #92400e;">
-                    <p style="margin: 0;">Diese E-Mail wurde automatisch von der Wartungs-App gesendet.</p>
-                    <p style="margin: 5px 0 0 0;">Bitte nicht auf diese E-Mail antworten.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Text-Version als Fallback
-        text_body = f"""
-🚨 Material-Bestellung erforderlich: {problem.bohrturm} - {material_item.mm_nummer}
-
-Hallo {rsc_user.username},
-
-MATERIAL-DETAILS:
-- MM-Nummer: {material_item.mm_nummer}
-- Beschreibung: {material_item.beschreibung}
-- Menge: {material_item.menge} {material_item.einheit}
-
-PROBLEM-DETAILS:
-- Anlage: {problem.bohrturm}
-- Abteilung: {problem.abteilung}
-- System: {problem.system}
-- Angefordert von: {requester_name}
-
-Problembeschreibung:
-{problem.problem}
-
-AUFGABEN FÜR RSC:
-1. Material bestellen über SAP/ERP-System
-2. PR-Nummer nach Bestellung eintragen
-3. Lieferdatum nach Wareneingang aktualisieren
-4. Status auf "Geliefert" setzen
-
-PR-Nummer & Lieferdatum eintragen:
-http://192.168.188.20:5000/problems#detailModal{problem.id}-material
-
-Diese E-Mail wurde automatisch gesendet.
-        """
-        
-        # 🤖 EMAIL-BOT: Lokale Email-Speicherung
-        return save_email_locally(
-            recipient=rsc_user.email,
-            recipient_name=rsc_user.username,
-            subject=subject,
-            html_body=html_body,
-            text_body=text_body,
-            email_type="material_request",
-            problem_id=problem.id
+        return enqueue_coalesced_email(
+            rsc_user, problem, "material_request",
+            {'material_id': material_item.id, 'requester': requester_name},
+            _render_material_request
         )
         
     except Exception as e:
@@ -817,146 +2222,8 @@ def send_material_order_email(besteller_user, problem, bearbeiter_name):
     """Lokaler Email-Bot: Speichert E-Mail-Benachrichtigung lokal (keine Google Mail)"""
     try:
         subject = f"Material-Bestellung angefordert: {problem.bohrturm} - {problem.system}"
-        
-        # HTML-E-Mail-Template
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; color: #333; line-height: 1.6;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%); color: white; padding: 20px; border-radius: 10px; text-align: center; margin-bottom: 20px;">
-                    <h1 style="margin: 0; font-size: 24px;">🛒 Material-Bestellung angefordert</h1>
-                    <p style="margin: 10px 0 0 0; opacity: 0.9;">Wartungs-App Benachrichtigung</p>
-                </div>
-                
-                <div style="background: #fff3cd; padding: 20px; border-radius: 8px; border-left: 4px solid #f59e0b;">
-                    <h3 style="color: #d97706; margin-top: 0;">Hallo {besteller_user.username},</h3>
-                    <p>Für ein Problem wurde eine Material-Bestellung angefordert und Sie wurden als Besteller ausgewählt:</p>
-                </div>
-                
-                <div style="background: white; border: 1px solid #dee2e6; border-radius: 8px; margin: 20px 0; overflow: hidden;">
-                    <div style="background: #f59e0b; color: white; padding: 15px;">
-                        <h3 style="margin: 0;">📋 Problem-Details</h3>
-                    </div>
-                    <div style="padding: 20px;">
-                        <table style="width: 100%; border-collapse: collapse;">
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #d97706; width: 120px;">🏗️ Anlage:</td>
-                                <td style="padding: 8px 0;">{problem.bohrturm}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #d97706;">🏢 Abteilung:</td>
-                                <td style="padding: 8px 0;">{problem.abteilung}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #d97706;">⚙️ System:</td>
-                                <td style="padding: 8px 0;">{problem.system}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #d97706;">👤 Bearbeiter:</td>
-                                <td style="padding: 8px 0;">{bearbeiter_name}</td>
-                            </tr>
-                        </table>
-                        <hr style="margin: 15px 0; border: none; border-top: 1px solid #dee2e6;">
-                        <div>
-                            <p style="font-weight: bold; color: #d97706; margin-bottom: 10px;">⚠️ Problembeschreibung:</p>
-                            <div style="background: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 15px;">
-                                {problem.problem}
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                
-                <div style="background: white; border: 1px solid #f59e0b; border-radius: 8px; margin: 20px 0; overflow: hidden;">
-                    <div style="background: #f59e0b; color: white; padding: 15px;">
-                        <h3 style="margin: 0;">🛒 Material-Bestellung Details</h3>
-                    </div>
-                    <div style="padding: 20px;">"""
-        
-        if problem.mm_nummer:
-            html_body += f"""
-                        <div style="margin-bottom: 15px;">
-                            <span style="font-weight: bold; color: #d97706;">📊 MM-Nummer:</span>
-                            <span style="background: #f59e0b; color: white; padding: 4px 8px; border-radius: 4px; font-family: monospace;">{problem.mm_nummer}</span>
-                        </div>"""
-        
-        if problem.teil_beschreibung:
-            html_body += f"""
-                        <div style="margin-bottom: 15px;">
-                            <span style="font-weight: bold; color: #d97706;">🏷️ Teil-Beschreibung:</span>
-                            <div style="background: #fef3c7; border: 1px solid #f59e0b; border-radius: 5px; padding: 10px; margin-top: 5px;">
-                                {problem.teil_beschreibung}
-                            </div>
-                        </div>"""
-        
-        if problem.massnahmen:
-            html_body += f"""
-                        <div style="margin-bottom: 15px;">
-                            <span style="font-weight: bold; color: #d97706;">🔧 Geplante Maßnahmen:</span>
-                            <div style="background: #f3f4f6; border: 1px solid #d1d5db; border-radius: 5px; padding: 10px; margin-top: 5px;">
-                                {problem.massnahmen}
-                            </div>
-                        </div>"""
-        
-        html_body += f"""
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="http://192.168.188.20:5000/confirm_order/{problem.id}" 
-                       style="background: #f59e0b; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block; margin-bottom: 15px;">
-                        ✅ Bestellung jetzt bestätigen
-                    </a>
-                    <br>
-                    <a href="http://192.168.188.20:5000/problem" 
-                       style="background: #6b7280; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; font-weight: normal; display: inline-block;">
-                        📋 Neues Problem melden
-                    </a>
-                </div>
-                
-                <div style="background: #fef3c7; padding: 15px; border-radius: 5px; text-align: center; font-size: 12px; color: #92400e;">
-                    <p style="margin: 0;">Diese E-Mail wurde automatisch von der Wartungs-App gesendet.</p>
-                    <p style="margin: 5px 0 0 0;">Bitte nicht auf diese E-Mail antworten.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Text-Version als Fallback
-        text_body = f"""
-Material-Bestellung angefordert: {problem.bohrturm} - {problem.system}
-
-Hallo {besteller_user.username},
-
-Für ein Problem wurde eine Material-Bestellung angefordert und Sie wurden als Besteller ausgewählt:
-
-Anlage: {problem.bohrturm}
-Abteilung: {problem.abteilung}
-System: {problem.system}
-Bearbeiter: {bearbeiter_name}
-
-Problembeschreibung:
-{problem.problem}
-
-Material-Bestellung Details:"""
-        
-        if problem.mm_nummer:
-            text_body += f"\nMM-Nummer: {problem.mm_nummer}"
-        if problem.teil_beschreibung:
-            text_body += f"\nTeil-Beschreibung: {problem.teil_beschreibung}"
-        if problem.massnahmen:
-            text_body += f"\nGeplante Maßnahmen: {problem.massnahmen}"
-        
-        text_body += f"""
-
-BESTELLUNG BESTÄTIGEN:
-http://192.168.188.20:5000/confirm_order/{problem.id}
-
-Neues Problem melden:
-http://192.168.188.20:5000/problem
-
-Diese E-Mail wurde automatisch gesendet.
-        """
+        html_body, text_body = render_email('material_order', besteller_user=besteller_user, problem=problem,
+                                            bearbeiter_name=bearbeiter_name)
         
         # 🤖 EMAIL-BOT: Lokale Email-Speicherung (kein Google Mail)
         return save_email_locally(
@@ -977,108 +2244,7 @@ def send_problem_completion_email(admin, problem, kommentar):
     """Lokaler Email-Bot: Speichert Admin-Benachrichtigung lokal (keine Google Mail)"""
     try:
         subject = f"Problem abgearbeitet: {problem.bohrturm} - {problem.system}"
-        
-        # HTML-E-Mail-Template für abgearbeitete Probleme
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; color: #333; line-height: 1.6;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: linear-gradient(135deg, #059669 0%, #065f46 100%); color: white; padding: 20px; border-radius: 10px; text-align: center; margin-bottom: 20px;">
-                    <h1 style="margin: 0; font-size: 24px;">✅ Problem abgearbeitet</h1>
-                    <p style="margin: 10px 0 0 0; opacity: 0.9;">Bereit zur Admin-Prüfung</p>
-                </div>
-                
-                <div style="background: #f0fdf4; padding: 20px; border-radius: 8px; border-left: 4px solid #059669;">
-                    <h3 style="color: #059669; margin-top: 0;">Hallo {admin.username},</h3>
-                    <p>Ein Problem wurde als abgearbeitet markiert und wartet auf Ihre Prüfung:</p>
-                </div>
-                
-                <div style="background: white; border: 1px solid #dee2e6; border-radius: 8px; margin: 20px 0; overflow: hidden;">
-                    <div style="background: #059669; color: white; padding: 15px;">
-                        <h3 style="margin: 0;">📋 Problem-Details</h3>
-                    </div>
-                    <div style="padding: 20px;">
-                        <table style="width: 100%; border-collapse: collapse;">
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #059669; width: 120px;">🏗️ Anlage:</td>
-                                <td style="padding: 8px 0;">{problem.bohrturm}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #059669;">🏢 Abteilung:</td>
-                                <td style="padding: 8px 0;">{problem.abteilung}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #059669;">⚙️ System:</td>
-                                <td style="padding: 8px 0;">{problem.system}</td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px 0; font-weight: bold; color: #059669;">👤 Bearbeitet von:</td>
-                                <td style="padding: 8px 0;">{problem.verantwortlicher or 'Nicht zugewiesen'}</td>
-                            </tr>
-                        </table>
-                        <hr style="margin: 15px 0; border: none; border-top: 1px solid #dee2e6;">
-                        <div>
-                            <p style="font-weight: bold; color: #059669; margin-bottom: 10px;">⚠️ Ursprüngliches Problem:</p>
-                            <div style="background: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-                                {problem.problem}
-                            </div>
-                            
-                            {f'<p style="font-weight: bold; color: #059669; margin-bottom: 10px;">🔧 Durchgeführte Maßnahmen:</p><div style="background: #f0fdf4; border: 1px solid #bbf7d0; border-radius: 5px; padding: 15px; margin-bottom: 15px;">{problem.massnahmen}</div>' if problem.massnahmen else ''}
-                            
-                            <p style="font-weight: bold; color: #059669; margin-bottom: 10px;">📝 Abschlusskommentar:</p>
-                            <div style="background: #e0f2fe; border: 1px solid #81d4fa; border-radius: 5px; padding: 15px;">
-                                {kommentar if kommentar else 'Kein Kommentar hinterlassen'}
-                            </div>
-                            
-                            {f'<p style="font-weight: bold; color: #059669; margin-bottom: 10px; margin-top: 15px;">📸 Dokumentation:</p><div style="background: #fef3c7; border: 1px solid #fbbf24; border-radius: 5px; padding: 15px;"><i class="bi bi-camera"></i> {len(problem.image_list)} Bild(er) verfügbar - In der App anzeigen für Details</div>' if problem.image_list else ''}
-                        </div>
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="http://192.168.188.20:5000/problem" 
-                       style="background: #059669; color: white; padding: 12px 25px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block;">
-                        🔗 Neues Problem melden
-                    </a>
-                </div>
-                
-                <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; text-align: center; font-size: 12px; color: #6c757d;">
-                    <p style="margin: 0;">Diese E-Mail wurde automatisch von der Wartungs-App gesendet.</p>
-                    <p style="margin: 5px 0 0 0;">Bitte nicht auf diese E-Mail antworten.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Text-Version als Fallback
-        text_body = f"""
-Problem abgearbeitet: {problem.bohrturm} - {problem.system}
-
-Hallo {admin.username},
-
-Ein Problem wurde als abgearbeitet markiert und wartet auf Ihre Prüfung:
-
-Anlage: {problem.bohrturm}
-Abteilung: {problem.abteilung}
-System: {problem.system}
-Bearbeitet von: {problem.verantwortlicher or 'Nicht zugewiesen'}
-
-Ursprüngliches Problem:
-{problem.problem}
-
-{f'Durchgeführte Maßnahmen:\n{problem.massnahmen}\n' if problem.massnahmen else ''}
-Abschlusskommentar:
-{kommentar if kommentar else 'Kein Kommentar hinterlassen'}
-
-Bitte loggen Sie sich in die Wartungs-App ein, um ein neues Problem zu melden:
-http://192.168.188.20:5000/problem
-
-Diese E-Mail wurde automatisch gesendet.
-        """
-        
-        # Für Tests: E-Mails immer an nils.wanning@gmail.com senden
-        test_recipient = "nils.wanning@gmail.com"
+        html_body, text_body = render_email('problem_completion', admin=admin, problem=problem, kommentar=kommentar)
         
         # 🤖 EMAIL-BOT: Lokale Email-Speicherung (kein Google Mail)
         return save_email_locally(
@@ -1139,64 +2305,77 @@ def login():
             flash('Ungültige Anmeldedaten', 'error')
     return render_template('login.html')
 
+def compute_dashboard_stats():
+    """
+    Liefert alle Dashboard-Zähler aus den gepflegten ProblemStatusCounter-Zeilen
+    
+    Nur "kritisch" (gemeldet > 24h) hängt von der Uhrzeit ab und wird per Index-Abfrage gezählt.
+    
+    Returns:
+        dict mit total_problems, gemeldet_count, in_bearbeitung_count, abgearbeitet_count,
+        critical_problems, problems_with_images, abteilungen, bohrtuerme
+    """
+    stats = {
+        'total_problems': 0,
+        'gemeldet_count': 0,
+        'in_bearbeitung_count': 0,
+        'abgearbeitet_count': 0,
+        'problems_with_images': 0,
+    }
+    per_abteilung = {}
+    per_bohrturm = {}
+    ensure_status_counters()
+    for counter in ProblemStatusCounter.query.filter(ProblemStatusCounter.anzahl != 0).all():
+        if counter.status in ['abgearbeitet', 'bestätigt']:
+            stats['abgearbeitet_count'] += counter.anzahl
+            continue
+        stats['total_problems'] += counter.anzahl
+        stats['problems_with_images'] += counter.mit_bildern
+        if counter.status == 'gemeldet':
+            stats['gemeldet_count'] += counter.anzahl
+        elif counter.status == 'in_bearbeitung':
+            stats['in_bearbeitung_count'] += counter.anzahl
+        per_abteilung[counter.abteilung] = per_abteilung.get(counter.abteilung, 0) + counter.anzahl
+        per_bohrturm[counter.bohrturm] = per_bohrturm.get(counter.bohrturm, 0) + counter.anzahl
+    
+    # Kritische Probleme (gemeldet > 24h)
+    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+    stats['critical_problems'] = Problem.query.filter(
+        Problem.status == 'gemeldet',
+        Problem.status_changed_at < yesterday
+    ).count()
+    
+    # Probleme nach Abteilungen / Bohrtürmen - nur aktive
+    stats['abteilungen'] = [{'abteilung': name, 'count': count} for name, count in sorted(per_abteilung.items()) if count]
+    stats['bohrtuerme'] = [{'bohrturm': name, 'count': count} for name, count in sorted(per_bohrturm.items()) if count]
+    return stats
+
+
 @app.route('/dashboard')
+@conditional_view(time_bucket_seconds=60)
 def dashboard():
     if 'user' not in session:
         return redirect(url_for('login'))
     user = User.query.filter_by(username=session.get('user')).first()
     is_admin = user and user.username in ['nils', 'Admin']
     
-    # Dashboard-Statistiken sammeln - nur aktive Probleme
-    active_problems_query = Problem.query.filter(~Problem.status.in_(['abgearbeitet', 'bestätigt']))
-    total_problems = active_problems_query.count()
-    gemeldet_count = Problem.query.filter_by(status='gemeldet').count()
-    in_bearbeitung_count = Problem.query.filter_by(status='in_bearbeitung').count()
-    # Zeige Anzahl abgearbeiteter Probleme in Historie
-    abgearbeitet_count = Problem.query.filter(Problem.status.in_(['abgearbeitet', 'bestätigt'])).count()
-    
-    # Probleme nach Abteilungen - nur aktive
-    abteilungen = db.session.query(
-        Problem.abteilung, 
-        db.func.count(Problem.id).label('count')
-    ).filter(~Problem.status.in_(['abgearbeitet', 'bestätigt'])).group_by(Problem.abteilung).all()
-    
-    # Probleme nach Bohrtürmen - nur aktive
-    bohrtuerme = db.session.query(
-        Problem.bohrturm, 
-        db.func.count(Problem.id).label('count')
-    ).filter(~Problem.status.in_(['abgearbeitet', 'bestätigt'])).group_by(Problem.bohrturm).all()
+    # Dashboard-Statistiken aus den gepflegten Zählern
+    stats = compute_dashboard_stats()
     
     # Letzte 5 aktive Probleme
     recent_problems = Problem.query.filter(~Problem.status.in_(['abgearbeitet', 'bestätigt'])).order_by(Problem.id.desc()).limit(5).all()
     
-    # Kritische Probleme (gemeldet > 24h)
-    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
-    critical_problems = Problem.query.filter(
-        Problem.status == 'gemeldet',
-        Problem.status_changed_at < yesterday
-    ).count()
-    
-    # Aktive Probleme mit Bildern
-    problems_with_images = Problem.query.filter(
-        Problem.images.isnot(None),
-        ~Problem.status.in_(['abgearbeitet', 'bestätigt'])
-    ).count()
-    
-    dashboard_data = {
-        'total_problems': total_problems,
-        'gemeldet_count': gemeldet_count,
-        'in_bearbeitung_count': in_bearbeitung_count,
-        'abgearbeitet_count': abgearbeitet_count,
-        'abteilungen': abteilungen,
-        'bohrtuerme': bohrtuerme,
-        'recent_problems': recent_problems,
-        'critical_problems': critical_problems,
-        'problems_with_images': problems_with_images,
-        'is_admin': is_admin
-    }
+    dashboard_data = dict(stats, recent_problems=recent_problems, is_admin=is_admin)
     
     return render_template('dashboard.html', **dashboard_data)
 
+
+# ===== AUSWERTUNGEN (MTTR / BACKLOG-ALTER) =====
+# Berechnung, Cache und Routen liegen in analytics.py
+
+analytics = ProblemAnalytics(db, ProblemEvent)
+analytics.init_app(app)
+
 @app.route('/logout')
 def logout():
     session.pop('user', None)
@@ -1254,6 +2433,8 @@ def problem():
         
         db.session.add(new_problem)
         db.session.commit()
+        image_pipeline.submit(uploaded_files)
+        publish_problem_event('problem_created', new_problem)
         
         # E-Mail-Benachrichtigung senden, wenn ein Benutzer zugewiesen wurde
         if assigned_user:
@@ -1275,9 +2456,124 @@ def problem():
         
         return redirect(url_for('problems'))
     
-    return render_template('problem.html', all_users=all_users, user_facility=user_facility, is_admin=is_admin)
+    return render_template('problem.html', all_users=all_users, user_facility=user_facility, is_admin=is_admin)
+
+PROBLEM_FILTER_ARGS = ('bohrturm', 'abteilung', 'status', 'date_from', 'date_to', 'search')
+
+
+def apply_problem_filters(query, args):
+    """Wendet die Filter der Problemliste (Anlage, Abteilung, Status, Zeitraum, Suche) auf eine Query an"""
+    bohrturm = args.get('bohrturm')
+    abteilung = args.get('abteilung')
+    status = args.get('status')
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+
+    if bohrturm:
+        query = query.filter(Problem.bohrturm == bohrturm)
+    if abteilung:
+        query = query.filter(Problem.abteilung == abteilung)
+    if status:
+        query = query.filter(Problem.status == status)
+    if date_from:
+        date_from = datetime.strptime(date_from, '%Y-%m-%d')
+        query = query.filter(Problem.status_changed_at >= date_from)
+    if date_to:
+        date_to = datetime.strptime(date_to, '%Y-%m-%d')
+        date_to = date_to.replace(hour=23, minute=59, second=59)
+        query = query.filter(Problem.status_changed_at <= date_to)
+    return apply_search_filter(query, args.get('search'))
+
+
+def problem_list_load_options():
+    """
+    Eager-Loading für Listenansichten (/problems, /history)
+    
+    Die Templates lesen materials, assigned_user und besteller_user pro Zeile.
+    Statt einer Abfrage pro Problem (N+1) werden die Benutzer per JOIN und die
+    Materialien mit einem einzigen IN-Select nachgeladen - die Anzahl der
+    SQL-Statements bleibt damit unabhängig von der Anzahl der Zeilen.
+    """
+    return (
+        joinedload(Problem.assigned_user),
+        joinedload(Problem.besteller_user),
+        selectinload(Problem.materials),
+    )
+
+
+def status_priority_expr():
+    """SQL-Ausdruck für die Status-Priorität (unbekannte Status zuerst, wie bisher)"""
+    return case(
+        *[(Problem.status == status, priority) for status, priority in STATUS_PRIORITY.items()],
+        else_=0
+    )
+
+
+def encode_problem_cursor(problem):
+    """Erzeugt den Cursor (Priorität-ID) für eine Zeile der Problemliste"""
+    return f"{STATUS_PRIORITY.get(problem.status, 0)}-{problem.id}"
+
+
+def decode_problem_cursor(cursor):
+    """Liest einen Cursor aus der URL, gibt (priorität, id) oder None zurück"""
+    if not cursor:
+        return None
+    try:
+        priority, problem_id = cursor.split('-', 1)
+        return int(priority), int(problem_id)
+    except ValueError:
+        return None
+
+
+def paginate_problems_keyset(query, page_size, after=None, before=None):
+    """
+    Keyset-Pagination über (Status-Priorität, ID desc)
+    
+    Statt OFFSET wird ab dem letzten gesehenen Eintrag weitergelesen,
+    dadurch bleibt jede Seite gleich schnell - unabhängig von der Anzahl der Probleme.
+    Sortierung und Cursor laufen über die Spalte status_priority, damit SQLite beides
+    aus dem Index ix_problem_priority_id liest statt die Treffer zu sortieren.
+    
+    Args:
+        query: gefilterte Problem-Query
+        page_size: Anzahl Einträge pro Seite
+        after: Cursor (priorität, id) - Seite nach diesem Eintrag laden
+        before: Cursor (priorität, id) - Seite vor diesem Eintrag laden
+    
+    Returns:
+        (problems, prev_cursor, next_cursor)
+    """
+    priority = Problem.status_priority
+    
+    if before:
+        before_priority, before_id = before
+        query = query.filter(priority <= before_priority, db.or_(
+            priority < before_priority,
+            db.and_(priority == before_priority, Problem.id > before_id)
+        ))
+        rows = query.order_by(priority.desc(), Problem.id.asc()).limit(page_size + 1).all()
+        has_more = len(rows) > page_size
+        rows = list(reversed(rows[:page_size]))
+        has_prev, has_next = has_more, True
+    else:
+        if after:
+            after_priority, after_id = after
+            query = query.filter(priority >= after_priority, db.or_(
+                priority > after_priority,
+                db.and_(priority == after_priority, Problem.id < after_id)
+            ))
+        rows = query.order_by(priority, Problem.id.desc()).limit(page_size + 1).all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        has_prev, has_next = bool(after), has_more
+    
+    prev_cursor = encode_problem_cursor(rows[0]) if rows and has_prev else None
+    next_cursor = encode_problem_cursor(rows[-1]) if rows and has_next else None
+    return rows, prev_cursor, next_cursor
+
 
 @app.route('/problems')
+@conditional_view()
 def problems():
     if 'user' not in session:
         return redirect(url_for('login'))
@@ -1285,58 +2581,293 @@ def problems():
     is_admin = user and user.username in ['nils', 'Admin']
     current_user = session.get('user')
     user_facility = get_user_facility(current_user)
+    # Stand der Liste für den Delta-Refresh (vor der Abfrage ermitteln)
+    change_version = datetime.now(timezone.utc).isoformat()
     
     # Suchparameter - zeige nur aktive Probleme (nicht abgearbeitet oder bestätigt)
-    query = Problem.query.filter(~Problem.status.in_(['abgearbeitet', 'bestätigt']))
+    # Als Bereich auf status_priority, damit der Index auch den Filter bedient
+    query = Problem.query.options(*problem_list_load_options()).filter(
+        Problem.status_priority < STATUS_PRIORITY['abgearbeitet']
+    )
     
     # SICHERHEIT: Facility-User sehen alle Probleme zur Information, 
     # aber können nur ihre eigenen bearbeiten (wird in templates/edit_problem geprüft)
     # Keine Einschränkung der Anzeige, da sie alle Probleme zur Information sehen sollen
     
-    bohrturm = request.args.get('bohrturm')
-    abteilung = request.args.get('abteilung')
-    status = request.args.get('status')
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
-
-    if bohrturm:
-        query = query.filter(Problem.bohrturm == bohrturm)
-    if abteilung:
-        query = query.filter(Problem.abteilung == abteilung)
-    if status:
-        query = query.filter(Problem.status == status)
-    if date_from:
-        date_from = datetime.strptime(date_from, '%Y-%m-%d')
-        query = query.filter(Problem.status_changed_at >= date_from)
-    if date_to:
-        date_to = datetime.strptime(date_to, '%Y-%m-%d')
-        date_to = date_to.replace(hour=23, minute=59, second=59)
-        query = query.filter(Problem.status_changed_at <= date_to)
+    query = apply_problem_filters(query, request.args)
 
-    # Performance-Optimierung: Mit Index und Eager Loading
-    all_problems = query.order_by(
-        case(
-            (Problem.status == 'gemeldet', 1),
-            (Problem.status == 'in_bearbeitung', 2),
-            (Problem.status == 'abgearbeitet', 3),
-        ),
-        Problem.id.desc()
-    ).limit(1000).all()  # Limit für bessere Performance bei großen Datenmengen
+    # Keyset-Pagination: Filter bleiben in den Blätter-Links erhalten
+    page_size = request.args.get('per_page', type=int) or app.config['PROBLEMS_PAGE_SIZE']
+    page_size = max(1, min(page_size, app.config['PROBLEMS_MAX_PAGE_SIZE']))
+    filter_args = {key: request.args.get(key) for key in PROBLEM_FILTER_ARGS if request.args.get(key)}
+    if request.args.get('per_page'):
+        filter_args['per_page'] = page_size
+    
+    all_problems, prev_cursor, next_cursor = paginate_problems_keyset(
+        query,
+        page_size,
+        after=decode_problem_cursor(request.args.get('after')),
+        before=decode_problem_cursor(request.args.get('before'))
+    )
     
     # Alle User für Material-Besteller Dropdown
     all_users = User.query.all()
     
     # Template-Helper-Funktion für RSC-Check
     def is_rsc_for_problem(problem):
-        if current_user in ['nils', 'Admin']:
-            return True
-        rsc_user = get_rsc_for_facility(problem.bohrturm)
-        return rsc_user and rsc_user.username == current_user
+        return can_manage_material_orders(current_user, problem.bohrturm)
     
     return render_template('problems.html', problems=all_problems, is_admin=is_admin, users=all_users, 
+                         user_facility=user_facility, current_user=current_user,
+                         is_rsc_for_problem=is_rsc_for_problem,
+                         prev_cursor=prev_cursor, next_cursor=next_cursor, filter_args=filter_args,
+                         change_version=change_version, status_priority=STATUS_PRIORITY, page_size=page_size,
+                         search_snippets=search_snippets([p.id for p in all_problems], request.args.get('search')))
+
+def parse_change_version(value):
+    """Liest einen vom Client zurückgegebenen Versions-Zeitstempel (ISO-Format), None bei Fehler"""
+    if not value:
+        return None
+    try:
+        version = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if version.tzinfo is None:
+        version = version.replace(tzinfo=timezone.utc)
+    return version
+
+
+@app.route('/api/problems/changes')
+def problem_changes():
+    """
+    Delta-Refresh für die Problemliste
+    
+    Liefert nur die seit `since` geänderten Probleme als fertig gerenderte Tabellenzeilen,
+    sowie die IDs von Zeilen, die entfernt werden müssen (gelöscht oder passen nicht mehr zum Filter).
+    Mit `until` (Cursor der letzten angezeigten Zeile, falls es eine Folgeseite gibt) zählen Zeilen,
+    die hinter diese Zeile sortieren, ebenfalls als entfernt - sie gehören auf eine spätere Seite.
+    Bei `reset: true` muss der Client die Seite komplett neu laden.
+    """
+    if 'user' not in session:
+        return jsonify({'error': 'Nicht eingeloggt'}), 401
+    
+    current_user = session.get('user')
+    is_admin = current_user in ['nils', 'Admin']
+    version = datetime.now(timezone.utc)
+    since = parse_change_version(request.args.get('since'))
+    
+    # Ältere Stände als das Lösch-Protokoll können nicht mehr zuverlässig nachgezogen werden
+    oldest_deletion = _deleted_problems[0][0] if len(_deleted_problems) == _deleted_problems.maxlen else None
+    if since is None or since < PROBLEM_CHANGE_LOG_STARTED_AT or (oldest_deletion and since < oldest_deletion):
+        return jsonify({'version': version.isoformat(), 'reset': True})
+    
+    # Kleine Überlappung, damit gleichzeitig laufende Commits nicht verloren gehen
+    window_start = since - timedelta(seconds=2)
+    max_changes = app.config['PROBLEMS_MAX_PAGE_SIZE']
+    changed = Problem.query.options(*problem_list_load_options()).filter(
+        Problem.updated_at > window_start
+    ).limit(max_changes + 1).all()
+    if len(changed) > max_changes:
+        return jsonify({'version': version.isoformat(), 'reset': True})
+    
+    visible_ids = set()
+    if changed:
+        visible_query = apply_problem_filters(
+            Problem.query.filter(~Problem.status.in_(['abgearbeitet', 'bestätigt'])),
+            request.args
+        ).filter(Problem.id.in_([p.id for p in changed]))
+        until = decode_problem_cursor(request.args.get('until'))
+        if until:
+            until_priority, until_id = until
+            visible_query = visible_query.filter(db.or_(
+                Problem.status_priority < until_priority,
+                db.and_(Problem.status_priority == until_priority, Problem.id >= until_id)
+            ))
+        visible_ids = {problem_id for (problem_id,) in visible_query.with_entities(Problem.id)}
+    
+    snippets = search_snippets(visible_ids, request.args.get('search'))
+    rows = [
+        {
+            'id': p.id,
+            'priority': STATUS_PRIORITY.get(p.status, 0),
+            'html': render_template('problem_row.html', p=p, is_admin=is_admin, status_priority=STATUS_PRIORITY,
+                                    search_snippets=snippets)
+        }
+        for p in changed if p.id in visible_ids
+    ]
+    removed = [p.id for p in changed if p.id not in visible_ids]
+    removed += [problem_id for deleted_at, problem_id in list(_deleted_problems) if deleted_at > window_start]
+    
+    return jsonify({'version': version.isoformat(), 'reset': False, 'rows': rows, 'removed': removed})
+
+
+@app.route('/api/search')
+def search_problems():
+    """
+    Volltextsuche über aktive und archivierte Probleme, nach Relevanz sortiert
+    
+    Query-Parameter: q (Suchbegriffe, Präfix-Suche), limit (max. PROBLEMS_MAX_PAGE_SIZE)
+    """
+    if 'user' not in session:
+        return jsonify({'error': 'Nicht eingeloggt'}), 401
+    
+    term = request.args.get('q', '').strip()
+    limit = request.args.get('limit', type=int) or app.config['PROBLEMS_PAGE_SIZE']
+    limit = max(1, min(limit, app.config['PROBLEMS_MAX_PAGE_SIZE']))
+    
+    if not _search_index_ready(db.session.connection()):
+        # Ohne FTS5: ungewichteter LIKE-Fallback, neueste zuerst
+        hits = [(p, None) for p in apply_search_filter(Problem.query, term).order_by(Problem.id.desc()).limit(limit)] if term else []
+    else:
+        hits = search_problems_ranked(term, limit)
+    
+    return jsonify({
+        'query': term,
+        'results': [{
+            'id': p.id,
+            'bohrturm': p.bohrturm,
+            'abteilung': p.abteilung,
+            'system': p.system,
+            'status': p.status,
+            'problem': p.problem,
+            'snippet': str(snippet) if snippet else None,
+        } for p, snippet in hits]
+    })
+
+
+@app.route('/events')
+def events():
+    """
+    Server-Sent-Events-Stream für Live-Updates (neue Probleme, Statuswechsel, Updates, Material)
+    
+    Jede offene Verbindung belegt einen Worker-Thread. Die Anzahl der Clients ist auf
+    SSE_MAX_CLIENTS begrenzt (unter waitress zusätzlich zu SERVER_REQUEST_THREADS, siehe
+    Konfiguration), jeder Stream endet nach SSE_MAX_STREAM_SECONDS - der Browser verbindet
+    sich automatisch neu. Ist das Limit erreicht, greift clientseitig das Polling.
+    """
+    if 'user' not in session:
+        return jsonify({'error': 'Nicht eingeloggt'}), 401
+    
+    client_queue = event_broker.subscribe(max_clients=app.config['SSE_MAX_CLIENTS'])
+    if client_queue is None:
+        return jsonify({'error': 'Zu viele Live-Verbindungen'}), 503
+    
+    heartbeat = app.config['SSE_HEARTBEAT_SECONDS']
+    deadline = time.monotonic() + app.config['SSE_MAX_STREAM_SECONDS']
+    
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while time.monotonic() < deadline:
+                try:
+                    event = client_queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            event_broker.unsubscribe(client_queue)
+    
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # Auch abmelden, wenn die Verbindung schließt, bevor der Stream gestartet wurde
+    response.call_on_close(lambda: event_broker.unsubscribe(client_queue))
+    return response
+
+
+@app.route('/problems/<int:problem_id>/detail')
+def problem_detail_fragment(problem_id):
+    """Liefert Detail- und Bild-Modal eines Problems als HTML-Fragment (wird beim Öffnen nachgeladen)"""
+    if 'user' not in session:
+        return 'Nicht eingeloggt', 401
+    
+    current_user = session.get('user')
+    is_admin = current_user in ['nils', 'Admin']
+    user_facility = get_user_facility(current_user)
+    problem = Problem.query.options(*problem_list_load_options()).filter_by(id=problem_id).first_or_404()
+    
+    def is_rsc_for_problem(problem):
+        return can_manage_material_orders(current_user, problem.bohrturm)
+    
+    return render_template('problem_modals.html', p=problem, is_admin=is_admin,
                          user_facility=user_facility, current_user=current_user,
                          is_rsc_for_problem=is_rsc_for_problem)
 
+# Inhaltsadressierte Upload-Namen ('ab/cd/<sha256>.<ext>') - der Inhalt ändert sich nach der Optimierung nicht mehr
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DERIVATIVE_FALLBACK_MAX_AGE = 60  # Original statt fehlender Variante, bis der Pool sie erzeugt hat
+
+
+def _valid_upload_name(filename):
+    return allowed_file(filename) and all(secure_filename(part) == part for part in filename.split('/'))
+
+
+def _upload_is_processed(filename):
+    """
+    Prüft ohne Datenbankabfrage, ob ein Original fertig optimiert ist
+    
+    Der Bild-Pool legt die Varianten erst nach der Optimierung an - existiert die letzte
+    Variante auf der Platte, ändert sich das Original nicht mehr.
+    """
+    last_variant = list(DERIVATIVE_SIZES)[-1]
+    return os.path.exists(derivative_path(app.config['IMAGE_DERIVATIVE_FOLDER'], last_variant, filename))
+
+
+def send_upload(directory, filename, variant='original', final=True):
+    """
+    Liefert eine Upload-Datei bzw. Variante mit starkem ETag und Range-Unterstützung
+    
+    Inhaltsadressierte Dateien, die fertig verarbeitet sind (final), werden als unveränderlich ein
+    Jahr gecacht - wiederholte Aufrufe erreichen den Server gar nicht mehr. Der Name beweist den
+    Inhalt, eine Datenbankabfrage ist nicht nötig. Alte Dateinamen und Bilder, die noch optimiert
+    werden, müssen bei jedem Aufruf revalidiert werden (304 bei gleichem ETag).
+    """
+    match = CONTENT_ADDRESSED_NAME.match(filename)
+    immutable = bool(match) and final
+    response = send_from_directory(
+        directory, filename,
+        etag=f"{match.group(1)}-{variant}" if immutable else True,
+        max_age=IMMUTABLE_MAX_AGE if immutable else 0,
+    )
+    if immutable:
+        response.headers['Cache-Control'] = f'private, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@app.route('/static/uploads/<path:filename>')
+def uploaded_file(filename):
+    """Liefert ein hochgeladenes Original (ersetzt die normale Static-Auslieferung für Uploads)"""
+    if not _valid_upload_name(filename):
+        abort(404)
+    return send_upload(app.config['UPLOAD_FOLDER'], filename, final=_upload_is_processed(filename))
+
+@app.route('/uploads/<variant>/<path:filename>')
+def upload_variant(variant, filename):
+    """
+    Liefert eine verkleinerte Variante (thumb, medium) eines hochgeladenen Bildes
+    
+    Normalerweise erzeugt der Bild-Worker-Pool die Varianten beim Upload. Fehlt eine (ältere
+    Bilder, Bild noch in Arbeit), wird sie im Pool eingereiht und solange das Original mit
+    kurzer Cache-Dauer geliefert - der Request wartet nie auf die Bildverarbeitung.
+    """
+    if variant not in DERIVATIVE_SIZES or not _valid_upload_name(filename):
+        abort(404)
+    
+    derivative_folder = app.config['IMAGE_DERIVATIVE_FOLDER']
+    if not os.path.exists(derivative_path(derivative_folder, variant, filename)):
+        if not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+            abort(404)
+        image_pipeline.submit_derivatives(filename)
+        response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=DERIVATIVE_FALLBACK_MAX_AGE)
+        response.headers['Cache-Control'] = f'private, max-age={DERIVATIVE_FALLBACK_MAX_AGE}'
+        return response
+    return send_upload(os.path.join(derivative_folder, variant), filename, variant)
+
 @app.route('/delete_problem/<int:problem_id>', methods=['GET', 'POST'])
 def delete_problem(problem_id):
     if 'user' not in session:
@@ -1360,6 +2891,7 @@ def delete_problem(problem_id):
             problem.loeschen_kommentar = kommentar + " [Admin bestätigt]"
             problem.status_changed_at = datetime.now(timezone.utc)
             db.session.commit()
+            publish_problem_event('problem_status', problem)
             flash('Problem wurde bestätigt und bleibt in der Historie verfügbar.', 'success')
             return redirect(url_for('problems'))
         else:
@@ -1382,6 +2914,8 @@ def delete_problem(problem_id):
                 problem.image_list = all_images
             
             db.session.commit()
+            image_pipeline.submit(completion_images)
+            publish_problem_event('problem_status', problem)
             
             # E-Mail an Admin mit professionellem Design
             try:
@@ -1452,6 +2986,7 @@ def edit_problem(problem_id):
             
         problem.status_changed_at = datetime.now(timezone.utc)
         db.session.commit()
+        publish_problem_event('problem_status', problem)
         
         # Interested Parties benachrichtigen
         interested_parties = request.form.getlist('interested_parties')
@@ -1585,6 +3120,7 @@ def add_progress_update(problem_id):
     problem.status_changed_at = datetime.now(timezone.utc)
     
     db.session.commit()
+    publish_problem_event('progress_update', problem, user=current_user)
 
     flash(f'Fortschritt-Update hinzugefügt: "{update_text}"', 'success')
     return redirect(url_for('problems') + f'#detailModal{problem_id}')
@@ -1628,6 +3164,7 @@ def add_material(problem_id):
     
     db.session.add(material_item)
     db.session.commit()
+    publish_problem_event('material', problem, material_id=material_item.id, action='added')
     
     # 📧 RSC-BENACHRICHTIGUNG: Material wurde angefordert
     try:
@@ -1689,6 +3226,7 @@ def confirm_material(material_id):
             flash('Ungültiges Lieferdatum-Format. Bitte verwenden Sie YYYY-MM-DD.', 'warning')
     
     db.session.commit()
+    publish_problem_event('material', material.problem, material_id=material.id, action='confirmed')
     
     flash(f'Material-Bestellung "{material.beschreibung}" wurde von RSC bestätigt.', 'success')
     return redirect(url_for('problems') + f'#detailModal{material.problem_id}-material')
@@ -1786,6 +3324,7 @@ def delete_material(material_id):
                 conn.commit()
                 
                 if result.rowcount > 0:
+                    bump_data_version()
                     print(f"✅ DEBUG: Force-Delete erfolgreich: {result.rowcount} Zeile(n) gelöscht")
                     return {'success': True, 'message': 'Material wurde force-gelöscht'}, 200
                 else:
@@ -1796,10 +3335,10 @@ def delete_material(material_id):
             print(f"❌ DEBUG: Force-Delete Fehler: {force_error}")
             return {'success': False, 'error': f'Löschen fehlgeschlagen: {str(force_error)}'}, 500
 
-@app.route('/admin/delete_email/<filename>', methods=['DELETE'])
-def admin_delete_email(filename):
+@app.route('/admin/delete_email/<int:email_id>', methods=['DELETE'])
+def admin_delete_email(email_id):
     """🗑️ Email löschen - nur für Admins"""
-    logging.info(f"=== EMAIL DELETE DEBUG === Filename: {filename}")
+    logging.info(f"=== EMAIL DELETE DEBUG === Email: {email_id}")
     
     if 'user' not in session:
         return {'success': False, 'error': 'Nicht eingeloggt'}, 401
@@ -1811,29 +3350,12 @@ def admin_delete_email(filename):
         return {'success': False, 'error': 'Keine Berechtigung'}, 403
     
     try:
-        import os
-        email_dir = os.path.join(os.path.dirname(__file__), 'logs', 'emails')
-        
-        # Sicherheitscheck: Nur erlaubte Dateitypen
-        if not (filename.endswith('.json') or filename.endswith('.html')):
-            return {'success': False, 'error': 'Ungültiger Dateityp'}, 400
-        
-        # Beide Dateien löschen (JSON und HTML)
-        base_name = filename.replace('.json', '').replace('.html', '')
-        json_file = os.path.join(email_dir, base_name + '.json')
-        html_file = os.path.join(email_dir, base_name + '.html')
-        
-        deleted_files = []
-        if os.path.exists(json_file):
-            os.remove(json_file)
-            deleted_files.append(base_name + '.json')
-        if os.path.exists(html_file):
-            os.remove(html_file)
-            deleted_files.append(base_name + '.html')
-        
-        if deleted_files:
-            logging.info(f"EMAIL-BOT: Emails gelöscht von {user.username}: {', '.join(deleted_files)}")
-            return {'success': True, 'deleted_files': deleted_files}
+        deleted = EmailArchive.query.filter_by(id=email_id).delete()
+        db.session.commit()
+        
+        if deleted:
+            logging.info(f"EMAIL-BOT: Email #{email_id} gelöscht von {user.username}")
+            return {'success': True, 'deleted': email_id}
         else:
             return {'success': False, 'error': 'Email nicht gefunden'}, 404
             
@@ -1912,49 +3434,7 @@ def admin_users():
                         set_url = url_for('set_password', token=token, _external=True)
                         
                         subject = 'Wartungs-App: Passwort setzen'
-                        text_body = f"""Hallo {new_username},
-
-Ein Administrator hat ein Konto für dich angelegt. Bitte setze dein persönliches Passwort über den folgenden Link:
-
-{set_url}
-
-Dieser Link ist einmalig und sollte aus Sicherheitsgründen zeitnah verwendet werden.
-
-Bei Fragen: Nils Wanning
-
-Viele Grüße
-Wartungs-App Team
-"""
-                        
-                        html_body = f"""
-                        <html>
-                        <body style="font-family: Arial, sans-serif; color: #333; line-height: 1.6;">
-                            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                                <div style="background: linear-gradient(135deg, #3b82f6 0%, #1e40af 100%); color: white; padding: 20px; border-radius: 10px; text-align: center; margin-bottom: 20px;">
-                                    <h1 style="margin: 0; font-size: 24px;">🔐 Passwort setzen</h1>
-                                    <p style="margin: 10px 0 0 0; opacity: 0.9;">Wartungs-App Konto aktivieren</p>
-                                </div>
-                                
-                                <div style="background: #dbeafe; padding: 20px; border-radius: 8px; border-left: 4px solid #3b82f6;">
-                                    <h3 style="color: #1e40af; margin-top: 0;">Hallo {new_username},</h3>
-                                    <p>Ein Administrator hat ein Konto für dich angelegt. Bitte setze dein persönliches Passwort über den folgenden Link:</p>
-                                </div>
-                                
-                                <div style="text-align: center; margin: 30px 0;">
-                                    <a href="{set_url}" 
-                                       style="background: #3b82f6; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block;">
-                                        🔐 Passwort jetzt setzen
-                                    </a>
-                                </div>
-                                
-                                <div style="background: #fef3c7; padding: 15px; border-radius: 5px; text-align: center; font-size: 12px; color: #92400e;">
-                                    <p style="margin: 0;">Dieser Link ist einmalig und sollte zeitnah verwendet werden.</p>
-                                    <p style="margin: 5px 0 0 0;">Bei Fragen: Nils Wanning</p>
-                                </div>
-                            </div>
-                        </body>
-                        </html>
-                        """
+                        html_body, text_body = render_email('password_setup', username=new_username, set_url=set_url)
                         
                         # Speichere Email lokal
                         save_email_locally(
@@ -2028,39 +3508,68 @@ def admin_emails():
     logging.info(f"SUCCESS: Admin {user.username} accessing email-bot interface")
     
     try:
-        import os
-        import json
-        from datetime import datetime
+        # Filter (Typ, Empfänger, Problem) und Keyset-Pagination über die Archiv-ID (neueste zuerst)
+        email_type = request.args.get('type', '').strip()
+        recipient = request.args.get('recipient', '').strip()
+        problem_id = request.args.get('problem_id', type=int)
+        before = request.args.get('before', type=int)
+        page_size = app.config['EMAIL_ARCHIVE_PAGE_SIZE']
         
-        email_dir = os.path.join(os.path.dirname(__file__), 'logs', 'emails')
-        emails = []
+        conditions = []
+        if email_type:
+            conditions.append(EmailArchive.email_type == email_type)
+        if recipient:
+            conditions.append(EmailArchive.recipient == recipient)
+        if problem_id:
+            conditions.append(EmailArchive.problem_id == problem_id)
         
-        if os.path.exists(email_dir):
-            for filename in os.listdir(email_dir):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(email_dir, filename)
-                    try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            email_data = json.load(f)
-                            email_data['filename'] = filename
-                            emails.append(email_data)
-                    except Exception as e:
-                        logging.error(f"Fehler beim Laden der Email {filename}: {e}")
+        # Zählen direkt über die Indizes (ohne die komprimierten Inhalte zu lesen)
+        total = db.session.query(db.func.count(EmailArchive.id)).filter(*conditions).scalar()
+        material_orders = db.session.query(db.func.count(EmailArchive.id)) \
+            .filter(EmailArchive.email_type == 'material_order').scalar()
+        page = EmailArchive.query.filter(*conditions)
+        if before:
+            page = page.filter(EmailArchive.id < before)
+        # body (komprimiert) wird nur für die Vorschau geladen
+        emails = page.options(db.defer(EmailArchive.body)).order_by(EmailArchive.id.desc()).limit(page_size + 1).all()
+        next_before = emails[page_size - 1].id if len(emails) > page_size else None
+        emails = emails[:page_size]
         
-        # Sortiere Emails nach Timestamp (neueste zuerst)
-        emails.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        # Outbox: noch nicht zugestellte oder endgültig fehlgeschlagene E-Mails
+        outbox_counts = outbox_status_counts()
+        outbox_entries = OutboxMail.query.filter(OutboxMail.status.notin_(('sent', 'saved'))) \
+            .order_by(OutboxMail.created_at.desc()).limit(50).all()
         
-        return render_template('admin_emails.html', emails=emails)
+        return render_template('admin_emails.html', emails=emails, total=total, material_orders=material_orders,
+                               next_before=next_before, email_types=EMAIL_TYPES,
+                               filters={'type': email_type, 'recipient': recipient, 'problem_id': problem_id},
+                               outbox_counts=outbox_counts, outbox_entries=outbox_entries)
         
     except Exception as e:
         logging.error(f"Fehler in admin_emails: {e}")
         flash(f'Fehler beim Laden der Emails: {str(e)}', 'danger')
         return redirect(url_for('admin_users'))
 
-@app.route('/admin/email_preview/<filename>')
-def admin_email_preview(filename):
+@app.route('/admin/outbox/<int:mail_id>/retry', methods=['POST'])
+def admin_outbox_retry(mail_id):
+    """📧 Fehlgeschlagene Outbox-E-Mail erneut einreihen"""
+    if 'user' not in session or session['user'] not in ['nils', 'Admin']:
+        return redirect(url_for('login'))
+    
+    entry = OutboxMail.query.get_or_404(mail_id)
+    if entry.status == 'failed':
+        entry.status = 'pending'
+        entry.attempts = 0
+        entry.next_attempt_at = datetime.now(timezone.utc)
+        db.session.commit()
+        mail_outbox.notify()
+        flash(f'E-Mail an {entry.recipient} wird erneut versendet.', 'success')
+    return redirect(url_for('admin_emails'))
+
+@app.route('/admin/email_preview/<int:email_id>')
+def admin_email_preview(email_id):
     """📧 Email-Vorschau im Browser"""
-    logging.info(f"=== EMAIL PREVIEW DEBUG === Filename: {filename}")
+    logging.info(f"=== EMAIL PREVIEW DEBUG === Email: {email_id}")
     logging.info(f"Session user: {session.get('user', 'NOT FOUND')}")
     
     if 'user' not in session:
@@ -2076,17 +3585,9 @@ def admin_email_preview(filename):
         return redirect(url_for('login'))
     
     try:
-        import os
-        email_dir = os.path.join(os.path.dirname(__file__), 'logs', 'emails')
-        
-        # Sicherheitscheck: Nur .html Dateien
-        if not filename.endswith('.html'):
-            return "Ungültiger Dateityp", 400
-        
-        filepath = os.path.join(email_dir, filename)
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read()
+        email = db.session.get(EmailArchive, email_id)
+        if email is not None:
+            return email.html_body
         else:
             return "Email nicht gefunden", 404
             
@@ -2107,14 +3608,8 @@ def admin_delete_problem(problem_id):
     print(f"🗑️ DEBUG admin_delete_problem: problem_id={problem_id}, problem='{problem.problem}'")
     
     try:
-        # Lösche verknüpfte Bilddateien falls vorhanden
-        if problem.image_list:
-            import os
-            for image_file in problem.image_list:
-                image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_file)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                    print(f"🗑️ DEBUG: Bild gelöscht: {image_file}")
+        # Bildverweise freigeben - nicht mehr verwendete Dateien werden nach dem Commit gelöscht
+        orphaned_images = release_uploads(db.session.connection(), problem.image_list)
         
         # FORCE-DELETE: Erst alle Material-Items löschen
         materials = MaterialItem.query.filter_by(problem_id=problem_id).all()
@@ -2128,6 +3623,7 @@ def admin_delete_problem(problem_id):
         print(f"🗑️ DEBUG: Lösche Problem {problem_id}")
         db.session.delete(problem)
         db.session.commit()
+        file_cleanup.enqueue(orphaned_images)
         
         print(f"✅ DEBUG: Problem #{problem_id} und alle Material-Items erfolgreich gelöscht")
         flash(f'Problem #{problem_id} wurde erfolgreich gelöscht.', 'success')
@@ -2147,14 +3643,35 @@ def admin_delete_problem(problem_id):
                                               {"problem_id": problem_id})
                 print(f"🔧 DEBUG: {result_materials.rowcount} Material-Items force-gelöscht")
                 
+                # Zähler-Schlüssel merken (direktes SQL umgeht die Mapper-Events)
+                counter_row = conn.execute(text("SELECT bohrturm, abteilung, system, status, images FROM problem WHERE id = :problem_id"),
+                                           {"problem_id": problem_id}).first()
+                
                 # Dann Problem löschen
                 result_problem = conn.execute(text("DELETE FROM problem WHERE id = :problem_id"), 
                                             {"problem_id": problem_id})
                 print(f"🔧 DEBUG: {result_problem.rowcount} Problem force-gelöscht")
                 
+                orphaned_images = []
+                if result_problem.rowcount > 0 and counter_row:
+                    if counter_row.images:
+                        orphaned_images = release_uploads(conn, json.loads(counter_row.images))
+                    _adjust_status_counter(conn, counter_row.bohrturm, counter_row.abteilung,
+                                           counter_row.status or 'gemeldet', -1, -int(bool(counter_row.images)))
+                    if _search_index_ready(conn):
+                        conn.execute(problem_fts.delete().where(problem_fts.c.rowid == problem_id))
+                    conn.execute(ProblemEvent.__table__.insert().values(
+                        problem_id=problem_id, bohrturm=counter_row.bohrturm, abteilung=counter_row.abteilung,
+                        system=counter_row.system, from_status=counter_row.status, to_status='gelöscht',
+                        ts=datetime.now(timezone.utc), username=session.get('user'),
+                    ))
+                
                 conn.commit()
+                file_cleanup.enqueue(orphaned_images)
                 
                 if result_problem.rowcount > 0:
+                    record_problem_deletion(problem_id)
+                    bump_data_version()
                     print(f"✅ DEBUG: Force-Delete erfolgreich!")
                     flash(f'Problem #{problem_id} wurde force-gelöscht.', 'success')
                 else:
@@ -2198,7 +3715,151 @@ def set_password(token):
     return render_template('set_password.html', token=token)
 
 
+HISTORY_FILTER_ARGS = ('bohrturm', 'abteilung', 'date_from', 'date_to', 'search')
+HISTORY_CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+HISTORY_STATUSES = ('abgearbeitet', 'bestätigt')
+
+
+def apply_history_filters(query, args, model=Problem):
+    """Beschränkt eine Query auf abgeschlossene Probleme und wendet die Filter der Historie an (auch für den Export)"""
+    query = query.filter(model.status.in_(HISTORY_STATUSES))
+    bohrturm = args.get('bohrturm')
+    abteilung = args.get('abteilung') 
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+
+    if bohrturm:
+        query = query.filter(model.bohrturm == bohrturm)
+    if abteilung:
+        query = query.filter(model.abteilung == abteilung)
+    if date_from:
+        date_from = datetime.strptime(date_from, '%Y-%m-%d')
+        query = query.filter(model.status_changed_at >= date_from)
+    if date_to:
+        date_to = datetime.strptime(date_to, '%Y-%m-%d')
+        date_to = date_to.replace(hour=23, minute=59, second=59)
+        query = query.filter(model.status_changed_at <= date_to)
+    # Volltextsuche (FTS5) statt LIKE-Scan über drei Spalten
+    return apply_search_filter(query, args.get('search'), model=model)
+
+
+def history_tier_queries(args):
+    """
+    Gefilterte Queries für beide Speicherstufen der Historie: [(Modell, Query), ...]
+    
+    Die aktive Tabelle wird je abgeschlossenem Status abgefragt - mit status = ? liefert der Index
+    ix_problem_status_changed_id die Zeilen bereits sortiert, bei status IN (...) müsste SQLite
+    alle abgeschlossenen Probleme für jede Seite sortieren.
+    """
+    return [
+        *[(Problem, apply_history_filters(Problem.query, args).filter(Problem.status == status))
+          for status in HISTORY_STATUSES],
+        (ArchivedProblem, apply_history_filters(ArchivedProblem.query, args, model=ArchivedProblem)),
+    ]
+
+
+def encode_history_cursor(problem):
+    """Erzeugt den Cursor (Abschlusszeitpunkt-ID) für eine Zeile der Historie, ohne Zeitpunkt nur -ID"""
+    changed_at = problem.status_changed_at.strftime(HISTORY_CURSOR_FORMAT) if problem.status_changed_at else ''
+    return f"{changed_at}-{problem.id}"
+
+
+def decode_history_cursor(cursor):
+    """Liest einen Historien-Cursor aus der URL, gibt (zeitpunkt oder None, id) oder None zurück"""
+    if not cursor:
+        return None
+    try:
+        changed_at, problem_id = cursor.split('-', 1)
+        return (datetime.strptime(changed_at, HISTORY_CURSOR_FORMAT) if changed_at else None), int(problem_id)
+    except ValueError:
+        return None
+
+
+def history_sort_key(problem):
+    """Sortierschlüssel der Historie - Probleme ohne Zeitpunkt (Altdaten) stehen wie in SQLite hinter allen anderen"""
+    return problem.status_changed_at is not None, problem.status_changed_at or datetime.min, problem.id
+
+
+def _history_tier_rows(model, query, limit, after=None, before=None):
+    """
+    Bis zu limit Zeilen einer Speicherstufe ab dem Cursor (absteigend, bei before aufsteigend)
+    
+    Zeilen mit und ohne status_changed_at werden getrennt gelesen: NULL passt in keinen
+    </>-Vergleich, und nur so bleibt der Zeitpunkt eine Bereichsbedingung auf dem Index.
+    """
+    changed_at = model.status_changed_at
+    dated = query.filter(changed_at.isnot(None))
+    undated = query.filter(changed_at.is_(None))
+    
+    if before:
+        before_at, before_id = before
+        if before_at is None:
+            rows = undated.filter(model.id > before_id).order_by(model.id.asc()).limit(limit).all()
+            dated_filter = ()
+        else:
+            rows = []
+            dated_filter = (changed_at >= before_at, db.or_(
+                changed_at > before_at,
+                db.and_(changed_at == before_at, model.id > before_id)
+            ))
+        if len(rows) < limit:
+            rows += dated.filter(*dated_filter).order_by(changed_at.asc(), model.id.asc()) \
+                .limit(limit - len(rows)).all()
+        return rows
+    
+    rows = []
+    if after and after[0] is None:
+        # Cursor liegt bereits bei den Zeilen ohne Zeitpunkt
+        undated = undated.filter(model.id < after[1])
+    else:
+        if after:
+            after_at, after_id = after
+            dated = dated.filter(changed_at <= after_at, db.or_(
+                changed_at < after_at,
+                db.and_(changed_at == after_at, model.id < after_id)
+            ))
+        rows = dated.order_by(changed_at.desc(), model.id.desc()).limit(limit).all()
+    if len(rows) < limit:
+        rows += undated.order_by(model.id.desc()).limit(limit - len(rows)).all()
+    return rows
+
+
+def paginate_history_keyset(tiers, page_size, after=None, before=None):
+    """
+    Keyset-Pagination der Historie über (status_changed_at desc, ID desc) - über alle Speicherstufen
+    
+    Jede Stufe liefert höchstens page_size + 1 Zeilen ab dem Cursor (Index auf status_changed_at),
+    die Seite entsteht durch Zusammenführen dieser kleinen Teilergebnisse. Probleme ohne
+    status_changed_at folgen nach allen anderen (absteigend nach ID).
+    
+    Args:
+        tiers: Liste von (Modell, gefilterte Query)
+    
+    Returns:
+        (problems, prev_cursor, next_cursor)
+    """
+    rows = []
+    for model, query in tiers:
+        rows += _history_tier_rows(model, query, page_size + 1, after=after, before=before)
+    
+    if before:
+        rows = sorted(rows, key=history_sort_key)
+        has_more = len(rows) > page_size
+        rows = list(reversed(rows[:page_size]))
+        has_prev, has_next = has_more, True
+    else:
+        rows = sorted(rows, key=history_sort_key, reverse=True)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        has_prev, has_next = bool(after), has_more
+    
+    prev_cursor = encode_history_cursor(rows[0]) if rows and has_prev else None
+    next_cursor = encode_history_cursor(rows[-1]) if rows and has_next else None
+    return rows, prev_cursor, next_cursor
+
+
 @app.route('/history')
+@conditional_view()
 def history():
     if 'user' not in session:
         return redirect(url_for('login'))
@@ -2213,50 +3874,314 @@ def history():
         return redirect(url_for('problems'))
     
     # Suchparameter für Historie - zeige sowohl abgearbeitete als auch bestätigte Probleme
-    query = Problem.query.filter(Problem.status.in_(['abgearbeitet', 'bestätigt']))
-    bohrturm = request.args.get('bohrturm')
-    abteilung = request.args.get('abteilung') 
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
     search_term = request.args.get('search')
-
-    if bohrturm:
-        query = query.filter(Problem.bohrturm == bohrturm)
-    if abteilung:
-        query = query.filter(Problem.abteilung == abteilung)
-    if date_from:
-        date_from = datetime.strptime(date_from, '%Y-%m-%d')
-        query = query.filter(Problem.status_changed_at >= date_from)
-    if date_to:
-        date_to = datetime.strptime(date_to, '%Y-%m-%d')
-        date_to = date_to.replace(hour=23, minute=59, second=59)
-        query = query.filter(Problem.status_changed_at <= date_to)
-    if search_term:
-        query = query.filter(
-            Problem.problem.contains(search_term) |
-            Problem.loeschen_kommentar.contains(search_term) |
-            Problem.massnahmen.contains(search_term)
-        )
-
-    # Sortierung: Neueste zuerst
-    archived_problems = query.order_by(Problem.status_changed_at.desc()).all()
-    
-    # Statistiken für die Historie
-    total_archived = len(archived_problems)
-    problems_with_images = len([p for p in archived_problems if p.image_list])
+    tiers = history_tier_queries(request.args)
+
+    # Statistiken für die Historie - als Aggregat in SQL (je Speicherstufe) statt über alle geladenen Zeilen
+    total_archived = problems_with_images = 0
+    for model, query in tiers:
+        has_images = db.and_(model.images.isnot(None), model.images != '', model.images != '[]')
+        count, with_images = query.with_entities(
+            db.func.count(model.id),
+            db.func.sum(case((has_images, 1), else_=0)),
+        ).one()
+        total_archived += count
+        problems_with_images += with_images or 0
+
+    # Sortierung: Neueste zuerst - seitenweise (Keyset), Filter bleiben in den Blätter-Links erhalten
+    page_size = request.args.get('per_page', type=int) or app.config['PROBLEMS_PAGE_SIZE']
+    page_size = max(1, min(page_size, app.config['PROBLEMS_MAX_PAGE_SIZE']))
+    filter_args = {key: request.args.get(key) for key in HISTORY_FILTER_ARGS if request.args.get(key)}
+    if request.args.get('per_page'):
+        filter_args['per_page'] = page_size
+    
+    load_options = {
+        Problem: problem_list_load_options(),
+        ArchivedProblem: (joinedload(ArchivedProblem.assigned_user), joinedload(ArchivedProblem.besteller_user)),
+    }
+    archived_problems, prev_cursor, next_cursor = paginate_history_keyset(
+        [(model, query.options(*load_options[model])) for model, query in tiers],
+        page_size,
+        after=decode_history_cursor(request.args.get('after')),
+        before=decode_history_cursor(request.args.get('before'))
+    )
     
-    # Eindeutige Werte für Filter-Dropdowns
-    all_bohrtuerme = db.session.query(Problem.bohrturm).filter_by(status='abgearbeitet').distinct().all()
-    all_abteilungen = db.session.query(Problem.abteilung).filter_by(status='abgearbeitet').distinct().all()
+    # Eindeutige Werte für Filter-Dropdowns - aus den gepflegten Zählern statt DISTINCT über alle Probleme
+    ensure_status_counters()
+    counters = ProblemStatusCounter.query.filter(
+        ProblemStatusCounter.status == 'abgearbeitet',
+        ProblemStatusCounter.anzahl > 0
+    ).all()
     
     return render_template('history.html', 
                          problems=archived_problems,
                          total_archived=total_archived,
                          problems_with_images=problems_with_images,
-                         bohrtuerme=[b[0] for b in all_bohrtuerme],
-                         abteilungen=[a[0] for a in all_abteilungen],
+                         bohrtuerme=sorted({c.bohrturm for c in counters}),
+                         abteilungen=sorted({c.abteilung for c in counters}),
+                         prev_cursor=prev_cursor, next_cursor=next_cursor, filter_args=filter_args,
+                         search_snippets=search_snippets([p.id for p in archived_problems], search_term),
                          is_admin=is_admin)
 
+# ===== EXPORT (CSV / XLSX) =====
+# Die Zeilen werden als reine Spalten-Tupel (keine ORM-Objekte, keine Identity-Map) in Blöcken
+# von EXPORT_CHUNK_SIZE gelesen und sofort in die Antwort geschrieben - der Speicherbedarf
+# hängt nicht von der Anzahl der exportierten Probleme ab.
+
+EXPORT_COLUMNS = (
+    'ID', 'Anlage', 'Abteilung', 'System', 'Problem', 'Status', 'Status geändert am',
+    'Zugewiesen an', 'Verantwortlicher', 'Maßnahmen', 'Kommentar', 'PR-Nummer', 'Lieferdatum',
+    'Anzahl Materialien', 'Materialien', 'Fortschritt-Updates',
+)
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+_XML_INVALID_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _format_export_date(value, with_time=True):
+    if not value:
+        return ''
+    return value.strftime('%d.%m.%Y %H:%M' if with_time else '%d.%m.%Y')
+
+
+def _flatten_progress_updates(raw):
+    """Fortschritt-Updates als eine Textspalte: 'Datum Benutzer: Text | ...'"""
+    if not raw:
+        return ''
+    entries = []
+    for update in json.loads(raw):
+        try:
+            stamp = _format_export_date(datetime.fromisoformat(update.get('timestamp', '')))
+        except ValueError:
+            stamp = ''
+        entries.append(f"{stamp} {update.get('user', '')}: {update.get('text', '')}".strip())
+    return ' | '.join(entries)
+
+
+def _load_export_materials(problem_ids):
+    """Materialien für einen Block von Problemen mit einer Abfrage, als {problem_id: [text, ...]}"""
+    materials = {}
+    rows = db.session.execute(
+        db.select(MaterialItem.problem_id, MaterialItem.mm_nummer, MaterialItem.beschreibung,
+                  MaterialItem.menge, MaterialItem.einheit, MaterialItem.bestellt)
+        .where(MaterialItem.problem_id.in_(problem_ids))
+        .order_by(MaterialItem.problem_id, MaterialItem.id)
+    )
+    for problem_id, mm_nummer, beschreibung, menge, einheit, bestellt in rows:
+        state = 'bestellt' if bestellt else 'offen'
+        materials.setdefault(problem_id, []).append(
+            f"{mm_nummer} {beschreibung} ({menge or 1} {einheit or 'Stück'}, {state})"
+        )
+    return materials
+
+
+def _archived_export_materials(materials_json):
+    """Material-Schnappschuss eines archivierten Problems im gleichen Format wie _load_export_materials"""
+    return [
+        f"{item['mm_nummer']} {item['beschreibung']} ({item.get('menge') or 1} {item.get('einheit') or 'Stück'}, "
+        f"{'bestellt' if item.get('bestellt') else 'offen'})"
+        for item in json.loads(materials_json)
+    ] if materials_json else []
+
+
+def _iter_export_tier(model, query, order_by):
+    """Liefert (Rohzeile, Exportwerte) einer Speicherstufe blockweise"""
+    archived = model is ArchivedProblem
+    columns = [
+        model.id, model.bohrturm, model.abteilung, model.system, model.problem,
+        model.status, model.status_changed_at, User.username, model.verantwortlicher,
+        model.massnahmen, model.loeschen_kommentar, model.pr_nummer, model.lieferdatum,
+        model.progress_updates,
+    ]
+    if archived:
+        columns.append(model.materials_json)
+    rows = query.outerjoin(User, User.id == model.assigned_to).with_entities(*columns) \
+        .order_by(*order_by).yield_per(app.config['EXPORT_CHUNK_SIZE'])
+    
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, app.config['EXPORT_CHUNK_SIZE']))
+        if not chunk:
+            break
+        materials = {} if archived else _load_export_materials([row.id for row in chunk])
+        for row in chunk:
+            items = _archived_export_materials(row.materials_json) if archived else materials.get(row.id, [])
+            yield row, [
+                row.id, row.bohrturm, row.abteilung, row.system, row.problem, row.status,
+                _format_export_date(row.status_changed_at), row.username or '', row.verantwortlicher or '',
+                row.massnahmen or '', row.loeschen_kommentar or '', row.pr_nummer or '',
+                _format_export_date(row.lieferdatum, with_time=False),
+                len(items), '; '.join(items), _flatten_progress_updates(row.progress_updates),
+            ]
+
+
+def iter_export_rows(tiers, sort_key=None):
+    """
+    Liefert die Exportzeilen (Listen in der Reihenfolge von EXPORT_COLUMNS) blockweise
+    
+    Args:
+        tiers: Liste von (Modell, gefilterte Query, Sortierausdrücke)
+        sort_key: bei mehreren Stufen - Schlüssel der absteigend sortierten Rohzeilen für das Zusammenführen
+    """
+    streams = [_iter_export_tier(model, query, order_by) for model, query, order_by in tiers]
+    if len(streams) > 1:
+        merged = heapq.merge(*streams, key=lambda item: sort_key(item[0]), reverse=True)
+    else:
+        merged = streams[0]
+    for _, values in merged:
+        yield values
+
+
+# Zellen mit diesen Anfangszeichen wertet Excel als Formel aus (CSV-Injection)
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    """Stellt Texten, die Excel als Formel lesen würde, ein ' voran"""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows):
+    """CSV mit Semikolon und BOM (öffnet sich in deutschem Excel direkt korrekt)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_cell(value) for value in row])
+        if count % app.config['EXPORT_CHUNK_SIZE'] == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _ZipStream:
+    """Nicht-seekbares Ziel für zipfile - gesammelte Bytes werden nach jedem Block abgeholt"""
+    
+    def __init__(self):
+        self.buffer = bytearray()
+    
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    value = _XML_INVALID_CHARS.sub('', str(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{xml_escape(value)}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Probleme" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def stream_xlsx(rows):
+    """
+    Schreibt eine minimale XLSX-Datei (ein Tabellenblatt, Inline-Strings) direkt in die Antwort
+    
+    Kommt ohne zusätzliche Bibliothek aus: zipfile schreibt in einen nicht-seekbaren Puffer,
+    der nach jedem Block geleert wird.
+    """
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+        
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(_xlsx_row(EXPORT_COLUMNS).encode('utf-8'))
+            for count, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if count % app.config['EXPORT_CHUNK_SIZE'] == 0:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+@app.route('/export/<scope>')
+def export_problems(scope):
+    """
+    Export der Historie oder der aktiven Problemliste mit den Filtern der jeweiligen Seite
+    
+    scope: 'history' (nur Admins) oder 'problems'; ?format=csv|xlsx
+    """
+    if 'user' not in session:
+        return redirect(url_for('login'))
+    export_format = request.args.get('format', 'csv')
+    if scope not in ('history', 'problems') or export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unbekannter Export'}), 404
+    
+    if scope == 'history':
+        if session['user'] not in ['nils', 'Admin']:
+            flash('Keine Berechtigung für diese Seite.', 'error')
+            return redirect(url_for('problems'))
+        # Aktive Tabelle und Archiv, nach Abschlusszeitpunkt zusammengeführt (ohne Zeitpunkt wie in SQLite zuletzt)
+        rows = iter_export_rows(
+            [(model, query, (model.status_changed_at.desc(), model.id.desc()))
+             for model, query in history_tier_queries(request.args)],
+            sort_key=history_sort_key
+        )
+    else:
+        query = apply_problem_filters(
+            Problem.query.filter(~Problem.status.in_(['abgearbeitet', 'bestätigt'])), request.args
+        )
+        rows = iter_export_rows([(Problem, query, (status_priority_expr(), Problem.id.desc()))])
+    
+    body = stream_xlsx(rows) if export_format == 'xlsx' else stream_csv(rows)
+    filename = f"{scope}_{datetime.now().strftime('%Y%m%d_%H%M')}.{export_format}"
+    return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
 @app.route('/history/delete/<int:problem_id>', methods=['POST'])
 def delete_from_history(problem_id):
     if 'user' not in session:
@@ -2269,7 +4194,19 @@ def delete_from_history(problem_id):
         flash('Keine Berechtigung für diese Aktion.', 'error')
         return redirect(url_for('history'))
     
-    problem = Problem.query.get_or_404(problem_id)
+    problem = db.session.get(Problem, problem_id)
+    if problem is None:
+        # Bereits ins Archiv verschoben - dort mengenbasiert löschen
+        db.get_or_404(ArchivedProblem, problem_id)
+        try:
+            delete_history_problems([problem_id])
+            flash(f'Problem #{problem_id} wurde erfolgreich aus der Historie gelöscht.', 'success')
+            logging.info(f"Archiviertes Problem #{problem_id} gelöscht von {session.get('user')}")
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Fehler beim Löschen des Problems: {str(e)}', 'error')
+            logging.error(f"Fehler beim Löschen von Problem #{problem_id}: {e}")
+        return redirect(url_for('history'))
     
     # Nur abgearbeitete/bestätigte Probleme können aus der Historie gelöscht werden
     if problem.status not in ['abgearbeitet', 'bestätigt']:
@@ -2282,16 +4219,13 @@ def delete_from_history(problem_id):
         for material_item in material_items:
             db.session.delete(material_item)
         
-        # Lösche verknüpfte Bilddateien falls vorhanden
-        if problem.image_list:
-            for image_file in problem.image_list:
-                image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_file)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
+        # Bildverweise freigeben - nicht mehr verwendete Dateien werden nach dem Commit im Hintergrund gelöscht
+        image_files = release_uploads(db.session.connection(), problem.image_list)
         
         # Lösche das Problem aus der Datenbank
         db.session.delete(problem)
         db.session.commit()
+        file_cleanup.enqueue(image_files)
         flash(f'Problem #{problem_id} wurde erfolgreich aus der Historie gelöscht.', 'success')
         logging.info(f"Problem #{problem_id} aus Historie gelöscht von {session.get('user')}")
     except Exception as e:
@@ -2301,6 +4235,63 @@ def delete_from_history(problem_id):
     
     return redirect(url_for('history'))
 
+def delete_history_problems(problem_ids):
+    """
+    Löscht abgeschlossene Probleme (aktive Tabelle und Archiv) mengenbasiert in einer Transaktion
+    
+    Ein DELETE pro Tabelle. Mengen-DELETEs umgehen die Mapper-Events - Zähler, Ereignisprotokoll,
+    Suchindex, Lösch-Protokoll und Datenversion werden deshalb hier direkt mitgeführt.
+    Bildverweise werden freigegeben; nicht mehr verwendete Dateien gehen erst nach dem Commit
+    an den Cleanup-Worker.
+    
+    Returns:
+        Liste der tatsächlich gelöschten IDs (offene/unbekannte werden übersprungen)
+    """
+    rows_by_model = {}
+    for model in (Problem, ArchivedProblem):
+        rows_by_model[model] = db.session.execute(
+            db.select(model.id, model.bohrturm, model.abteilung, model.system, model.status, model.images)
+            .where(model.id.in_(problem_ids), model.status.in_(['abgearbeitet', 'bestätigt']))
+        ).all()
+    rows = [row for model_rows in rows_by_model.values() for row in model_rows]
+    if not rows:
+        return []
+    deleted_ids = [row.id for row in rows]
+    connection = db.session.connection()
+    now = datetime.now(timezone.utc)
+    username = session.get('user') if has_request_context() else None
+    
+    connection.execute(ProblemEvent.__table__.insert(), [{
+        'problem_id': row.id, 'bohrturm': row.bohrturm, 'abteilung': row.abteilung, 'system': row.system,
+        'from_status': row.status, 'to_status': 'gelöscht', 'ts': now, 'username': username,
+    } for row in rows])
+    
+    counter_deltas = {}
+    for row in rows:
+        count, with_images = counter_deltas.get((row.bohrturm, row.abteilung, row.status), (0, 0))
+        counter_deltas[(row.bohrturm, row.abteilung, row.status)] = (count + 1, with_images + int(bool(row.images)))
+    for (bohrturm, abteilung, status), (count, with_images) in counter_deltas.items():
+        _adjust_status_counter(connection, bohrturm, abteilung, status, -count, -with_images)
+    
+    if _search_index_ready(connection):
+        connection.execute(problem_fts.delete().where(problem_fts.c.rowid.in_(deleted_ids)))
+    hot_ids = [row.id for row in rows_by_model[Problem]]
+    if hot_ids:
+        connection.execute(MaterialItem.__table__.delete().where(MaterialItem.problem_id.in_(hot_ids)))
+        connection.execute(Problem.__table__.delete().where(Problem.id.in_(hot_ids)))
+    archived_ids = [row.id for row in rows_by_model[ArchivedProblem]]
+    if archived_ids:
+        connection.execute(ArchivedProblem.__table__.delete().where(ArchivedProblem.id.in_(archived_ids)))
+    orphaned_images = release_uploads(connection, [name for row in rows if row.images for name in json.loads(row.images)])
+    db.session.commit()
+    
+    for problem_id in deleted_ids:
+        record_problem_deletion(problem_id)
+    bump_data_version()
+    file_cleanup.enqueue(orphaned_images)
+    return deleted_ids
+
+
 @app.route('/history/bulk-delete', methods=['POST'])
 def bulk_delete_from_history():
     if 'user' not in session:
@@ -2318,38 +4309,16 @@ def bulk_delete_from_history():
         flash('Keine Probleme ausgewählt.', 'warning')
         return redirect(url_for('history'))
     
-    deleted_count = 0
-    errors = []
-    
-    for problem_id in selected_ids:
-        try:
-            problem = Problem.query.get(int(problem_id))
-            if problem and problem.status in ['abgearbeitet', 'bestätigt']:
-                # Lösche zuerst alle verknüpften MaterialItem-Einträge
-                material_items = MaterialItem.query.filter_by(problem_id=int(problem_id)).all()
-                for material_item in material_items:
-                    db.session.delete(material_item)
-                
-                # Lösche verknüpfte Bilddateien
-                if problem.image_list:
-                    for image_file in problem.image_list:
-                        image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_file)
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
-                
-                db.session.delete(problem)
-                deleted_count += 1
-        except Exception as e:
-            errors.append(f"Problem #{problem_id}: {str(e)}")
+    problem_ids = [int(problem_id) for problem_id in selected_ids if problem_id.isdigit()]
     
     try:
-        db.session.commit()
-        flash(f'{deleted_count} Problem(e) erfolgreich aus der Historie gelöscht.', 'success')
-        logging.info(f"{deleted_count} Probleme aus Historie gelöscht von {session.get('user')}")
+        deleted_ids = delete_history_problems(problem_ids)
+        flash(f'{len(deleted_ids)} Problem(e) erfolgreich aus der Historie gelöscht.', 'success')
+        logging.info(f"{len(deleted_ids)} Probleme aus Historie gelöscht von {session.get('user')}")
         
-        if errors:
-            for error in errors:
-                flash(f'Fehler: {error}', 'warning')
+        skipped = len(selected_ids) - len(deleted_ids)
+        if skipped:
+            flash(f'{skipped} Problem(e) übersprungen (nicht gefunden oder nicht abgearbeitet).', 'warning')
                 
     except Exception as e:
         db.session.rollback()
@@ -2529,9 +4498,7 @@ def material_statistics():
 
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        create_admin()
+    init_database()
     # App für Netzwerkzugriff konfigurieren (von iPhone erreichbar)
     # SICHERHEIT: Debug-Modus nur in Entwicklung verwenden
     debug_mode = os.environ.get('DEBUG', 'False').lower() == 'true'
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Wartungs-Script: Verschiebt lange bestätigte Probleme in die Archiv-Tabelle (problem_archive)
+
+Die Historie und der Export lesen beide Tabellen, für Benutzer ändert sich nichts.
+Zum regelmäßigen Aufruf (z.B. nächtlich per Cron / Aufgabenplanung) gedacht.
+
+Aufruf:
+    python archive_problems.py                 # Alter aus ARCHIVE_AFTER_DAYS (Standard 180 Tage)
+    python archive_problems.py --days 90       # abweichendes Mindestalter
+"""
+
+import argparse
+
+from app import app, db, archive_confirmed_problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Bestätigte Probleme archivieren')
+    parser.add_argument('--days', type=int, default=None, help='Mindestalter seit der Bestätigung in Tagen')
+    parser.add_argument('--batch', type=int, default=None, help='Probleme pro Transaktion')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        try:
+            archived = archive_confirmed_problems(older_than_days=args.days, batch_size=args.batch)
+            print(f"✅ {archived} Problem(e) archiviert.")
+        except Exception as e:
+            print(f"❌ Fehler beim Archivieren: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Rendert alle E-Mail-Vorlagen (templates/emails) wiederholt und gibt die Zeit pro E-Mail aus
+
+Aufruf:
+    python benchmark_email_render.py            # 2000 Durchläufe je Vorlage
+    python benchmark_email_render.py 10000
+"""
+
+import sys
+import time
+from types import SimpleNamespace
+
+from app import app, render_email
+
+def sample_contexts():
+    """Beispieldaten für jede Vorlage (ohne Datenbank)"""
+    user = SimpleNamespace(username='T700 EL', email='t700el@example.com')
+    problem = SimpleNamespace(
+        id=4711, bohrturm='T-700', abteilung='Elektrisch', system='Top Drive',
+        problem='Motor überhitzt <nach> 2h Betrieb & Lüfter läuft nicht an',
+        massnahmen='Lüfter getauscht, Temperaturfühler geprüft', mm_nummer='MM-100234',
+        teil_beschreibung='Lüftermotor 400V', verantwortlicher='T700 EL',
+        image_list=['a.jpg', 'b.jpg']
+    )
+    material_items = [SimpleNamespace(mm_nummer=f'MM-{i:06d}', beschreibung=f'Ersatzteil {i}', menge=i + 1, einheit='Stück')
+                      for i in range(10)]
+    return {
+        'problem_assignment': dict(user=user, problem=problem),
+        'problem_notification': dict(user=user, problem=problem, responsible_users=['T700 MECH', 'T700 EL']),
+        'material_request': dict(subject='🛒 Material-Bestellung erforderlich: T-700 - 10 Positionen', rsc_user=user,
+                                 problem=problem, material_items=material_items, requester_names=['T700 EL']),
+        'material_order': dict(besteller_user=user, problem=problem, bearbeiter_name='T700 EL'),
+        'problem_completion': dict(admin=user, problem=problem, kommentar='Erledigt'),
+        'password_setup': dict(username='neuer.benutzer', set_url='http://localhost:5000/set_password/abc'),
+    }
+
+def main(runs=2000):
+    with app.app_context():
+        total = 0.0
+        for name, context in sample_contexts().items():
+            render_email(name, **context)  # Kompilieren/Caching nicht mitmessen
+            start = time.perf_counter()
+            for _ in range(runs):
+                html_body, text_body = render_email(name, **context)
+            elapsed = time.perf_counter() - start
+            total += elapsed
+            print(f"{name:22s} {elapsed / runs * 1e6:8.1f} µs/E-Mail  (HTML {len(html_body):5d} B, Text {len(text_body):4d} B)")
+        print(f"{'gesamt':22s} {total / (runs * 6) * 1e6:8.1f} µs/E-Mail im Mittel")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,93 @@
+"""
+Bildverarbeitung für Uploads
+
+Läuft in den Prozessen des Bild-Worker-Pools (siehe ImagePipeline in app.py) und importiert
+bewusst nur PIL - die Aufträge selbst brauchen weder App-Kontext noch Datenbank.
+
+Achtung: Mit 'spawn' importiert jeder Worker beim Start zusätzlich das Hauptmodul des Servers
+neu (bei python app.py also app.py als __mp_main__, unter launcher.py dessen Importe). Dabei
+laufen nur die Modul-Definitionen, nicht der __main__-Block - es werden keine Datenbank-
+verbindungen geöffnet und keine Hintergrund-Threads gestartet. Die Kosten fallen einmal pro
+Worker an, der Pool bleibt danach bestehen.
+"""
+
+import os
+import threading
+
+from PIL import Image
+
+# Verkleinerte Varianten für Listen und Modals (Name -> maximale Größe)
+# Das Original wird nur beim expliziten Vergrößern geladen.
+DERIVATIVE_SIZES = {
+    'thumb': (400, 400),
+    'medium': (1280, 1280),
+}
+
+
+def _to_rgb(img):
+    """Konvertiert ein Bild nach RGB (transparente Bereiche werden weiß)"""
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _save_jpeg(img, filepath, quality):
+    """Speichert erst in eine temporäre Datei, damit gleichzeitige Abrufe nie eine halb geschriebene Datei sehen"""
+    temp_path = f"{filepath}.{os.getpid()}-{threading.get_ident()}.tmp"
+    img.save(temp_path, 'JPEG', quality=quality, optimize=True)
+    os.replace(temp_path, filepath)
+
+
+def optimize_image(filepath, max_size=(1920, 1080), quality=85):
+    """Optimiert Bilder für bessere Performance und Speicherplatz"""
+    with Image.open(filepath) as img:
+        # Konvertiere zu RGB falls RGBA (für JPEG)
+        img = _to_rgb(img)
+        
+        # Größe anpassen falls zu groß
+        if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        
+        # Als JPEG mit Qualitätsoptimierung speichern
+        _save_jpeg(img, filepath, quality)
+
+
+def create_derivative(source_path, target_path, size, quality=80):
+    """Erzeugt eine verkleinerte JPEG-Variante eines Bildes"""
+    with Image.open(source_path) as img:
+        img.draft('RGB', size)  # JPEGs direkt verkleinert dekodieren
+        img = _to_rgb(img)
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        _save_jpeg(img, target_path, quality)
+
+
+def derivative_path(derivative_folder, variant, filename):
+    """Pfad einer Bild-Variante"""
+    return os.path.join(derivative_folder, variant, filename)
+
+
+def process_upload(upload_folder, filename, derivative_folder):
+    """
+    Optimiert ein hochgeladenes Bild und erzeugt alle Varianten aus DERIVATIVE_SIZES
+    
+    filename ist der gespeicherte Name relativ zum Upload-Ordner (z.B. 'ab/cd/<sha256>.jpg') -
+    die Varianten liegen unter demselben relativen Pfad.
+    """
+    filepath = os.path.join(upload_folder, filename)
+    optimize_image(filepath)
+    for variant, size in DERIVATIVE_SIZES.items():
+        create_derivative(filepath, derivative_path(derivative_folder, variant, filename), size)
+
+
+def create_missing_derivatives(upload_folder, filename, derivative_folder):
+    """Erzeugt die fehlenden Varianten eines bereits optimierten Bildes (z.B. ältere Uploads)"""
+    filepath = os.path.join(upload_folder, filename)
+    for variant, size in DERIVATIVE_SIZES.items():
+        target = derivative_path(derivative_folder, variant, filename)
+        if not os.path.exists(target):
+            create_derivative(filepath, target, size)
@@ -1,9 +1,10 @@
 import os
 import sys
+import multiprocessing
 import webbrowser
 from threading import Timer
 from waitress import serve
-from app import app
+from app import app, init_database
 
 def open_browser():
     webbrowser.open('http://127.0.0.1:5000')
@@ -18,6 +19,9 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 if __name__ == '__main__':
+    # Nötig für die Bild-Worker-Prozesse in der PyInstaller-Version
+    multiprocessing.freeze_support()
+    
     # Stelle sicher, dass wir im richtigen Verzeichnis sind
     if getattr(sys, 'frozen', False):
         os.chdir(os.path.dirname(sys.executable))
@@ -25,6 +29,9 @@ if __name__ == '__main__':
     # Setze den Instance Path für Flask
     app.instance_path = os.path.join(os.getcwd(), 'instance')
     os.makedirs(app.instance_path, exist_ok=True)
+    
+    # Datenbank vorbereiten (Tabellen, Admin-Accounts, Volltext-Index)
+    init_database()
 
     # Öffne den Browser nach 1.5 Sekunden
     Timer(1.5, open_browser).start()
@@ -32,4 +39,6 @@ if __name__ == '__main__':
     # Starte den Server
     print("Wartungs-App wird gestartet...")
     print("Bitte schließen Sie dieses Fenster nicht, solange Sie die App verwenden.")
-    serve(app, host='127.0.0.1', port=5000)
\ No newline at end of file
+    # Threads für normale Requests plus je einer pro Live-Stream (SSE_MAX_CLIENTS)
+    serve(app, host='127.0.0.1', port=5000, threads=app.config['SERVER_THREADS'],
+          connection_limit=app.config['SERVER_CONNECTION_LIMIT'])
\ No newline at end of file
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Migrations-Script: Übernimmt die bisher als JSON/HTML-Dateien in logs/emails gespeicherten
+E-Mails in die Tabelle email_archive (Inhalte komprimiert)
+
+Aufruf:
+    python migrate_email_archive.py            # importieren, Dateien bleiben liegen
+    python migrate_email_archive.py --delete   # importieren und Dateien danach löschen
+"""
+
+import os
+import sys
+import json
+from datetime import datetime
+
+from app import app, db, EmailArchive
+
+EMAIL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'emails')
+
+def migrate_email_archive(delete_files=False):
+    """Importiert alle JSON-Dateien aus logs/emails in das Email-Archiv"""
+    if not os.path.isdir(EMAIL_DIR):
+        print("ℹ️ Kein Verzeichnis logs/emails vorhanden - nichts zu tun.")
+        return
+    with app.app_context():
+        db.create_all()
+        imported = 0
+        for filename in sorted(os.listdir(EMAIL_DIR)):
+            if not filename.endswith('.json'):
+                continue
+            json_file = os.path.join(EMAIL_DIR, filename)
+            try:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                db.session.add(EmailArchive(
+                    timestamp=datetime.fromisoformat(data['timestamp']) if data.get('timestamp') else datetime.now(),
+                    recipient=data.get('recipient'),
+                    recipient_name=data.get('recipient_name'),
+                    subject=data.get('subject'),
+                    email_type=data.get('email_type'),
+                    problem_id=data.get('problem_id'),
+                    status=data.get('status'),
+                    real_email_sent=bool(data.get('real_email_sent')),
+                    body=EmailArchive.pack_body(data.get('html_body', ''), data.get('text_body', ''))
+                ))
+                db.session.commit()
+                imported += 1
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ {filename} konnte nicht importiert werden: {e}")
+                continue
+            if delete_files:
+                os.remove(json_file)
+                html_file = json_file[:-len('.json')] + '.html'
+                if os.path.exists(html_file):
+                    os.remove(html_file)
+        print(f"✅ {imported} E-Mails ins Email-Archiv übernommen.")
+
+if __name__ == '__main__':
+    migrate_email_archive(delete_files='--delete' in sys.argv[1:])
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Migrations-Script: Baut die Problem-Tabelle mit AUTOINCREMENT neu auf
+
+Ältere Datenbanken vergeben nach dem Löschen des Problems mit der höchsten ID die IDs
+archivierter Probleme neu. Danach startet die ID-Sequenz hinter der höchsten jemals
+vergebenen ID (Probleme, Archiv, Ereignisprotokoll).
+"""
+
+from app import app, db, ensure_problem_autoincrement
+
+def migrate_problem_autoincrement():
+    """Stellt die Tabelle problem auf AUTOINCREMENT um, falls nötig"""
+    with app.app_context():
+        db.create_all()
+        try:
+            if ensure_problem_autoincrement():
+                print("✅ Problem-Tabelle auf AUTOINCREMENT umgestellt.")
+            else:
+                print("✅ Problem-Tabelle nutzt bereits AUTOINCREMENT.")
+        except Exception as e:
+            print(f"❌ Fehler beim Umbau der Problem-Tabelle: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    migrate_problem_autoincrement()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Migrations-Script: Übernimmt Upload-Dateien mit altem Namensschema (Zeitstempel + Dateiname)
+in die inhaltsadressierte Ablage (SHA-256, Verzeichnisse 'ab/cd/') und baut die
+Verweiszähler in uploaded_image für alle Probleme und archivierten Probleme neu auf
+
+Gleiche Dateien werden dabei zusammengelegt. Das Script kann gefahrlos mehrfach laufen.
+
+Aufruf:
+    python migrate_upload_storage.py
+"""
+
+import os
+import re
+import json
+import shutil
+import hashlib
+from collections import Counter
+from datetime import datetime, timezone
+
+from app import app, db, bump_data_version, Problem, ArchivedProblem, UploadedImage, DERIVATIVE_SIZES, derivative_path
+
+def _content_name(path, filename):
+    """Inhaltsadressierter Name einer vorhandenen Datei"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension == 'jpeg':
+        extension = 'jpg'
+    content_hash = digest.hexdigest()
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.{extension}"
+
+def migrate_upload_storage():
+    """Verschiebt alte Uploads und setzt die Verweiszähler neu"""
+    upload_folder = app.config['UPLOAD_FOLDER']
+    with app.app_context():
+        db.create_all()
+        renamed = {}
+        references = Counter()
+        updates = []
+        for model in (Problem, ArchivedProblem):
+            table = model.__table__
+            for row in db.session.execute(db.select(table.c.id, table.c.images).where(table.c.images.isnot(None))):
+                images = json.loads(row.images) if row.images else []
+                new_images = []
+                for name in images:
+                    if '/' not in name and name not in renamed:
+                        path = os.path.join(upload_folder, name)
+                        if os.path.exists(path):
+                            target_name = _content_name(path, name)
+                            target = os.path.join(upload_folder, target_name)
+                            if not os.path.exists(target):
+                                os.makedirs(os.path.dirname(target), exist_ok=True)
+                                shutil.copy2(path, target)
+                            renamed[name] = target_name
+                    name = renamed.get(name, name)
+                    if name not in new_images:
+                        new_images.append(name)
+                references.update(new_images)
+                if new_images != images:
+                    updates.append((table, row.id, new_images))
+        
+        try:
+            for table, problem_id, new_images in updates:
+                db.session.execute(table.update().where(table.c.id == problem_id)
+                                   .values(images=json.dumps(new_images) if new_images else None))
+            upload_table = UploadedImage.__table__
+            if renamed:
+                db.session.execute(upload_table.delete().where(upload_table.c.filename.in_(list(renamed))))
+            existing = set(db.session.execute(db.select(upload_table.c.filename)).scalars())
+            now = datetime.now(timezone.utc)
+            for name, count in references.items():
+                if name in existing:
+                    db.session.execute(upload_table.update().where(upload_table.c.filename == name)
+                                       .values(ref_count=count))
+                else:
+                    # Alte Dateien wurden beim Upload bereits optimiert
+                    db.session.execute(upload_table.insert().values(
+                        filename=name, status='ready', ref_count=count, created_at=now, processed_at=now))
+            db.session.execute(upload_table.delete().where(upload_table.c.filename.notin_(list(references))))
+            if updates:
+                bump_data_version(db.session.connection())  # Bildverweise der Probleme haben sich geändert
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Fehler beim Aktualisieren der Datenbank: {e}")
+            print("ℹ️ Die alten Dateien sind unverändert - Script erneut ausführen.")
+            return
+        
+        # Alte Dateien und ihre Varianten erst nach dem Commit entfernen
+        for name in renamed:
+            paths = [os.path.join(upload_folder, name)]
+            paths += [derivative_path(app.config['IMAGE_DERIVATIVE_FOLDER'], variant, name) for variant in DERIVATIVE_SIZES]
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        # Varianten inhaltsadressierter Uploads, die versehentlich ohne Unterverzeichnisse abgelegt wurden
+        stray = 0
+        for variant in DERIVATIVE_SIZES:
+            variant_folder = os.path.join(app.config['IMAGE_DERIVATIVE_FOLDER'], variant)
+            if not os.path.isdir(variant_folder):
+                continue
+            for entry in os.scandir(variant_folder):
+                if entry.is_file() and re.match(r'^[0-9a-f]{64}\.[a-z0-9]+$', entry.name):
+                    os.remove(entry.path)
+                    stray += 1
+        if stray:
+            print(f"🗑️ {stray} falsch abgelegte Bild-Varianten entfernt.")
+        
+        print(f"✅ {len(renamed)} Dateien übernommen, {len(updates)} Probleme aktualisiert.")
+        print(f"✅ {len(references)} Dateien mit insgesamt {sum(references.values())} Verweisen gezählt.")
+
+if __name__ == '__main__':
+    migrate_upload_storage()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Wartungs-Script: Prüft die Dashboard-Zähler (ProblemStatusCounter) gegen die Problem-Tabelle
+und baut sie bei Abweichungen neu auf
+
+Aufruf:
+    python rebuild_status_counters.py           # prüfen und reparieren
+    python rebuild_status_counters.py --verify  # nur prüfen (Exit-Code 1 bei Abweichungen)
+"""
+
+import sys
+
+from app import app, db, rebuild_status_counters
+
+def main(verify_only=False):
+    """Vergleicht die Zähler und gibt alle Abweichungen aus"""
+    with app.app_context():
+        db.create_all()
+        try:
+            drift = rebuild_status_counters(apply=not verify_only)
+        except Exception as e:
+            print(f"❌ Fehler beim Prüfen der Zähler: {e}")
+            db.session.rollback()
+            return 2
+
+        if not drift:
+            print("✅ Alle Zähler stimmen mit der Problem-Tabelle überein.")
+            return 0
+
+        for (bohrturm, abteilung, status), stored, expected in drift:
+            print(f"⚠️  {bohrturm} / {abteilung} / {status}: gespeichert {stored[0]} (Bilder {stored[1]}), "
+                  f"berechnet {expected[0]} (Bilder {expected[1]})")
+        if verify_only:
+            print(f"❌ {len(drift)} Zähler weichen ab.")
+            return 1
+        print(f"✅ {len(drift)} abweichende Zähler neu aufgebaut.")
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main(verify_only='--verify' in sys.argv[1:]))
@@ -0,0 +1,47 @@
+"""
+Gemeinsame Test-Umgebung: eigene SQLite-Datenbank und Upload-Ordner in einem Temp-Verzeichnis
+
+Muss vor app importiert werden (DATABASE_URL wird beim Import gelesen).
+"""
+
+import os
+import sys
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix='wartungs-app-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ['MAIL_SUPPRESS_SEND'] = 'True'
+os.environ['MAIL_PASSWORD'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (  # noqa: E402
+    app, db, analytics, invalidate_rsc_directory, _deleted_problems, _search_index_state, _status_counters_checked,
+)
+
+app.config.update(
+    TESTING=True,
+    WTF_CSRF_ENABLED=False,
+    UPLOAD_FOLDER=os.path.join(TEST_DIR, 'uploads'),
+    IMAGE_DERIVATIVE_FOLDER=os.path.join(TEST_DIR, 'derivatives'),
+)
+
+
+def reset_database():
+    """Leert die Test-Datenbank (inkl. Volltext-Index) und legt alle Tabellen neu an"""
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.session.execute(db.text('DROP TABLE IF EXISTS problem_fts'))
+        db.session.commit()
+        db.create_all()
+    _search_index_state.update(ready=False, unavailable=False)
+    _status_counters_checked.clear()
+    _deleted_problems.clear()
+    analytics.clear_cache()
+    invalidate_rsc_directory()
+
+
+def login(client, username='nils'):
+    with client.session_transaction() as session:
+        session['user'] = username
+    return client
@@ -0,0 +1,142 @@
+"""Auswertungen: archivierte und neue Probleme getrennt, Endpunkte und Cache-Invalidierung durch neue Ereignisse"""
+
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta, timezone
+
+from tests.support import app, db, login, reset_database
+
+from app import Problem, ProblemEvent, analytics, archive_confirmed_problems
+
+
+class ArchivedAndNewProblemTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.now = datetime.now(timezone.utc)
+        
+        # Archiviertes Problem: vor 10 Tagen gemeldet, einen Tag später bestätigt
+        old = Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem='Pumpe 0')
+        db.session.add(old)
+        db.session.commit()
+        db.session.refresh(old)
+        old.status = 'bestätigt'
+        old.status_changed_at = self.now - timedelta(days=400)
+        db.session.commit()
+        self.old_id = old.id
+        self.set_event_time(self.old_id, None, self.now - timedelta(days=10))
+        self.set_event_time(self.old_id, 'gemeldet', self.now - timedelta(days=9))
+        
+        # Problem mit der höchsten ID - nach dem Archivieren gelöscht
+        newest = Problem(bohrturm='T-208', abteilung='Anlage', system='Kran', problem='Kran')
+        db.session.add(newest)
+        db.session.commit()
+        self.assertEqual(archive_confirmed_problems(older_than_days=180), 1)
+        db.session.delete(newest)
+        db.session.commit()
+        
+        # Neues Problem, seit zwei Stunden offen
+        self.new_problem = Problem(bohrturm='T-46', abteilung='Mechanisch', system='Ventil', problem='Neu Ventil')
+        db.session.add(self.new_problem)
+        db.session.commit()
+        self.set_event_time(self.new_problem.id, None, self.now - timedelta(hours=2))
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def set_event_time(self, problem_id, from_status, ts):
+        condition = ProblemEvent.from_status.is_(None) if from_status is None else ProblemEvent.from_status == from_status
+        ProblemEvent.query.filter(ProblemEvent.problem_id == problem_id, condition).update({'ts': ts})
+        db.session.commit()
+    
+    def test_new_problem_gets_its_own_id(self):
+        self.assertNotEqual(self.new_problem.id, self.old_id)
+    
+    def test_mttr_only_counts_the_archived_lifecycle(self):
+        rows = {row['bohrturm']: row for row in analytics.compute_mttr('bohrturm', {}, None, None)}
+        
+        self.assertEqual(set(rows), {'T-700'})
+        self.assertEqual(rows['T-700']['count'], 1)
+        self.assertEqual(rows['T-700']['mttr_hours'], 24.0)
+    
+    def test_backlog_only_contains_the_new_problem(self):
+        rows = analytics.compute_backlog_aging('bohrturm', {}, self.now + timedelta(minutes=1))
+        
+        self.assertEqual([row['bohrturm'] for row in rows], ['T-46'])
+        self.assertEqual(rows[0]['total'], 1)
+        self.assertEqual(rows[0]['buckets']['<1 Tag'], 1)
+
+
+class AnalyticsEndpointTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.client = login(app.test_client())
+        self.report('T-700', 'Pumpe')
+        self.report('T-46', 'Ventil')
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def report(self, bohrturm, system):
+        problem = Problem(bohrturm=bohrturm, abteilung='Mechanisch', system=system, problem=f'{system} defekt')
+        db.session.add(problem)
+        db.session.commit()
+        return problem
+    
+    def resolve(self, problem):
+        db.session.refresh(problem)
+        problem.status = 'abgearbeitet'
+        db.session.commit()
+    
+    def backlog_totals(self):
+        response = self.client.get('/analytics/backlog')
+        self.assertEqual(response.status_code, 200)
+        return {row['bohrturm']: row['total'] for row in response.get_json()['rows']}
+    
+    def test_backlog_endpoint_groups_open_problems(self):
+        data = self.client.get('/analytics/backlog', query_string={'group_by': 'system'}).get_json()
+        
+        self.assertEqual(data['group_by'], 'system')
+        self.assertEqual(data['buckets'][0], '<1 Tag')
+        self.assertEqual([(row['system'], row['buckets']['<1 Tag']) for row in data['rows']],
+                         [('Pumpe', 1), ('Ventil', 1)])
+    
+    def test_mttr_endpoint_reports_resolved_problems_in_range(self):
+        self.resolve(Problem.query.filter_by(bohrturm='T-46').one())
+        today = datetime.now(timezone.utc).date().isoformat()
+        
+        response = self.client.get('/analytics/mttr', query_string={'from': today, 'to': today})
+        data = response.get_json()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((data['from'], data['to']), (today, today))
+        self.assertEqual([(row['bohrturm'], row['count']) for row in data['rows']], [('T-46', 1)])
+    
+    def test_invalid_arguments_are_rejected(self):
+        self.assertEqual(self.client.get('/analytics/mttr?group_by=username').status_code, 400)
+        self.assertEqual(self.client.get('/analytics/backlog?to=gestern').status_code, 400)
+    
+    def test_requires_login(self):
+        self.assertEqual(app.test_client().get('/analytics/mttr').status_code, 401)
+    
+    def test_new_event_invalidates_cached_result(self):
+        self.assertEqual(self.backlog_totals(), {'T-46': 1, 'T-700': 1})
+        
+        # Ohne neues Ereignis kommt das Ergebnis aus dem Cache
+        with mock.patch.object(analytics, 'compute_backlog_aging', side_effect=AssertionError('neu berechnet')):
+            self.assertEqual(self.backlog_totals(), {'T-46': 1, 'T-700': 1})
+        
+        self.report('T-700', 'Kran')
+        self.assertEqual(self.backlog_totals(), {'T-46': 1, 'T-700': 2})
+        
+        self.resolve(Problem.query.filter_by(bohrturm='T-46').one())
+        self.assertEqual(self.backlog_totals(), {'T-700': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Conditional GET: die Daten-Version liegt in der Datenbank und gilt für alle Prozesse und Scripts"""
+
+import sqlite3
+import unittest
+
+from tests.support import app, db, login, reset_database
+
+from app import DataVersion, Problem, bump_data_version
+
+
+class DataVersionTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.client = login(app.test_client())
+        with app.app_context():
+            db.session.add(Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem='Pumpe leckt'))
+            db.session.commit()
+    
+    def counter(self):
+        with app.app_context():
+            return db.session.get(DataVersion, 1).counter
+    
+    def assert_not_modified(self, etag, expected=True):
+        response = self.client.get('/problems', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304 if expected else 200)
+    
+    def test_unchanged_data_returns_304(self):
+        etag = self.client.get('/problems').headers['ETag']
+        
+        self.assert_not_modified(etag)
+    
+    def test_commit_bumps_the_stored_version_once(self):
+        before = self.counter()
+        etag = self.client.get('/problems').headers['ETag']
+        with app.app_context():
+            problem = Problem.query.one()
+            problem.status = 'in_bearbeitung'
+            db.session.flush()
+            problem.problem = 'Pumpe leckt stark'
+            db.session.commit()
+        
+        self.assertEqual(self.counter(), before + 1)
+        self.assert_not_modified(etag, expected=False)
+    
+    def test_rollback_keeps_the_version(self):
+        before = self.counter()
+        with app.app_context():
+            Problem.query.one().status = 'in_bearbeitung'
+            db.session.flush()
+            db.session.rollback()
+        
+        self.assertEqual(self.counter(), before)
+    
+    def test_change_from_another_process_invalidates_etag(self):
+        etag = self.client.get('/problems').headers['ETag']
+        
+        # Ein Script in einem anderen Prozess erhöht die Version über seine eigene Verbindung
+        with sqlite3.connect(app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///')) as connection:
+            connection.execute("UPDATE data_version SET counter = counter + 1")
+        
+        self.assert_not_modified(etag, expected=False)
+    
+    def test_bump_without_connection_uses_its_own_transaction(self):
+        before = self.counter()
+        with app.app_context():
+            bump_data_version()
+        
+        self.assertEqual(self.counter(), before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
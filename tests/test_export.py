@@ -0,0 +1,68 @@
+"""CSV-Export: Formel-Zellen werden als Text exportiert, die Historie enthält beide Speicherstufen vollständig"""
+
+import csv
+import io
+import unittest
+from datetime import datetime
+
+from tests.support import app, db, login, reset_database
+
+from app import ArchivedProblem, Problem
+
+
+def read_csv(response):
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True).lstrip('\ufeff')), delimiter=';'))
+
+
+class CsvExportInjectionTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.client = login(app.test_client())
+        with app.app_context():
+            db.session.add(Problem(bohrturm='T-700', abteilung='Elektrisch', system='+Pumpe',
+                                   problem='=HYPERLINK("http://example.com","Details")',
+                                   massnahmen='-2+3', pr_nummer='@SUM(A1)', verantwortlicher='Ölpumpe - Team'))
+            db.session.commit()
+    
+    def test_formula_cells_are_prefixed(self):
+        response = self.client.get('/export/problems?format=csv')
+        self.assertEqual(response.status_code, 200)
+        rows = read_csv(response)
+        row = rows[0]
+        values = set(row.values())
+        self.assertIn('\'=HYPERLINK("http://example.com","Details")', values)
+        self.assertIn("'+Pumpe", values)
+        self.assertIn("'-2+3", values)
+        self.assertIn("'@SUM(A1)", values)
+        self.assertIn('Ölpumpe - Team', values)
+        self.assertIn('1', values)
+
+
+
+class HistoryExportTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.client = login(app.test_client())
+        with app.app_context():
+            for changed_at in (datetime(2025, 3, 1), None):
+                problem = Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem='Aktiv',
+                                  status='bestätigt')
+                db.session.add(problem)
+                db.session.flush()
+                problem.status_changed_at = changed_at
+            db.session.add_all([
+                ArchivedProblem(id=10, bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem='Archiv',
+                                status='bestätigt', status_changed_at=datetime(2025, 2, 1)),
+                ArchivedProblem(id=11, bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem='Archiv',
+                                status='bestätigt', status_changed_at=None),
+            ])
+            db.session.commit()
+    
+    def test_rows_without_timestamp_in_both_tiers_are_exported_last(self):
+        response = self.client.get('/export/history?format=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['ID'] for row in read_csv(response)], ['1', '10', '11', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Historie: Keyset-Pagination über beide Speicherstufen, auch für Probleme ohne Abschlusszeitpunkt"""
+
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from tests.support import app, db, login, reset_database
+
+from app import (ArchivedProblem, Problem, User, decode_history_cursor, history_tier_queries,
+                 paginate_history_keyset)
+
+BASE = datetime(2025, 3, 1, 12, 0)
+
+
+class HistoryPaginationTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        hot = [('abgearbeitet', BASE), ('bestätigt', BASE - timedelta(days=1)), ('abgearbeitet', None),
+               ('bestätigt', BASE), ('bestätigt', None), ('gemeldet', BASE + timedelta(days=1))]
+        for status, changed_at in hot:
+            problem = Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem=status,
+                              status=status)
+            db.session.add(problem)
+            db.session.flush()
+            # Altdaten ohne Zeitpunkt nachstellen (default greift beim INSERT)
+            problem.status_changed_at = changed_at
+        db.session.commit()
+        for problem_id, changed_at in ((10, BASE - timedelta(days=2)), (11, None), (12, BASE)):
+            db.session.add(ArchivedProblem(id=problem_id, bohrturm='T-700', abteilung='Elektrisch', system='Pumpe',
+                                           problem='archiviert', status='bestätigt', status_changed_at=changed_at))
+        db.session.commit()
+        db.session.expire_all()
+        # Neueste zuerst, gleiche Zeitpunkte nach ID absteigend, Zeilen ohne Zeitpunkt am Ende
+        self.expected = [12, 4, 1, 2, 10, 11, 5, 3]
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def page(self, **cursor):
+        rows, prev_cursor, next_cursor = paginate_history_keyset(history_tier_queries({}), 3, **cursor)
+        return [p.id for p in rows], decode_history_cursor(prev_cursor), decode_history_cursor(next_cursor)
+    
+    def test_pages_forward_and_back_including_rows_without_timestamp(self):
+        seen, cursor, pages = [], None, []
+        while True:
+            ids, prev_cursor, cursor = self.page(after=cursor)
+            seen += ids
+            pages.append((ids, prev_cursor))
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(cursor, None)
+        
+        # Zurückblättern von der letzten Seite liefert wieder die vorherigen Seiten
+        ids, prev_cursor = pages[-1]
+        self.assertEqual(decode_history_cursor(f'-{ids[0]}'), (None, ids[0]))
+        back, _, _ = self.page(before=prev_cursor)
+        self.assertEqual(back, pages[-2][0])
+        back, _, _ = self.page(before=(None, 11))
+        self.assertEqual(back, [1, 2, 10])
+    
+    def test_history_page_renders_rows_without_timestamp(self):
+        db.session.add(User(username='nils', password='-', email='nils@example.com'))
+        db.session.commit()
+        client = login(app.test_client())
+        response = client.get('/history?per_page=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('after=-5', response.get_data(as_text=True))
+    
+    def test_hot_tier_is_read_in_index_order(self):
+        statements = []
+        
+        def remember(conn, cursor, statement, parameters, context, executemany):
+            if 'ORDER BY problem.status_changed_at' in statement:
+                statements.append((statement, parameters))
+        
+        event.listen(db.engine, 'before_cursor_execute', remember)
+        try:
+            self.page()
+            self.page(after=(BASE, 4))
+            self.page(before=(BASE, 1))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', remember)
+        
+        self.assertEqual(len(statements), 6)
+        for statement, parameters in statements:
+            plan = ' '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+                f'EXPLAIN QUERY PLAN {statement}', parameters))
+            self.assertIn('ix_problem_status_changed_id', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
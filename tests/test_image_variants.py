@@ -0,0 +1,132 @@
+"""Bild-Varianten kommen aus dem Worker-Pool und liegen dort, wo upload_variant und der Cleanup-Worker sie suchen"""
+
+import io
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from PIL import Image
+from sqlalchemy import event
+
+from tests.support import app, db, login, reset_database
+
+import app as app_module
+from app import DERIVATIVE_SIZES, UploadedImage, derivative_path, file_cleanup, image_pipeline, init_database
+from image_processing import process_upload
+
+STORED_NAME = 'ab/cd/' + 'abcd' + '0' * 60 + '.jpg'
+
+
+class ImageVariantPathTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.upload_folder = app.config['UPLOAD_FOLDER']
+        self.derivative_folder = app.config['IMAGE_DERIVATIVE_FOLDER']
+        shutil.rmtree(self.derivative_folder, ignore_errors=True)
+        path = os.path.join(self.upload_folder, STORED_NAME)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.linear_gradient('L').resize((2400, 1600)).convert('RGB').save(path, 'JPEG')
+        with app.app_context():
+            db.session.add(UploadedImage(filename=STORED_NAME, status='ready'))
+            db.session.commit()
+    
+    def test_pipeline_output_is_served_without_regeneration(self):
+        process_upload(self.upload_folder, STORED_NAME, self.derivative_folder)
+        
+        client = login(app.test_client())
+        for variant in DERIVATIVE_SIZES:
+            expected_path = derivative_path(self.derivative_folder, variant, STORED_NAME)
+            self.assertTrue(os.path.exists(expected_path), expected_path)
+            with mock.patch.object(image_pipeline, 'submit_derivatives', side_effect=AssertionError('neu eingereiht')):
+                response = client.get(f'/uploads/{variant}/{STORED_NAME}')
+            self.assertEqual(response.status_code, 200)
+            with open(expected_path, 'rb') as f:
+                self.assertEqual(response.get_data(), f.read())
+            response.close()
+        self.assertFalse(os.path.exists(os.path.join(self.derivative_folder, 'thumb', os.path.basename(STORED_NAME))))
+    
+    def test_missing_variant_serves_original_and_is_created_in_the_pool(self):
+        client = login(app.test_client())
+        with open(os.path.join(self.upload_folder, STORED_NAME), 'rb') as f:
+            original = f.read()
+        
+        with mock.patch.object(image_pipeline, '_use_threads', True), \
+                mock.patch.object(app_module, 'create_missing_derivatives', wraps=app_module.create_missing_derivatives) as job:
+            response = client.get(f'/uploads/thumb/{STORED_NAME}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_data(), original)
+            self.assertEqual(response.headers['Cache-Control'], 'private, max-age=60')
+            response.close()
+            self.assertTrue(image_pipeline.wait_idle(timeout=30))
+        
+        job.assert_called_once()
+        thumb = derivative_path(self.derivative_folder, 'thumb', STORED_NAME)
+        self.assertTrue(os.path.exists(thumb))
+        response = client.get(f'/uploads/thumb/{STORED_NAME}')
+        with open(thumb, 'rb') as f:
+            self.assertEqual(response.get_data(), f.read())
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        response.close()
+    
+    def get_without_queries(self, client, url):
+        statements = []
+        
+        def remember(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', remember)
+            try:
+                response = client.get(url)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', remember)
+        self.assertEqual(statements, [])
+        return response
+    
+    def test_uploads_are_served_without_database_lookup(self):
+        client = login(app.test_client())
+        
+        # Noch nicht optimiert: Original muss revalidiert werden
+        response = self.get_without_queries(client, f'/static/uploads/{STORED_NAME}')
+        self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+        response.close()
+        
+        process_upload(self.upload_folder, STORED_NAME, self.derivative_folder)
+        for url in (f'/static/uploads/{STORED_NAME}', f'/uploads/thumb/{STORED_NAME}'):
+            response = self.get_without_queries(client, url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('immutable', response.headers['Cache-Control'])
+            response.close()
+    
+    def test_cleanup_removes_variants(self):
+        process_upload(self.upload_folder, STORED_NAME, self.derivative_folder)
+        with app.app_context():
+            UploadedImage.query.delete()
+            db.session.commit()
+        
+        file_cleanup.enqueue([STORED_NAME])
+        file_cleanup.wait_idle()
+        
+        self.assertFalse(os.path.exists(os.path.join(self.upload_folder, STORED_NAME)))
+        for variant in DERIVATIVE_SIZES:
+            self.assertFalse(os.path.exists(derivative_path(self.derivative_folder, variant, STORED_NAME)))
+    
+    def test_startup_resumes_pending_images(self):
+        with app.app_context():
+            UploadedImage.query.filter_by(filename=STORED_NAME).update({'status': 'pending'})
+            db.session.commit()
+        
+        # Gleicher Startpfad wie launcher.py, wsgi.py und python app.py
+        with mock.patch.object(image_pipeline, '_use_threads', True):
+            init_database()
+            self.assertTrue(image_pipeline.wait_idle(timeout=30))
+        
+        with app.app_context():
+            self.assertEqual(UploadedImage.query.filter_by(filename=STORED_NAME).one().status, 'ready')
+        for variant in DERIVATIVE_SIZES:
+            self.assertTrue(os.path.exists(derivative_path(self.derivative_folder, variant, STORED_NAME)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Live-Streams (/events): genug Plätze für viele Tablets, ohne die Threads für normale Requests zu belegen"""
+
+import unittest
+from unittest import mock
+
+from tests.support import app, login, reset_database
+
+from app import event_broker
+
+
+class LiveEventLimitTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.client = login(app.test_client())
+        self.responses = []
+    
+    def tearDown(self):
+        for response in self.responses:
+            response.close()
+    
+    def open_stream(self):
+        response = self.client.get('/events')
+        self.responses.append(response)
+        return response
+    
+    def test_waitress_threads_cover_streams_and_requests(self):
+        self.assertGreaterEqual(app.config['SSE_MAX_CLIENTS'], 50)
+        self.assertGreaterEqual(app.config['SERVER_THREADS'] - app.config['SSE_MAX_CLIENTS'],
+                                app.config['SERVER_REQUEST_THREADS'])
+        self.assertGreater(app.config['SERVER_CONNECTION_LIMIT'], app.config['SERVER_THREADS'])
+    
+    def test_many_clients_stream_until_limit_then_fall_back(self):
+        with mock.patch.dict(app.config, SSE_MAX_CLIENTS=12):
+            streams = [self.open_stream() for _ in range(12)]
+            self.assertEqual({response.status_code for response in streams}, {200})
+            self.assertEqual(event_broker.client_count, 12)
+            
+            # Über dem Limit: 503, der Client pollt - normale Requests laufen weiter
+            self.assertEqual(self.open_stream().status_code, 503)
+            self.assertEqual(self.client.get('/login').status_code, 200)
+            
+            # Geschlossene Streams (auch nie gestartete) geben ihren Platz frei
+            streams[0].close()
+            self.assertEqual(event_broker.client_count, 11)
+            self.assertEqual(self.open_stream().status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
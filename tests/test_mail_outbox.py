@@ -0,0 +1,83 @@
+"""Einreihen in die Outbox lässt die Transaktion des Aufrufers unberührt, der Serverstart startet die Worker"""
+
+import importlib
+import sys
+import time
+import unittest
+from unittest import mock
+
+from tests.support import app, db, reset_database
+
+import app as app_module
+from app import MailOutboxWorker, OutboxMail, Problem, send_and_save_email
+
+
+def outbox_subjects():
+    with app.app_context():
+        return [mail.subject for mail in OutboxMail.query.order_by(OutboxMail.id)]
+
+
+class OutboxEnqueueTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.problem = Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem='Offen')
+        db.session.add(self.problem)
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def enqueue(self, subject):
+        return send_and_save_email('rsc@example.com', 'rsc', subject, '<p>Hallo</p>', 'Hallo', 'material_request')
+    
+    def test_enqueue_does_not_commit_callers_changes(self):
+        self.assertTrue(self.enqueue('Material'))
+        
+        self.assertIn(self.problem, db.session.new)
+        self.assertEqual(outbox_subjects(), ['Material'])
+        db.session.rollback()
+        self.assertEqual(Problem.query.count(), 0)
+        self.assertEqual(outbox_subjects(), ['Material'])
+    
+    def test_failed_enqueue_keeps_callers_changes(self):
+        self.assertFalse(self.enqueue(None))
+        
+        self.assertIn(self.problem, db.session.new)
+        db.session.commit()
+        self.assertEqual(Problem.query.count(), 1)
+        self.assertEqual(outbox_subjects(), [])
+
+
+
+class OutboxStartupTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        # E-Mail aus dem letzten Lauf, die beim Beenden noch nicht versendet war
+        with app.app_context():
+            db.session.add(OutboxMail(recipient='rsc@example.com', recipient_name='rsc', subject='Offen',
+                                      text_body='Hallo', email_type='material_request'))
+            db.session.commit()
+    
+    def test_booting_through_wsgi_delivers_pending_mail(self):
+        worker = MailOutboxWorker()
+        with mock.patch.object(app_module, 'mail_outbox', worker):
+            if 'wsgi' in sys.modules:
+                importlib.reload(sys.modules['wsgi'])
+            else:
+                importlib.import_module('wsgi')
+            self.assertTrue(any(thread.is_alive() for thread in worker._threads))
+            
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                with app.app_context():
+                    status = OutboxMail.query.one().status
+                if status in ('sent', 'saved'):
+                    break
+                time.sleep(0.05)
+        self.assertEqual(status, 'saved')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Nachtragen des Ereignisprotokolls: Meldezeitpunkt vor der Erledigung, Altdaten ohne Zeitpunkt"""
+
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from tests.support import app, db, reset_database
+
+from add_problem_events_table import add_problem_events_table
+from app import ArchivedProblem, Problem, ProblemEvent, analytics
+
+RESOLVED_AT = datetime(2025, 3, 10, 12, 0)
+
+
+def make_problem(status, changed_at, **fields):
+    problem = Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem=status, status=status, **fields)
+    db.session.add(problem)
+    db.session.flush()
+    problem.status_changed_at = changed_at
+    return problem
+
+
+class ProblemEventBackfillTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.with_update = make_problem('abgearbeitet', RESOLVED_AT, progress_updates=json.dumps([
+            {'text': 'Pumpe ausgebaut', 'timestamp': (RESOLVED_AT - timedelta(hours=30)).isoformat() + '+00:00'},
+        ]))
+        self.without_history = make_problem('bestätigt', RESOLVED_AT)
+        self.open_undated = make_problem('gemeldet', None)
+        self.resolved_undated = make_problem('abgearbeitet', None)
+        db.session.add(ArchivedProblem(
+            id=50, bohrturm='T-208', abteilung='Anlage', system='Kran', problem='Archiv', status='bestätigt',
+            status_changed_at=RESOLVED_AT,
+            materials_json=json.dumps([{'bestellt_am': (RESOLVED_AT - timedelta(hours=6)).isoformat()}]),
+        ))
+        db.session.commit()
+        # Zustand vor dem Ereignisprotokoll
+        ProblemEvent.query.delete()
+        db.session.commit()
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def events(self, problem_id):
+        return [(event.to_status, event.ts, event.system) for event in
+                ProblemEvent.query.filter_by(problem_id=problem_id).order_by(ProblemEvent.ts)]
+    
+    def test_creation_event_uses_earliest_known_timestamp(self):
+        add_problem_events_table()
+        
+        self.assertEqual(self.events(self.with_update.id), [
+            ('gemeldet', RESOLVED_AT - timedelta(hours=30), 'Pumpe'),
+            ('abgearbeitet', RESOLVED_AT, 'Pumpe'),
+        ])
+        self.assertEqual(self.events(50), [
+            ('gemeldet', RESOLVED_AT - timedelta(hours=6), 'Kran'),
+            ('bestätigt', RESOLVED_AT, 'Kran'),
+        ])
+        rows = {row['system']: row['mttr_hours'] for row in analytics.compute_mttr('system', {}, None, None)}
+        self.assertEqual(rows, {'Pumpe': 30.0, 'Kran': 6.0})
+    
+    def test_problems_without_usable_timestamps_are_skipped_not_fatal(self):
+        add_problem_events_table()
+        
+        # Kein Zeitpunkt vor der Erledigung bekannt - keine Reparaturzeit von 0 Stunden erfinden
+        self.assertEqual(self.events(self.without_history.id), [])
+        self.assertEqual(self.events(self.resolved_undated.id), [])
+        # Offenes Problem ohne status_changed_at: letzte Änderung als Meldezeitpunkt
+        self.assertEqual([status for status, _, _ in self.events(self.open_undated.id)], ['gemeldet'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Problem-IDs werden nach dem Archivieren und Löschen nicht neu vergeben"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from tests.support import app, db, reset_database
+
+from app import (ArchivedProblem, Problem, ProblemEvent, archive_confirmed_problems,
+                 ensure_problem_autoincrement, ensure_search_index, problem_fts)
+
+
+def make_problem(text, status='gemeldet', age_days=0):
+    return Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem=text, status=status,
+                   status_changed_at=datetime.now(timezone.utc) - timedelta(days=age_days))
+
+
+class ProblemIdReuseTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        ensure_search_index()
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def test_deleting_max_row_after_archiving_does_not_reuse_ids(self):
+        db.session.add_all([make_problem(f'Pumpe {i}', status='bestätigt', age_days=400) for i in range(3)])
+        db.session.add(make_problem('Offen'))
+        db.session.commit()
+        
+        self.assertEqual(archive_confirmed_problems(older_than_days=180), 3)
+        db.session.delete(db.session.scalars(db.select(Problem)).one())
+        db.session.commit()
+        
+        new_problem = make_problem('Neu Ventil')
+        db.session.add(new_problem)
+        db.session.commit()
+        
+        archived_ids = set(db.session.scalars(db.select(ArchivedProblem.id)))
+        self.assertEqual(new_problem.id, 5)
+        self.assertNotIn(new_problem.id, archived_ids)
+        archived_text = db.session.execute(
+            db.select(problem_fts.c.problem).where(problem_fts.c.rowid == min(archived_ids))
+        ).scalar()
+        self.assertEqual(archived_text, 'Pumpe 0')
+    
+    def test_migration_rebuilds_table_and_seeds_sequence(self):
+        db.session.add_all([make_problem('Alt 1'), make_problem('Alt 2')])
+        db.session.commit()
+        # Stand vor AUTOINCREMENT nachbauen
+        connection = db.session.connection()
+        table_sql = connection.execute(db.text("SELECT sql FROM sqlite_master WHERE name = 'problem'")).scalar()
+        connection.execute(db.text("ALTER TABLE problem RENAME TO problem_old"))
+        connection.execute(db.text(table_sql.replace(' AUTOINCREMENT', '')))
+        connection.execute(db.text("INSERT INTO problem SELECT * FROM problem_old"))
+        connection.execute(db.text("DROP TABLE problem_old"))
+        connection.execute(db.text("CREATE INDEX ix_problem_status_id ON problem (status, id)"))
+        db.session.add(ProblemEvent(problem_id=7, bohrturm='T-700', abteilung='Elektrisch', to_status='gelöscht'))
+        db.session.commit()
+        
+        self.assertTrue(ensure_problem_autoincrement())
+        self.assertFalse(ensure_problem_autoincrement())
+        
+        table_sql = db.session.execute(db.text("SELECT sql FROM sqlite_master WHERE name = 'problem'")).scalar()
+        self.assertIn('AUTOINCREMENT', table_sql)
+        index_names = set(db.session.execute(
+            db.text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'problem'")).scalars())
+        self.assertIn('ix_problem_status_id', index_names)
+        self.assertEqual([p.problem for p in Problem.query.order_by(Problem.id)], ['Alt 1', 'Alt 2'])
+        
+        new_problem = make_problem('Neu')
+        db.session.add(new_problem)
+        db.session.commit()
+        self.assertEqual(new_problem.id, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
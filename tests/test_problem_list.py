@@ -0,0 +1,148 @@
+"""Problemliste: Sortierung und Keyset-Pagination laufen über den Index ix_problem_priority_id"""
+
+import re
+import unittest
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from tests.support import app, db, login, reset_database
+
+from app import MaterialItem, Problem, User, ensure_problem_priority_column
+
+
+class ProblemListOrderTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.client = login(app.test_client())
+        with app.app_context():
+            db.session.add_all([
+                Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem=f'Problem {i}', status=status)
+                for i, status in enumerate(['in_bearbeitung', 'gemeldet', 'bestätigt', 'gemeldet',
+                                            'abgearbeitet', 'in_bearbeitung', 'gemeldet'])
+            ])
+            db.session.commit()
+    
+    def capture_list_queries(self, url):
+        statements = []
+        
+        def remember(conn, cursor, statement, parameters, context, executemany):
+            if 'ORDER BY problem.status_priority' in statement:
+                statements.append((statement, parameters))
+        
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', remember)
+            try:
+                response = self.client.get(url)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', remember)
+        self.assertEqual(response.status_code, 200)
+        return response, statements
+    
+    def listed_ids(self, response):
+        return [int(i) for i in re.findall(r'data-problem-id="(\d+)"', response.get_data(as_text=True))]
+    
+    def test_pages_follow_priority_then_newest_first(self):
+        response, _ = self.capture_list_queries('/problems?per_page=2')
+        self.assertEqual(self.listed_ids(response), [7, 4])
+        response, _ = self.capture_list_queries('/problems?per_page=2&after=1-4')
+        self.assertEqual(self.listed_ids(response), [2, 6])
+        response, _ = self.capture_list_queries('/problems?per_page=2&after=2-6')
+        self.assertEqual(self.listed_ids(response), [1])
+        response, _ = self.capture_list_queries('/problems?per_page=2&before=2-1')
+        self.assertEqual(self.listed_ids(response), [2, 6])
+    
+    def test_list_queries_do_not_sort_in_temp_btree(self):
+        for url in ('/problems', '/problems?after=1-4', '/problems?before=2-1'):
+            _, statements = self.capture_list_queries(url)
+            self.assertTrue(statements, url)
+            with app.app_context():
+                for statement, parameters in statements:
+                    plan = ' '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+                        f'EXPLAIN QUERY PLAN {statement}', parameters))
+                    self.assertIn('ix_problem_priority_id', plan, url)
+                    self.assertNotIn('TEMP B-TREE', plan, url)
+    
+    def test_delta_refresh_only_returns_rows_inside_the_page(self):
+        since = datetime.now(timezone.utc).isoformat()
+        data = self.client.get('/api/problems/changes', query_string={'since': since, 'until': '1-4'}).get_json()
+        self.assertEqual(sorted(row['id'] for row in data['rows']), [4, 7])
+        self.assertEqual(sorted(data['removed']), [1, 2, 3, 5, 6])
+        
+        # Ohne Folgeseite gehören alle aktiven Änderungen auf die Seite
+        data = self.client.get('/api/problems/changes', query_string={'since': since}).get_json()
+        self.assertEqual(sorted(row['id'] for row in data['rows']), [1, 2, 4, 6, 7])
+    
+    def test_migration_adds_priority_column_to_old_table(self):
+        with app.app_context():
+            connection = db.session.connection()
+            connection.execute(db.text('DROP INDEX ix_problem_priority_id'))
+            connection.execute(db.text('ALTER TABLE problem DROP COLUMN status_priority'))
+            db.session.commit()
+            
+            self.assertTrue(ensure_problem_priority_column())
+            self.assertFalse(ensure_problem_priority_column())
+            problem = db.session.get(Problem, 3)
+            self.assertEqual(problem.status_priority, 4)
+            problem.status = 'gemeldet'
+            db.session.commit()
+            db.session.refresh(problem)
+            self.assertEqual(problem.status_priority, 1)
+
+
+
+class ProblemListStatementCountTest(unittest.TestCase):
+    """Zugewiesene Benutzer, Besteller und Material-Items werden gesammelt geladen (kein N+1)"""
+    
+    def setUp(self):
+        reset_database()
+        self.client = login(app.test_client())
+        with app.app_context():
+            db.session.add(User(username='nils', password='x', email='nils@example.com'))
+            db.session.commit()
+        self.added = 0
+        self.add_problems(2)
+    
+    def add_problems(self, count):
+        with app.app_context():
+            for _ in range(count):
+                self.added += 1
+                number = self.added
+                assignee = User(username=f'EL {number}', password='x', email=f'el{number}@example.com')
+                orderer = User(username=f'Besteller {number}', password='x', email=f'b{number}@example.com')
+                problem = Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem=f'Problem {number}',
+                                  status='abgearbeitet' if number % 2 else 'gemeldet',
+                                  bestellung_benoetigt=True, assigned_user=assignee, besteller_user=orderer)
+                problem.materials = [
+                    MaterialItem(mm_nummer=f'MM-{number}-{i}', beschreibung='Dichtung', besteller_user=orderer)
+                    for i in range(2)
+                ]
+                db.session.add(problem)
+            db.session.commit()
+    
+    def count_statements(self, url):
+        statements = []
+        
+        def remember(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', remember)
+            try:
+                response = self.client.get(url)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', remember)
+        self.assertEqual(response.status_code, 200)
+        return len(statements)
+    
+    def test_statement_count_does_not_grow_with_rows(self):
+        for url in ('/problems', '/history'):
+            with self.subTest(url=url):
+                self.count_statements(url)  # einmalige Prüfungen beim ersten Aufruf (Zähler, Suchindex)
+                few = self.count_statements(url)
+                self.add_problems(20)
+                self.assertEqual(self.count_statements(url), few)
+
+
+if __name__ == '__main__':
+    unittest.main()
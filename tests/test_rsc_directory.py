@@ -0,0 +1,104 @@
+"""RSC-Cache: wird erst nach dem Commit verworfen, nicht beim Flush und nicht nach einem Rollback"""
+
+import threading
+import unittest
+from unittest import mock
+
+from tests.support import app, db, reset_database
+
+import app as app_module
+from app import User, get_rsc_directory, invalidate_rsc_directory
+
+
+class RscDirectoryTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.session.add_all([
+            User(username='nils', password='x', email='nils@example.com'),
+            User(username='T700 RSC', password='x', email='rsc-alt@example.com'),
+            User(username='Bohrer', password='x', email='bohrer@example.com'),
+        ])
+        db.session.commit()
+        self.directory = get_rsc_directory()
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def rsc_user(self):
+        return User.query.filter_by(username='T700 RSC').one()
+    
+    def read_in_other_thread(self):
+        result = {}
+        
+        def read():
+            with app.app_context():
+                result['directory'] = get_rsc_directory()
+                db.session.remove()
+        
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive(), 'Lesen wartet auf die offene Transaktion')
+        return result['directory']
+    
+    def test_flush_keeps_cache_until_commit(self):
+        self.rsc_user().email = 'rsc-neu@example.com'
+        db.session.flush()
+        
+        # Andere Requests sehen den alten (noch gültigen) Stand aus dem Cache
+        self.assertIs(self.read_in_other_thread(), self.directory)
+        
+        db.session.commit()
+        self.assertEqual(get_rsc_directory()['T-700']['email'], 'rsc-neu@example.com')
+    
+    def test_rollback_keeps_cache(self):
+        self.rsc_user().email = 'rsc-neu@example.com'
+        db.session.flush()
+        db.session.rollback()
+        
+        self.assertIs(get_rsc_directory(), self.directory)
+    
+    def test_uncommitted_changes_are_not_cached(self):
+        invalidate_rsc_directory()
+        self.rsc_user().email = 'rsc-neu@example.com'
+        db.session.flush()
+        
+        # Die eigene Session sieht die Änderung, gecacht wird sie erst nach dem Commit
+        self.assertEqual(get_rsc_directory()['T-700']['email'], 'rsc-neu@example.com')
+        db.session.rollback()
+        self.assertEqual(get_rsc_directory()['T-700']['email'], 'rsc-alt@example.com')
+    
+    def test_renaming_away_from_rsc_invalidates(self):
+        self.rsc_user().username = 'Ehemals RSC'
+        db.session.commit()
+        
+        self.assertEqual(get_rsc_directory()['T-700']['username'], 'nils')
+    
+    def test_other_users_keep_cache(self):
+        User.query.filter_by(username='Bohrer').one().email = 'bohrer-neu@example.com'
+        db.session.commit()
+        
+        self.assertIs(get_rsc_directory(), self.directory)
+    
+    def test_invalidation_during_load_is_not_overwritten(self):
+        invalidate_rsc_directory()
+        stale = {None: None}
+        
+        def load_then_invalidate():
+            # Commit eines anderen Requests während des Ladens
+            other = threading.Thread(target=invalidate_rsc_directory)
+            other.start()
+            other.join(timeout=10)
+            self.assertFalse(other.is_alive(), 'Laden hält die Sperre des RSC-Caches')
+            return stale
+        
+        with mock.patch.object(app_module, '_load_rsc_directory', side_effect=load_then_invalidate):
+            self.assertIs(get_rsc_directory(), stale)
+        self.assertIsNot(get_rsc_directory(), stale)
+
+
+if __name__ == '__main__':
+    unittest.main()
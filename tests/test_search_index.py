@@ -0,0 +1,67 @@
+"""Der Volltext-Index bleibt auch dann aktuell, wenn er erst nach dem Start angelegt wird"""
+
+import unittest
+
+from tests.support import app, db, reset_database
+
+from app import (ArchivedProblem, Problem, _search_index_ready, ensure_search_index, init_database,
+                 problem_fts, rebuild_search_index)
+
+
+def indexed_ids():
+    return set(db.session.execute(db.select(problem_fts.c.rowid)).scalars())
+
+
+class SearchIndexStateTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def add_problem(self, text):
+        problem = Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem=text)
+        db.session.add(problem)
+        db.session.commit()
+        return problem
+    
+    def test_index_created_later_is_maintained(self):
+        self.add_problem('Vor dem Index')
+        self.assertFalse(_search_index_ready(db.session.connection()))
+        
+        # Anderer Prozess (add_search_index.py) legt den Index an
+        db.session.execute(db.text("CREATE VIRTUAL TABLE problem_fts USING fts5(problem, massnahmen, loeschen_kommentar, updates)"))
+        db.session.commit()
+        later = self.add_problem('Nach dem Index')
+        
+        self.assertIn(later.id, indexed_ids())
+    
+    def test_startup_rebuilds_drifted_index_including_archive(self):
+        ensure_search_index()
+        problem = self.add_problem('Ventil undicht')
+        db.session.add(ArchivedProblem(id=problem.id + 100, bohrturm='T-700', abteilung='Elektrisch',
+                                       system='Pumpe', problem='Archiviert', status='bestätigt'))
+        db.session.execute(problem_fts.delete())
+        db.session.commit()
+        
+        init_database()
+        
+        self.assertEqual(indexed_ids(), {problem.id, problem.id + 100})
+    
+    def test_rebuild_keeps_archived_problems(self):
+        ensure_search_index()
+        problem = self.add_problem('Aktiv')
+        db.session.add(ArchivedProblem(id=problem.id + 1, bohrturm='T-700', abteilung='Elektrisch',
+                                       system='Pumpe', problem='Archiviert', status='bestätigt'))
+        db.session.commit()
+        
+        rebuild_search_index()
+        
+        self.assertEqual(indexed_ids(), {problem.id, problem.id + 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""Dashboard-Zähler werden ohne manuelles rebuild_status_counters.py aufgebaut"""
+
+import unittest
+
+from tests.support import app, db, reset_database
+
+from app import Problem, ProblemStatusCounter, compute_dashboard_stats
+
+
+def add_problems(*statuses):
+    db.session.add_all([Problem(bohrturm='T-700', abteilung='Elektrisch', system='Pumpe', problem='x', status=status)
+                        for status in statuses])
+    db.session.commit()
+
+
+class StatusCounterStartupTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def test_empty_counter_table_is_built_on_first_read(self):
+        add_problems('gemeldet', 'gemeldet', 'in_bearbeitung')
+        ProblemStatusCounter.query.delete()
+        db.session.commit()
+        
+        stats = compute_dashboard_stats()
+        
+        self.assertEqual(stats['gemeldet_count'], 2)
+        self.assertEqual(stats['in_bearbeitung_count'], 1)
+    
+    def test_partially_maintained_counters_are_repaired(self):
+        add_problems('gemeldet', 'gemeldet')
+        ProblemStatusCounter.query.delete()
+        db.session.commit()
+        # Nach dem Start (ohne Zähler) kommt ein Problem hinzu - es gibt jetzt eine Zähler-Zeile
+        add_problems('gemeldet')
+        
+        self.assertEqual(compute_dashboard_stats()['gemeldet_count'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Inhaltsadressierte Uploads: der Cleanup-Worker löscht keine Datei, die gerade erneut hochgeladen wird"""
+
+import io
+import os
+import time
+import unittest
+
+from werkzeug.datastructures import FileStorage
+
+from tests.support import app, db, reset_database
+
+from app import UploadedImage, file_cleanup, release_uploads, save_uploaded_files
+
+CONTENT = b'GIF89a Schaden an der Pumpe'
+
+
+def upload():
+    return FileStorage(stream=io.BytesIO(CONTENT), filename='pumpe.gif')
+
+
+class UploadCleanupRaceTest(unittest.TestCase):
+    def setUp(self):
+        reset_database()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.name = save_uploaded_files([upload()])[0]
+        db.session.commit()
+        self.path = os.path.join(app.config['UPLOAD_FOLDER'], self.name)
+    
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+    
+    def release(self):
+        orphaned = release_uploads(db.session.connection(), [self.name])
+        db.session.commit()
+        return orphaned
+    
+    def test_reupload_during_cleanup_keeps_file(self):
+        self.assertEqual(self.release(), [self.name])
+        
+        # Erneuter Upload desselben Inhalts, noch nicht committet
+        self.assertEqual(save_uploaded_files([upload()]), [self.name])
+        file_cleanup.enqueue([self.name])
+        time.sleep(0.3)
+        self.assertTrue(os.path.exists(self.path))
+        db.session.commit()
+        
+        file_cleanup.wait_idle()
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(UploadedImage.query.filter_by(filename=self.name).one().ref_count, 1)
+    
+    def test_unused_file_is_removed_and_can_be_uploaded_again(self):
+        self.release()
+        file_cleanup.enqueue([self.name])
+        file_cleanup.wait_idle()
+        self.assertFalse(os.path.exists(self.path))
+        
+        save_uploaded_files([upload()])
+        db.session.commit()
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), CONTENT)
+        self.assertEqual([name for name in os.listdir(app.config['UPLOAD_FOLDER']) if name.endswith('.upload')], [])
+    
+    def test_duplicate_upload_only_counts_reference(self):
+        self.assertEqual(save_uploaded_files([upload(), upload()]), [self.name])
+        db.session.commit()
+        self.assertEqual(UploadedImage.query.filter_by(filename=self.name).one().ref_count, 2)
+        self.assertEqual([name for name in os.listdir(app.config['UPLOAD_FOLDER']) if name.endswith('.upload')], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
-from app import app
+from app import app, init_database
+
+# Datenbank vorbereiten - auch wenn ein WSGI-Server (z.B. waitress-serve wsgi:app) die App lädt
+init_database()
 
 if __name__ == '__main__':
     app.run()
\ No newline at end of file